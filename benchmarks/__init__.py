@@ -0,0 +1,5 @@
+import os
+
+# Stub hosts reuse ephemeral ports across runs, so a persistent lookup cache
+# would serve one run's discoveries to the next; benchmarks cache in memory only
+os.environ.setdefault('LOOKUP_CACHE_PATH', '')
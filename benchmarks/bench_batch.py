@@ -0,0 +1,86 @@
+"""Throughput of ``generate-batch`` against local fake APIs and a stand-in ES.
+
+    python -m benchmarks.bench_batch --hosts 200 --latency 0.05
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.agents.generator import ToolGenerator
+from src.agents.introspector import APIIntrospector
+from src.agents.search import CatalogSearch
+from src.batch import BatchPipeline
+from src.embeddings.cache import EmbeddingCache
+from src.lookup_cache import LookupCache
+from benchmarks.fake_es import FakeES
+from benchmarks.stand_in_model import StandInModel
+from benchmarks.specs import synthetic_spec
+from benchmarks.stub_server import Route, StubServer
+
+
+def stand_in_catalog(es):
+    return CatalogSearch(es, cache=EmbeddingCache('stand-in', 384), embedding_model=StandInModel())
+
+
+def start_hosts(count: int, latency: float, endpoints: int):
+    servers = []
+    for i in range(count):
+        spec = synthetic_spec(endpoints, title=f"Bench API {i}")
+        servers.append(StubServer({'/openapi.json': Route(body=spec, delay=latency)},
+                                  default_delay=latency).start())
+    return servers
+
+
+def run_sequential(es, urls, output_dir):
+    start = time.perf_counter()
+    for url in urls:
+        # Mirrors one `agent-nexus generate` process per URL
+        cache = LookupCache()
+        discovery = APIIntrospector(es, cache=cache).discover(url)
+        generator = ToolGenerator(es, cache=cache)
+        tool_data = generator.generate(url, discovery_data=discovery)
+        generator.write_files(tool_data, output_dir, discovery_data=discovery)
+        stand_in_catalog(es).index_tool(tool_data)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=100, help='Distinct fake API hosts')
+    parser.add_argument('--duplicates', type=float, default=0.25, help='Extra same-host URLs, as a ratio')
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake API latency per request')
+    parser.add_argument('--es-latency', type=float, default=0.005, help='Stand-in ES latency per call')
+    parser.add_argument('--endpoints', type=int, default=20)
+    parser.add_argument('--sequential-sample', type=int, default=10,
+                        help='URLs to run through the one-at-a-time baseline')
+    args = parser.parse_args()
+
+    servers = start_hosts(args.hosts, args.latency, args.endpoints)
+    urls = [s.url for s in servers]
+    urls += [f"{s.url}/v2" for s in servers[:int(args.hosts * args.duplicates)]]
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            es = FakeES(latency=args.es_latency)
+            pipeline = BatchPipeline(es, os.path.join(tmp, 'tools'), os.path.join(tmp, 'report.jsonl'),
+                                     search_agent=stand_in_catalog(es))
+            stats = pipeline.run(urls)
+            print(f"batch:      {stats.ok} ok, {stats.failed} failed, {stats.duplicates} duplicates "
+                  f"in {stats.elapsed_seconds:.2f}s -> {stats.urls_per_minute:.0f} URLs/min")
+
+            resumed = BatchPipeline(es, os.path.join(tmp, 'tools'), os.path.join(tmp, 'report.jsonl'),
+                                    search_agent=stand_in_catalog(es)).run(urls)
+            print(f"resume:     {resumed.resumed} skipped, {resumed.ok} reprocessed "
+                  f"in {resumed.elapsed_seconds:.2f}s")
+
+            sample = urls[:args.sequential_sample]
+            seconds = run_sequential(FakeES(latency=args.es_latency), sample, os.path.join(tmp, 'seq'))
+            print(f"sequential: {len(sample)} URLs in {seconds:.2f}s -> {len(sample) / seconds * 60:.0f} URLs/min")
+    finally:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Docs/sec of single-document indexing vs the buffered bulk writer.
+
+    python -m benchmarks.bench_bulk_index --docs 2000 --latency 0.002
+"""
+import argparse
+import time
+
+from benchmarks.fake_es import FakeES
+
+
+def make_doc(i: int) -> dict:
+    return {
+        'tool_id': f"tool{i}",
+        'tool_name': f"tool_{i}",
+        'display_name': f"Tool {i}",
+        'description': f"Synthetic tool number {i} " * 8,
+        'tool_code': 'x = 1\n' * 200,
+        'endpoints_count': i % 50
+    }
+
+
+def run_single(docs: int, latency: float):
+    es = FakeES(latency=latency)
+    start = time.perf_counter()
+    for i in range(docs):
+        es.write('agent-tools', f"tool{i}", make_doc(i))
+    return time.perf_counter() - start, es.request_count, 0
+
+
+def run_bulk(docs: int, latency: float, reject_ratio: float, max_docs: int):
+    es = FakeES(latency=latency, reject_ratio=reject_ratio)
+    start = time.perf_counter()
+    es.start_bulk(max_docs=max_docs, backoff=0.01)
+    for i in range(docs):
+        es.write('agent-tools', f"tool{i}", make_doc(i))
+    writer = es.stop_bulk()
+    elapsed = time.perf_counter() - start
+    assert len(es.data['agent-tools']) + len(writer.failures) == docs
+    return elapsed, es.request_count, len(writer.failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.002, help='Stand-in ES round-trip seconds')
+    parser.add_argument('--batch', type=int, default=500, help='Bulk flush size')
+    parser.add_argument('--reject-ratio', type=float, default=0.05, help='Share of bulk items answered with 429')
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'docs/sec':>10} {'requests':>9} {'failed':>7}")
+    for mode, run in [
+        ('single', lambda: run_single(args.docs, args.latency)),
+        ('bulk', lambda: run_bulk(args.docs, args.latency, args.reject_ratio, args.batch)),
+    ]:
+        seconds, requests, failed = run()
+        print(f"{mode:<8} {args.docs / seconds:>10.0f} {requests:>9} {failed:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Spec-less discovery: root probing vs the link crawler against a local hypermedia API.
+
+The stub API publishes its surface the way GitHub's does. The root
+document maps names to URL templates, collections list members with
+links to their sub-resources, one resource uses HAL ``_links`` and one
+uses Siren ``actions``. Responses carry an ``Allow`` header. Each route
+answers after ``--latency`` seconds. Coverage is the share of the API's
+real (path, method) pairs that a run found.
+
+    python -m benchmarks.bench_crawler --users 40 --latency 0.05
+"""
+import argparse
+import time
+
+from src.agents.crawler import LinkCrawler
+from src.transport import Transport
+from benchmarks.stub_server import Route, StubServer
+
+# (path template, methods) the stub API really has
+SURFACE = [
+    ('/', 'GET'),
+    ('/user', 'GET PATCH'),
+    ('/users', 'GET'),
+    ('/users/{user}', 'GET'),
+    ('/users/{user}/repos', 'GET POST'),
+    ('/repos/{owner}/{repo}', 'GET PATCH DELETE'),
+    ('/repos/{owner}/{repo}/issues', 'GET POST'),
+    ('/repos/{owner}/{repo}/issues/{number}', 'GET PATCH'),
+    ('/gists', 'GET POST'),
+    ('/gists/{gist_id}', 'GET DELETE'),
+    ('/search/repositories', 'GET'),
+    ('/orders', 'GET'),
+    ('/orders/{order_id}', 'GET'),
+    ('/orders/{order_id}/items', 'GET'),
+    ('/carts/{cart_id}', 'GET'),
+    ('/carts/{cart_id}/items', 'POST'),
+]
+
+
+def build_routes(base: str, users: int, repos: int, issues: int, latency: float):
+    allow = dict(SURFACE)
+
+    def route(template, body, path=None):
+        return path or template, Route(body=body, delay=latency,
+                                       headers={'Allow': ', '.join(allow[template].split())})
+
+    routes = dict([
+        route('/', {
+            'current_user_url': f"{base}/user",
+            'users_url': f"{base}/users",
+            'user_url': f"{base}/users/{{user}}",
+            'user_repositories_url': f"{base}/users/{{user}}/repos{{?type,page,per_page,sort}}",
+            'repository_url': f"{base}/repos/{{owner}}/{{repo}}",
+            'gists_url': f"{base}/gists{{/gist_id}}",
+            'repository_search_url': f"{base}/search/repositories?q={{query}}{{&page,per_page,sort}}",
+            'orders_url': f"{base}/orders",
+            'documentation_url': 'https://docs.example.com/rest',
+        }),
+        route('/user', {'login': 'u0', 'url': f"{base}/users/u0"}),
+        route('/users', [{'login': f"u{i}", 'url': f"{base}/users/u{i}",
+                          'repos_url': f"{base}/users/u{i}/repos"} for i in range(users)]),
+        route('/gists', [{'id': f"{i:08x}", 'url': f"{base}/gists/{i:08x}"} for i in range(1, 20)]),
+        route('/search/repositories', {'total_count': 0, 'items': []}),
+        route('/orders', {'_links': {'self': {'href': '/orders'},
+                                     'item': [{'href': f"/orders/{i}"} for i in range(1, 20)]}}),
+    ])
+    for i in range(1, 20):
+        routes.update([
+            route('/gists/{gist_id}', {'id': f"{i:08x}"}, f"/gists/{i:08x}"),
+            route('/orders/{order_id}', {'_links': {'self': {'href': f"/orders/{i}"},
+                                                    'items': {'href': f"/orders/{i}/items"},
+                                                    'cart': {'href': f"/carts/{i}"}}}, f"/orders/{i}"),
+            route('/orders/{order_id}/items', {'_embedded': {'items': []}}, f"/orders/{i}/items"),
+            route('/carts/{cart_id}', {'class': ['cart'], 'actions': [
+                {'name': 'add-item', 'method': 'POST', 'href': f"{base}/carts/{i}/items"}]}, f"/carts/{i}"),
+        ])
+    for i in range(users):
+        routes.update([
+            route('/users/{user}', {'login': f"u{i}", 'repos_url': f"{base}/users/u{i}/repos"}, f"/users/u{i}"),
+            route('/users/{user}/repos', [
+                {'name': f"r{k}", 'url': f"{base}/repos/u{i}/r{k}"} for k in range(repos)
+            ], f"/users/u{i}/repos"),
+        ])
+        for k in range(repos):
+            routes.update([
+                route('/repos/{owner}/{repo}', {
+                    'owner': {'login': f"u{i}", 'url': f"{base}/users/u{i}"},
+                    'issues_url': f"{base}/repos/u{i}/r{k}/issues{{/number}}",
+                }, f"/repos/u{i}/r{k}"),
+                route('/repos/{owner}/{repo}/issues', [
+                    {'number': n, 'url': f"{base}/repos/u{i}/r{k}/issues/{n}"} for n in range(1, issues + 1)
+                ], f"/repos/u{i}/r{k}/issues"),
+            ])
+            for n in range(1, issues + 1):
+                routes.update([route('/repos/{owner}/{repo}/issues/{number}', {'number': n},
+                                     f"/repos/u{i}/r{k}/issues/{n}")])
+    return routes
+
+
+def probe_root(http: Transport, api_url: str):
+    """What discovery did before the crawler: the first of / and /api that answers."""
+    for path in ['/', '/api']:
+        try:
+            if http.get(f"{api_url}{path}", timeout=2).status_code < 500:
+                return [(path, 'GET')], 1
+        except Exception:
+            continue
+    return [], 2
+
+
+def coverage(found) -> str:
+    truth = {(path, method) for path, methods in SURFACE for method in methods.split()}
+    return f"{len(truth & set(found))}/{len(truth)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--repos', type=int, default=5)
+    parser.add_argument('--issues', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05, help='Delay on every route')
+    parser.add_argument('--max-requests', type=int, default=200)
+    parser.add_argument('--time-limit', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--verbose', action='store_true', help='List the endpoints found')
+    args = parser.parse_args()
+
+    server = StubServer(default_delay=args.latency).start()
+    server.routes = build_routes(server.url, args.users, args.repos, args.issues, args.latency)
+    print(f"{len(server.routes)} routes, {args.latency * 1000:.0f}ms each")
+    print(f"{'method':<16} {'seconds':>8} {'requests':>9} {'endpoints':>10} {'coverage':>9}  truncated")
+    try:
+        http = Transport(retries=0)
+        start = time.perf_counter()
+        found, requests = probe_root(http, server.url)
+        print(f"{'probe / and /api':<16} {time.perf_counter() - start:>8.2f} {requests:>9} "
+              f"{len(found):>10} {coverage(found):>9}  -")
+
+        for concurrency in args.concurrency:
+            crawler = LinkCrawler(http, max_requests=args.max_requests, time_limit=args.time_limit,
+                                  concurrency=concurrency, max_per_host=concurrency,
+                                  timeout=args.latency + 2)
+            result = crawler.crawl(server.url)
+            found = [(endpoint['path'], endpoint['method']) for endpoint in result.endpoints]
+            print(f"{f'crawl x{concurrency}':<16} {result.elapsed:>8.2f} {result.requests:>9} "
+                  f"{len(found):>10} {coverage(found):>9}  {result.truncated}")
+            if args.verbose:
+                for path, method in found:
+                    print(f"    {method:<7} {path}")
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Index size and fetch latency: one document per discovery vs the split layout.
+
+Each API is a parsed ``large_spec``, stored once as the single document
+earlier versions wrote and once through ``DiscoveryStore``. Sizes are the
+JSON ``_source`` bytes per index, raw and zlib-compressed. The compressed
+figure stands in for Elasticsearch's block compression. Each read is
+timed against a fake cluster with a fixed round-trip latency, as the
+stage that makes it would issue it. The fake copies every hit it returns,
+which makes many small documents look slower than they are, so each read
+is also modelled as round-trips x latency + bytes / bandwidth.
+
+    python -m benchmarks.bench_discovery_store --apis 5 --endpoints 2000 --latency-ms 2
+"""
+import argparse
+import json
+import statistics
+import time
+import zlib
+
+from src.agents.spec_parser import parse_spec
+from src.discovery_store import DISCOVERIES_INDEX, ENDPOINTS_INDEX, SCHEMAS_INDEX, DiscoveryStore
+from src.urls import discovery_doc_id
+from benchmarks.fake_es import FakeES
+from benchmarks.specs import large_spec
+
+
+def discovery(api_url: str, endpoints: int, schemas: int) -> dict:
+    parsed = parse_spec(large_spec(endpoints, schemas, title=api_url), max_endpoints=endpoints)
+    endpoints = [endpoint.to_dict() for endpoint in parsed.endpoints]
+    return {'api_url': api_url, 'api_name': api_url, 'api_description': '', 'base_url': api_url,
+            'auth_type': 'bearer', 'has_openapi_spec': True, 'endpoints': endpoints,
+            'total_endpoints': len(endpoints), 'discovery_status': 'complete'}
+
+
+def index_size(es: FakeES, index: str):
+    text = '\n'.join(json.dumps(doc, separators=(',', ':')) for doc in es.data.get(index, {}).values())
+    return len(text), len(zlib.compress(text.encode()))
+
+
+def timed_read(es: FakeES, read, runs: int):
+    seconds, size, trips = [], 0, 0
+    for _ in range(runs):
+        before = es.request_count
+        start = time.perf_counter()
+        result = read()
+        seconds.append(time.perf_counter() - start)
+        trips = es.request_count - before
+        size = len(json.dumps(result, separators=(',', ':')))
+    return statistics.median(seconds) * 1000, trips, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apis', type=int, default=5)
+    parser.add_argument('--endpoints', type=int, default=2000, help='Endpoints per API')
+    parser.add_argument('--schemas', type=int, default=100, help='Distinct models per spec')
+    parser.add_argument('--latency-ms', type=float, default=2)
+    parser.add_argument('--bandwidth-mbps', type=float, default=1000, help='For the modelled read time')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    catalog = [discovery(f"https://api{i}.example.com", args.endpoints, args.schemas) for i in range(args.apis)]
+    legacy, split = FakeES(), FakeES()
+    for item in catalog:
+        legacy.index(DISCOVERIES_INDEX, discovery_doc_id(item['api_url']), item)
+    store = DiscoveryStore(split)
+    start = time.perf_counter()
+    for item in catalog:
+        store.write(item)
+    print(f"{args.apis} APIs x {args.endpoints} endpoints, written split in {time.perf_counter() - start:.2f}s")
+
+    raw, packed = index_size(legacy, DISCOVERIES_INDEX)
+    print(f"\n{'index':<28} {'docs':>8} {'raw MB':>9} {'zlib MB':>9}")
+    print(f"{'single document':<28} {len(legacy.data[DISCOVERIES_INDEX]):>8} {raw / 1e6:>9.2f} {packed / 1e6:>9.2f}")
+    totals = [0, 0]
+    for index in (DISCOVERIES_INDEX, ENDPOINTS_INDEX, SCHEMAS_INDEX):
+        raw, packed = index_size(split, index)
+        totals[0] += raw
+        totals[1] += packed
+        print(f"{'split ' + index:<28} {len(split.data[index]):>8} {raw / 1e6:>9.2f} {packed / 1e6:>9.2f}")
+    print(f"{'split total':<28} {'':>8} {totals[0] / 1e6:>9.2f} {totals[1] / 1e6:>9.2f}")
+
+    legacy.client.latency = split.client.latency = args.latency_ms / 1000
+    api_url = catalog[-1]['api_url']
+    doc_id = discovery_doc_id(api_url)
+    reads = [
+        ('header (discover, generate)',
+         lambda: legacy.get(DISCOVERIES_INDEX, doc_id),
+         lambda: DiscoveryStore(split).header(api_url)),
+        ('fingerprints (refresh diff)',
+         lambda: legacy.get(DISCOVERIES_INDEX, doc_id, source=['endpoints']),
+         lambda: DiscoveryStore(split).fingerprints(api_url)),
+        ('signatures (render)',
+         lambda: legacy.get(DISCOVERIES_INDEX, doc_id),
+         lambda: DiscoveryStore(split).endpoints(api_url, schemas=('parameters', 'request_body'))),
+        ('all endpoints (orchestrate)',
+         lambda: legacy.get(DISCOVERIES_INDEX, doc_id),
+         lambda: DiscoveryStore(split).endpoints(api_url)),
+        ('all endpoints, warm schemas',
+         lambda: legacy.get(DISCOVERIES_INDEX, doc_id),
+         lambda: store.endpoints(api_url)),
+    ]
+
+    def modelled(trips, size):
+        return trips * args.latency_ms + size * 8 / (args.bandwidth_mbps * 1e3)
+
+    print(f"\n{'':<30} {'measured ms':>17} {'modelled ms':>17} {'round-trips':>13} {'KB returned':>17}")
+    print(f"{'read':<30} {'single':>8} {'split':>8} {'single':>8} {'split':>8} {'single':>6} {'split':>6} "
+          f"{'single':>8} {'split':>8}")
+    for label, single_read, split_read in reads:
+        single_ms, single_trips, single_size = timed_read(legacy, single_read, args.runs)
+        split_ms, split_trips, split_size = timed_read(split, split_read, args.runs)
+        print(f"{label:<30} {single_ms:>8.1f} {split_ms:>8.1f} {modelled(single_trips, single_size):>8.1f} "
+              f"{modelled(split_trips, split_size):>8.1f} {single_trips:>6} {split_trips:>6} "
+              f"{single_size / 1e3:>8.1f} {split_size / 1e3:>8.1f}")
+
+    assert store.load(api_url) == catalog[-1]
+    print("\nsplit discovery loads back equal to the original")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Embedding cache: cold encode vs warm memory hits vs a restart that reads the disk store.
+
+Uses a stand-in encoder with a fixed per-text cost, so it runs without
+downloading a model.
+
+    python -m benchmarks.bench_embedding_cache --texts 5000
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from src.embeddings.cache import EmbeddingCache
+from benchmarks.stand_in_model import StandInModel
+
+DIMS = 384
+
+
+def timed(cache: EmbeddingCache, texts, model: StandInModel):
+    start = time.perf_counter()
+    vectors = cache.encode(texts, model.encode)
+    return time.perf_counter() - start, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', type=int, default=5000)
+    parser.add_argument('--cost', type=float, default=0.0005, help='Stand-in encode seconds per text')
+    args = parser.parse_args()
+
+    texts = [f"Tool {i} that manages resource collection {i % 97}" for i in range(args.texts)]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        encoder = StandInModel(DIMS, per_text=args.cost)
+        cache = EmbeddingCache('stand-in', DIMS, cache_dir=cache_dir)
+        cold, reference = timed(cache, texts, encoder)
+        warm, _ = timed(cache, texts, encoder)
+        start = time.perf_counter()
+        for text in texts[:1000]:
+            cache.encode([text], encoder.encode)
+        query = (time.perf_counter() - start) / min(len(texts), 1000)
+
+        restarted = EmbeddingCache('stand-in', DIMS, cache_dir=cache_dir)
+        restart_encoder = StandInModel(DIMS, per_text=args.cost)
+        reload, vectors = timed(restarted, texts, restart_encoder)
+        assert np.allclose(reference, vectors)
+
+        print(f"{'phase':<18} {'seconds':>9} {'encoded':>8}")
+        print(f"{'cold':<18} {cold:>9.4f} {encoder.encoded:>8}")
+        print(f"{'warm (memory)':<18} {warm:>9.4f} {0:>8}")
+        print(f"{'hot query (each)':<18} {query * 1e6:>7.1f}us {0:>8}")
+        print(f"{'restart (disk)':<18} {reload:>9.4f} {restart_encoder.encoded:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Encoder backends: encodes/sec, and retrieval recall of int8 against float32.
+
+Every backend embeds the same fixed evaluation set. It has one tool
+description per API and a paraphrased query for each, with the
+description it should find. Recall@k is the share of queries whose
+description ranks in the top k by cosine similarity. Agreement@k is the
+overlap of each backend's top k with the float32 model's. Throughput
+encodes the descriptions, repeated, in batches of ``--batch-size``. A
+backend whose packages are not installed is reported and skipped.
+
+The run fails (exit status 1) if a backend's recall@k falls more than
+``--max-recall-drop`` below float32.
+
+    python -m benchmarks.bench_encoders --backends torch onnx onnx-int8 --threads 4
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from src.config import Config
+from src.embeddings.model import get_model
+
+EVALUATION = [
+    ("Current conditions, hourly and 10-day forecasts for any city or coordinates",
+     "what will the weather be like in Paris this weekend"),
+    ("Accept card payments, issue refunds and manage subscriptions and invoices",
+     "charge a customer's credit card and refund it later"),
+    ("Repositories, pull requests, issues and commit history of source code projects",
+     "open a pull request on a git repository"),
+    ("Geocoding, reverse geocoding and driving directions between addresses",
+     "get the route from my office to the airport"),
+    ("Send transactional email with templates, attachments and delivery tracking",
+     "send a password reset message to a user's inbox"),
+    ("Create, update and list calendar events and check attendee availability",
+     "schedule a meeting next Tuesday with the team"),
+    ("Upload, download and share files in buckets with signed URLs",
+     "store a PDF in the cloud and get a link to share it"),
+    ("Translate text between more than 100 languages and detect the source language",
+     "convert this paragraph from Spanish to English"),
+    ("Compare carrier rates, buy shipping labels and track parcels",
+     "where is my package and when will it arrive"),
+    ("Spot prices, order books and historical candles for cryptocurrency markets",
+     "how much is one bitcoin worth in dollars right now"),
+    ("Search tracks, albums and artists and manage playlists",
+     "add a song to my workout playlist"),
+    ("Transcode, host and stream video with adaptive bitrate",
+     "convert an uploaded movie for playback on phones"),
+    ("Send and receive text messages and verify phone numbers with one-time codes",
+     "text a verification code to a mobile number"),
+    ("Full-text web search with snippets, images and safe-search filtering",
+     "find web pages about electric cars"),
+    ("Headlines and articles from thousands of publishers, filtered by topic and date",
+     "latest news stories about the election"),
+    ("Live scores, fixtures, standings and player statistics for football leagues",
+     "who won the match between Arsenal and Chelsea"),
+    ("Exchange rates for 170 currencies with historical conversion",
+     "convert 100 euros to japanese yen"),
+    ("Extract text, tables and key-value pairs from scanned documents and receipts",
+     "read the total amount from a photo of a receipt"),
+    ("Detect objects, faces and labels in images",
+     "tell me what is in this picture"),
+    ("Convert speech in audio files to text with timestamps and speaker labels",
+     "transcribe a recorded phone call"),
+    ("Generate natural-sounding speech audio from text in many voices",
+     "read this article aloud as an mp3"),
+    ("Look up company records, registration numbers and officers",
+     "find the registered address of a business"),
+    ("Flight search, fares and booking for airlines worldwide",
+     "cheapest flight from New York to London in March"),
+    ("Hotel availability, room rates and reservations",
+     "book a room in Rome for three nights"),
+    ("Nutrition facts and ingredients for packaged foods and recipes",
+     "how many calories are in a bowl of oatmeal"),
+    ("Air quality index, pollen and pollutant concentrations by location",
+     "is the air safe to go running outside today"),
+    ("Create short links with click analytics and QR codes",
+     "shorten a long URL and count the clicks"),
+    ("Validate email addresses and check deliverability before sending",
+     "check whether an email address actually exists"),
+    ("IP address geolocation, ISP and threat intelligence",
+     "which country is this IP address from"),
+    ("Manage customer contacts, deals and sales pipeline stages",
+     "move a sales deal to the negotiation stage in the CRM"),
+    ("Create tickets, assign agents and track customer support conversations",
+     "open a help desk ticket for a customer complaint"),
+    ("Post messages to channels and manage workspace members in team chat",
+     "notify the engineering channel that the build failed"),
+]
+
+
+def recall_at(query_vectors: np.ndarray, doc_vectors: np.ndarray, k: int) -> tuple:
+    """Recall@k against the labelled description, and the top-k indices of each query."""
+    scores = _unit(query_vectors) @ _unit(doc_vectors).T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    hits = [i in row for i, row in enumerate(top)]
+    return float(np.mean(hits)), top
+
+
+def agreement(top: np.ndarray, reference: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(top, reference)]))
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def load(label: str, model_name: str, threads: int):
+    backend, _, quantize = label.partition('-')
+    return get_model(model_name, backend=backend, quantize=quantize or 'none', threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=Config.embedding_model_name)
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'onnx-int8'],
+                        help='backend[-quantization]; the first is the reference')
+    parser.add_argument('--threads', type=int, default=Config.embedding_threads, help='0 = runtime default')
+    parser.add_argument('--batch-size', type=int, default=Config.embedding_batch_size)
+    parser.add_argument('--texts', type=int, default=2000, help='Texts encoded for throughput')
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--max-recall-drop', type=float, default=0.03)
+    args = parser.parse_args()
+
+    docs = [doc for doc, _ in EVALUATION]
+    queries = [query for _, query in EVALUATION]
+    corpus = [f"{docs[i % len(docs)]} ({i})" for i in range(args.texts)]
+
+    print(f"{args.model}, {len(EVALUATION)} queries, threads={args.threads or 'default'}")
+    print(f"{'backend':<12} {'load s':>7} {'encodes/s':>10} {f'recall@{args.k}':>10} {f'agree@{args.k}':>9}")
+    reference = None
+    failed = False
+    for label in args.backends:
+        start = time.perf_counter()
+        try:
+            model = load(label, args.model, args.threads)
+        except ImportError as e:
+            print(f"{label:<12} skipped: {e}")
+            continue
+        load_seconds = time.perf_counter() - start
+
+        # The first call pays for lazy initialization; keep it out of the timing
+        model.encode(corpus[:args.batch_size], batch_size=args.batch_size, convert_to_numpy=True)
+        start = time.perf_counter()
+        model.encode(corpus, batch_size=args.batch_size, convert_to_numpy=True)
+        rate = len(corpus) / (time.perf_counter() - start)
+
+        recall, top = recall_at(model.encode(queries, batch_size=args.batch_size, convert_to_numpy=True),
+                                model.encode(docs, batch_size=args.batch_size, convert_to_numpy=True), args.k)
+        if reference is None:
+            reference = (recall, top)
+            agree = 1.0
+        else:
+            agree = agreement(top, reference[1])
+            if recall < reference[0] - args.max_recall_drop:
+                failed = True
+        print(f"{label:<12} {load_seconds:>7.1f} {rate:>10.0f} {recall:>10.3f} {agree:>9.3f}")
+
+    if failed:
+        print(f"recall fell more than {args.max_recall_drop} below {args.backends[0]}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""End-to-end pipeline benchmark: discover, generate, index and search, written as JSON.
+
+Each spec size runs in a fresh interpreter, so peak RSS belongs to that
+size alone. The spec is ``large_spec``: shared ``$ref`` parameters and
+responses, and model chains ``--ref-depth`` levels deep. A local stub
+serves it with ``--latency-ms`` per request. Elasticsearch is a
+``FakeES`` with ``--es-latency-ms`` per call, and embeddings come from
+the stand-in model, so the whole run is offline and CPU-only. The stages:
+
+- ``discover``: ``APIIntrospector.discover``, from the spec probe to the stored discovery;
+- ``generate``: ``ToolGenerator.generate`` and ``write_files``;
+- ``index``: ``CatalogSearch.index_tool`` and ``EndpointSearch.index_tools``;
+- ``search``: ``--queries`` catalog searches and endpoint searches over a
+  catalog padded to ``--catalog`` tools.
+
+``discover`` and ``generate`` run ``--repeat`` times, each time for a new
+API URL. For each stage the report gives latency percentiles, endpoints
+(or queries) per second, and peak RSS after the stage. It also lists the
+busiest instrumentation spans. ``--trace-memory`` adds each stage's Python
+heap peak, but tracemalloc slows everything down.
+
+``--out`` writes the results with the commit they were measured on.
+``--compare`` reads an earlier file and prints the change in every
+metric. It exits 1 if a p50 or peak RSS got worse by more than
+``--tolerance``, so CI can run it between commits.
+
+    python -m benchmarks.bench_end_to_end --endpoints 10 1000 10000 50000 --out bench.json
+    python -m benchmarks.bench_end_to_end --endpoints 10 1000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+STAGES = ('discover', 'generate', 'index', 'search')
+# (stage, metric, True if bigger is better) checked by --compare
+COMPARED = [(stage, 'p50_ms', False) for stage in STAGES] + \
+           [(stage, 'peak_rss_mb', False) for stage in STAGES] + \
+           [(stage, 'per_second', True) for stage in STAGES]
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * q
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Stage:
+    """Times repeated runs of one stage and records its memory and busiest spans."""
+
+    def __init__(self, name: str, trace_memory: bool):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.seconds = []
+
+    def __enter__(self):
+        from src import instrumentation
+        instrumentation.enable()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        return self
+
+    def run(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.seconds.append(time.perf_counter() - start)
+        return result
+
+    def __exit__(self, *exc):
+        from src import instrumentation
+        spans = instrumentation.recorder.snapshot()['spans']
+        instrumentation.disable()
+        self.spans = dict(sorted(spans.items(), key=lambda item: item[1]['total_seconds'], reverse=True)[:8])
+        self.heap_peak_mb = tracemalloc.get_traced_memory()[1] / 1e6 if self.trace_memory else None
+        self.peak_rss_mb = peak_rss_mb()
+
+    def report(self, units: int) -> dict:
+        """``units``: endpoints or queries handled per run."""
+        total = sum(self.seconds)
+        return {
+            'runs': len(self.seconds),
+            'p50_ms': round(percentile(self.seconds, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(self.seconds, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(self.seconds, 0.99) * 1000, 3),
+            'per_second': round(units * len(self.seconds) / total, 1) if total else None,
+            'peak_rss_mb': round(self.peak_rss_mb, 1),
+            'heap_peak_mb': round(self.heap_peak_mb, 1) if self.heap_peak_mb is not None else None,
+            'spans': self.spans
+        }
+
+
+def child(config: dict) -> None:
+    """One spec size, start to finish; prints its results as the last line of JSON."""
+    from src.agents.endpoint_search import EndpointSearch, endpoint_text
+    from src.agents.generator import ToolGenerator
+    from src.agents.introspector import APIIntrospector
+    from src.agents.search import CatalogSearch
+    from src.embeddings.cache import EmbeddingCache
+    from src.lookup_cache import LookupCache
+    from src.transport import Transport
+    from benchmarks.fake_es import FakeES
+    from benchmarks.stand_in_model import StandInModel
+    from benchmarks.stub_server import Route, StubServer
+
+    endpoints, repeat, trace_memory = config['endpoints'], config['repeat'], config['trace_memory']
+    if trace_memory:
+        tracemalloc.start()
+    baseline = peak_rss_mb()
+    with open(config['spec_path'], 'rb') as f:
+        route = Route(body=f.read(), delay=config['latency_ms'] / 1000)
+    routes = {f"/api{r}/openapi.json": route for r in range(repeat)}
+    es = FakeES(latency=config['es_latency_ms'] / 1000)
+    model = StandInModel()
+    results = {'endpoints': endpoints, 'spec_mb': round(len(route.body) / 1e6, 2),
+               'baseline_rss_mb': round(baseline, 1), 'stages': {}}
+
+    with StubServer(routes, default_delay=config['latency_ms'] / 1000) as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        cache = LookupCache(ttl=0, path='')
+        introspector = APIIntrospector(es, cache=cache, transport=Transport(retries=0))
+        introspector.max_endpoints = 0
+        urls = [f"{stub.url}/api{r}" for r in range(repeat)]
+        discoveries = []
+        with Stage('discover', trace_memory) as stage:
+            for url in urls:
+                discoveries.append(stage.run(introspector.discover, url))
+        found = discoveries[-1]['total_endpoints']
+        assert found == endpoints, f"discovered {found} of {endpoints} endpoints"
+        results['stages']['discover'] = stage.report(endpoints)
+
+        generator = ToolGenerator(es, cache=cache)
+        tools = []
+        with Stage('generate', trace_memory) as stage:
+            for url, discovery in zip(urls, discoveries):
+                def generate():
+                    tool = generator.generate(url, discovery_data=discovery, force=True)
+                    generator.write_files(tool, os.path.join(tmp, 'tools'), discovery_data=discovery)
+                    return tool
+                tools.append(stage.run(generate))
+        results['stages']['generate'] = stage.report(endpoints)
+        del discoveries
+
+        # A fresh vector cache: one left by an earlier run would skip the encoding being measured
+        vectors = EmbeddingCache('stand-in', model.dims, cache_dir=os.path.join(tmp, 'vectors'))
+        catalog = CatalogSearch(es, cache=vectors, embedding_model=model)
+        endpoint_search = EndpointSearch(es, catalog)
+        tool = tools[-1]
+        del tools
+        with Stage('index', trace_memory) as stage:
+            def index():
+                catalog.index_tool(tool)
+                es.start_bulk()
+                try:
+                    return endpoint_search.index_tools([tool])
+                finally:
+                    es.stop_bulk()
+            written, _ = stage.run(index)
+        assert written == endpoints, f"indexed {written} of {endpoints} endpoints"
+        results['stages']['index'] = stage.report(endpoints)
+
+        # Padding, so catalog search ranks more than one tool; not timed
+        padding = [{
+            'tool_id': f"pad_{i}", 'tool_name': f"pad_{i}", 'display_name': f"Padding {i}",
+            'description': f"Padding tool {i} for the catalog search benchmark", 'api_base_url': '',
+            'auth_type': 'none', 'source_api_discovery_id': '', 'endpoints_count': 0, 'usage_count': 0,
+            'rating': 0.0, 'success_rate': 1.0, 'categories': []
+        } for i in range(config['catalog'])]
+        es.start_bulk()
+        try:
+            catalog.index_tools(padding)
+        finally:
+            es.stop_bulk()
+
+        rng = random.Random(config['seed'])
+        positions = [rng.randrange(endpoints) for _ in range(config['queries'])]
+        queries = [endpoint_text(endpoint) for endpoint in
+                   endpoint_search.store.endpoints_at(tool['source_api_discovery_id'], positions, schemas=())]
+        hits = 0
+        with Stage('search', trace_memory) as stage:
+            for query, position in zip(queries, positions):
+                def search():
+                    catalog.search(query, top_k=5)
+                    return endpoint_search.search(query, top_k=10)
+                groups = stage.run(search)
+                hits += bool(groups) and groups[0]['endpoints'][0]['position'] == position
+        results['stages']['search'] = stage.report(1)
+        results['stages']['search']['endpoint_hit_rate'] = round(hits / len(queries), 3) if queries else None
+
+    results['es_requests'] = es.request_count
+    print(json.dumps(results))
+
+
+def write_spec(path: str, endpoints: int, schemas: int, ref_depth: int) -> None:
+    # In its own interpreter: building the spec would inflate the measured peak RSS
+    subprocess.run(
+        [sys.executable, '-c',
+         'import json, sys; from benchmarks.specs import large_spec; '
+         'json.dump(large_spec(int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]), title="Bench API"), '
+         'open(sys.argv[1], "w"))',
+         path, str(endpoints), str(schemas), str(ref_depth)],
+        check=True
+    )
+
+
+def measure(config: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_end_to_end', '--child', json.dumps(config)],
+        capture_output=True, text=True
+    )
+    if out.returncode:
+        raise RuntimeError(f"{config['endpoints']} endpoints failed:\n{out.stderr[-4000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        'commit': commit, 'dirty': dirty, 'python': platform.python_version(), 'platform': platform.platform(),
+        'cpus': os.cpu_count(), 'measured_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+
+
+def print_results(results) -> None:
+    print(f"\n{'endpoints':>9} {'stage':<9} {'runs':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} "
+          f"{'per s':>10} {'peak MB':>8} {'heap MB':>8}")
+    for result in results:
+        for name in STAGES:
+            stage = result['stages'][name]
+            heap = f"{stage['heap_peak_mb']:>8.1f}" if stage['heap_peak_mb'] is not None else f"{'-':>8}"
+            print(f"{result['endpoints']:>9} {name:<9} {stage['runs']:>5} {stage['p50_ms']:>10.1f} "
+                  f"{stage['p95_ms']:>10.1f} {stage['p99_ms']:>10.1f} {stage['per_second'] or 0:>10.1f} "
+                  f"{stage['peak_rss_mb']:>8.1f} {heap}")
+
+
+def compare(results, baseline: dict, tolerance: float) -> int:
+    """Print the change of every ``COMPARED`` metric; returns how many regressed past ``tolerance``."""
+    before = {result['endpoints']: result for result in baseline['results']}
+    print(f"\nagainst {baseline['environment'].get('commit')} ({baseline['environment'].get('measured_at')}), "
+          f"tolerance {tolerance:.0%}")
+    print(f"{'endpoints':>9} {'stage':<9} {'metric':<12} {'before':>10} {'after':>10} {'change':>8}")
+    regressions = 0
+    for result in results:
+        old = before.get(result['endpoints'])
+        if old is None:
+            continue
+        for stage, metric, higher_is_better in COMPARED:
+            a, b = old['stages'][stage].get(metric), result['stages'][stage].get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > tolerance:
+                regressions += 1
+                flag = '  worse'
+            print(f"{result['endpoints']:>9} {stage:<9} {metric:<12} {a:>10.1f} {b:>10.1f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        return child(json.loads(sys.argv[2]))
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoints', type=int, nargs='+', default=[10, 1000, 10000], help='Spec sizes')
+    parser.add_argument('--schemas', type=int, default=200, help='Distinct model chains per spec')
+    parser.add_argument('--ref-depth', type=int, default=6, help='$ref levels per model chain')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Stub API latency per request')
+    parser.add_argument('--es-latency-ms', type=float, default=1, help='Fake Elasticsearch latency per call')
+    parser.add_argument('--repeat', type=int, default=3, help='Discover/generate runs per size')
+    parser.add_argument('--queries', type=int, default=50, help='Searches per size')
+    parser.add_argument('--catalog', type=int, default=1000, help='Tools in the catalog search ranks')
+    parser.add_argument('--trace-memory', action='store_true', help='Also record the Python heap peak (slow)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', default=None, help='Write the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='Earlier --out file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Relative change --compare calls worse')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for endpoints in args.endpoints:
+            path = os.path.join(tmp, f"spec{endpoints}.json")
+            write_spec(path, endpoints, min(args.schemas, endpoints), args.ref_depth)
+            start = time.perf_counter()
+            results.append(measure({
+                'endpoints': endpoints, 'spec_path': path, 'repeat': args.repeat, 'queries': args.queries,
+                'catalog': args.catalog, 'latency_ms': args.latency_ms, 'es_latency_ms': args.es_latency_ms,
+                'trace_memory': args.trace_memory, 'seed': args.seed
+            }))
+            print(f"{endpoints} endpoints ({results[-1]['spec_mb']} MB spec) in {time.perf_counter() - start:.1f}s",
+                  file=sys.stderr)
+    print_results(results)
+
+    regressions = 0
+    if args.compare:
+        # Read first: --out may name the same file
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'environment': environment(), 'arguments': vars(args), 'results': results}, f, indent=2)
+        print(f"\nwrote {args.out}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
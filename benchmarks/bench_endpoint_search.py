@@ -0,0 +1,123 @@
+"""Endpoint-level vs tool-level retrieval: what the planner loads, and what it costs.
+
+A catalog of ``--apis`` tools with ``--endpoints`` spec-parsed endpoints
+each is stored in a fake cluster. Endpoints are indexed with the stand-in
+model, twice: the second pass should find nothing changed. Each query is
+the text of one random endpoint, so the stand-in's hash vectors match it
+exactly. The report shows:
+
+- how often that endpoint comes back first (hit rate);
+- what the planner has to load in each mode (endpoints and JSON bytes:
+  every endpoint of the top tools, or the matched endpoints only);
+- the time to plan with ``ToolOrchestrator`` in each mode.
+
+    python -m benchmarks.bench_endpoint_search --apis 20 --endpoints 1000 --queries 20
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from src.agents.endpoint_search import EndpointSearch, endpoint_text
+from src.agents.orchestrator import ToolOrchestrator
+from src.agents.search import CatalogSearch
+from src.discovery_store import DiscoveryStore
+from src.embeddings.cache import EmbeddingCache
+from src.lookup_cache import LookupCache
+from benchmarks.bench_discovery_store import discovery
+from benchmarks.fake_es import FakeES
+from benchmarks.stand_in_model import StandInModel
+
+
+def build(es: FakeES, model: StandInModel, apis: int, endpoints: int, schemas: int):
+    store = DiscoveryStore(es)
+    tools = []
+    for i in range(apis):
+        item = discovery(f"https://api{i}.example.com", endpoints, schemas)
+        # Every API is parsed from the same spec; the name keeps their endpoints apart
+        for endpoint in item['endpoints']:
+            endpoint['summary'] = f"{endpoint['summary']} (API {i})"
+        store.write(item)
+        tool = {
+            'tool_id': f"tool_{i}", 'tool_name': f"api{i}", 'display_name': f"API {i}",
+            'description': f"Synthetic API number {i}", 'api_base_url': item['api_url'],
+            'auth_type': 'bearer', 'source_api_discovery_id': item['api_url'], 'endpoints_count': endpoints,
+            'usage_count': 0, 'rating': 0.0, 'success_rate': 1.0, 'categories': []
+        }
+        tool['description_embedding'] = model.encode([tool['description']])[0].tolist()
+        es.index('agent-tools', tool['tool_id'], tool)
+        tools.append(tool)
+    return store, tools
+
+
+def size(endpoints) -> int:
+    return len(json.dumps(endpoints, separators=(',', ':'), default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apis', type=int, default=20)
+    parser.add_argument('--endpoints', type=int, default=1000, help='Endpoints per API')
+    parser.add_argument('--schemas', type=int, default=50, help='Distinct models per spec')
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--top-k', type=int, default=10, help='Endpoints per endpoint search')
+    parser.add_argument('--tools', type=int, default=3, help='Tools the planner considers')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    es = FakeES()
+    model = StandInModel()
+    store, tools = build(es, model, args.apis, args.endpoints, args.schemas)
+    catalog = CatalogSearch(es, cache=EmbeddingCache('stand-in', 384), embedding_model=model)
+    search = EndpointSearch(es, catalog, store=store)
+    total = args.apis * args.endpoints
+    print(f"{args.apis} tools x {args.endpoints} endpoints")
+
+    for label in ('index', 're-index'):
+        calls = model.calls
+        start = time.perf_counter()
+        written, unchanged = search.index_tools(tools)
+        seconds = time.perf_counter() - start
+        print(f"{label:<9} {written:>7} written {unchanged:>7} unchanged  {seconds:>6.2f}s  "
+              f"{total / seconds:>8.0f} endpoints/s  {model.calls - calls} model calls")
+
+    rng = random.Random(args.seed)
+    targets = [(rng.randrange(args.apis), rng.randrange(args.endpoints)) for _ in range(args.queries)]
+    cache = LookupCache(ttl=0, path='')
+    modes = {
+        'tool': ToolOrchestrator(es, catalog, cache=cache),
+        'endpoint': ToolOrchestrator(es, catalog, cache=cache, endpoint_search=search),
+    }
+    hits = 0
+    loaded = {mode: [] for mode in modes}
+    seconds = {mode: [] for mode in modes}
+    for api, position in targets:
+        api_url = tools[api]['source_api_discovery_id']
+        query = endpoint_text(store.endpoints_at(api_url, [position])[0])
+
+        groups = search.search(query, top_k=args.top_k)[:args.tools]
+        if groups and groups[0]['tool']['source_api_discovery_id'] == api_url and \
+                groups[0]['endpoints'][0]['position'] == position:
+            hits += 1
+        loaded['endpoint'].append(size([store.endpoints_at(group['tool']['source_api_discovery_id'],
+                                                           [e['position'] for e in group['endpoints']])
+                                        for group in groups]))
+        top_tools = [result['tool'] for result in catalog.search(query, top_k=args.tools)]
+        loaded['tool'].append(size([store.endpoints(tool['source_api_discovery_id']) for tool in top_tools]))
+
+        for mode, orchestrator in modes.items():
+            start = time.perf_counter()
+            orchestrator.orchestrate(query, top_k=args.tools)
+            seconds[mode].append(time.perf_counter() - start)
+
+    print(f"\nhit rate: {hits}/{len(targets)} queries found their endpoint first")
+    print(f"\n{'mode':<10} {'endpoints loaded':>17} {'KB loaded':>10} {'plan ms p50':>12}")
+    counts = {'tool': args.tools * args.endpoints, 'endpoint': args.top_k}
+    for mode in modes:
+        print(f"{mode:<10} {counts[mode]:>17} {statistics.median(loaded[mode]) / 1e3:>10.1f} "
+              f"{statistics.median(seconds[mode]) * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
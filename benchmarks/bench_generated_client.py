@@ -0,0 +1,161 @@
+"""Generated clients against a paginated stub: lazy iterators and the GET cache.
+
+A spec with one list endpoint per pagination style (Link header, cursor,
+offset, page) is rendered into a client, which runs against a local stub
+serving ``--items`` items ``--page-size`` at a time. For each style the
+report shows:
+
+- the requests made to read the first ``--first`` items, and to read all;
+- peak memory while counting every item lazily, against collecting the
+  same items into a list first.
+
+Then ``--repeats`` reads of one resource, without the cache, with a
+``max-age`` the cache trusts, and with a resource that has an ``ETag``
+but ``no-cache``, so each read is revalidated.
+
+    python -m benchmarks.bench_generated_client --items 20000 --page-size 100
+"""
+import argparse
+import time
+import tracemalloc
+
+from src.agents.generator import ToolGenerator
+from src.lookup_cache import LookupCache
+from src.templates import render
+from benchmarks.fake_es import FakeES
+from benchmarks.stub_server import Route, StubServer
+
+
+def _query(name, description=''):
+    return {'name': name, 'in': 'query', 'required': False, 'schema': {'type': 'integer'}, 'description': description}
+
+
+def _list(path, params, schema, headers=None):
+    response = {'description': 'A page', 'content': {'application/json': {'schema': schema}}}
+    if headers:
+        response['headers'] = headers
+    return {'path': path, 'method': 'GET', 'summary': f"List {path.strip('/')}", 'description': '',
+            'parameters': params, 'request_body': None, 'responses': {'200': response}}
+
+
+ITEM = {'type': 'object', 'properties': {'id': {'type': 'string'}, 'name': {'type': 'string'}}}
+
+
+def spec(base_url: str):
+    endpoints = [
+        _list('/linked', [_query('page'), _query('per_page')], {'type': 'array', 'items': ITEM},
+              headers={'Link': {'schema': {'type': 'string'}}}),
+        _list('/cursored', [{'name': 'cursor', 'in': 'query', 'schema': {'type': 'string'}}, _query('limit')],
+              {'type': 'object', 'properties': {'data': {'type': 'array', 'items': ITEM},
+                                                'meta': {'type': 'object',
+                                                         'properties': {'next_cursor': {'type': 'string'}}}}}),
+        _list('/offsets', [_query('offset'), _query('limit')],
+              {'type': 'object', 'properties': {'results': {'type': 'array', 'items': ITEM},
+                                                'total': {'type': 'integer'}}}),
+        _list('/pages', [_query('page'), _query('page_size')],
+              {'type': 'object', 'properties': {'items': {'type': 'array', 'items': ITEM}}}),
+        _list('/cached', [], ITEM),
+        _list('/revalidated', [], ITEM),
+    ]
+    return {
+        'api_url': base_url, 'api_name': 'Paged API', 'api_description': 'Pagination benchmark',
+        'base_url': base_url, 'auth_type': 'none', 'total_endpoints': len(endpoints), 'endpoints': endpoints
+    }
+
+
+def routes(items: int, page_size: int):
+    """Every page of every style, keyed by its exact query string."""
+    table = {}
+    pages = (items + page_size - 1) // page_size
+    for number in range(pages):
+        chunk = [{'id': f"item-{i:07d}", 'name': f"Item {i} " + 'x' * 64}
+                 for i in range(number * page_size, min(items, (number + 1) * page_size))]
+        last = number == pages - 1
+        headers = {} if last else {'Link': f'</linked?page={number + 2}&per_page={page_size}>; rel="next"'}
+        page = f"page={number + 1}&" if number else ''
+        table[f"/linked?{page}per_page={page_size}"] = Route(body=chunk, headers=headers)
+        cursor = f"&cursor=c{number}" if number else ''
+        table[f"/cursored?limit={page_size}{cursor}"] = Route(
+            body={'data': chunk, 'meta': {'next_cursor': None if last else f"c{number + 1}"}})
+        offset = f"&offset={number * page_size}" if number else ''
+        table[f"/offsets?limit={page_size}{offset}"] = Route(body={'results': chunk, 'total': items})
+        page = f"&page={number + 1}" if number else ''
+        table[f"/pages?page_size={page_size}{page}"] = Route(body={'items': chunk})
+    # Past the last page
+    table[f"/offsets?limit={page_size}&offset={pages * page_size}"] = Route(body={'results': [], 'total': items})
+    table[f"/pages?page_size={page_size}&page={pages + 1}"] = Route(body={'items': []})
+    table['/cached'] = Route(body={'id': 'one'}, headers={'Cache-Control': 'max-age=300'})
+    table['/revalidated'] = Route(body={'id': 'one'}, headers={'Cache-Control': 'no-cache', 'ETag': '"v1"'})
+    return table
+
+
+def client_class(discovery):
+    generator = ToolGenerator(FakeES(), skip_index=True, cache=LookupCache(ttl=0, path=''))
+    context = generator._render_context(discovery)
+    namespace = {}
+    exec(compile(render('tool.py.j2', context), 'paged_api.py', 'exec'), namespace)
+    return namespace[context['class_name']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--first', type=int, default=250, help='Items an early-exiting reader takes')
+    parser.add_argument('--repeats', type=int, default=200, help='Reads of one cached resource')
+    args = parser.parse_args()
+
+    with StubServer(routes(args.items, args.page_size)) as stub:
+        Client = client_class(spec(stub.url))
+        client = Client(base_url=stub.url)
+        size = args.page_size
+        iterators = {
+            'link': lambda: client.iter_get_linked(per_page=size),
+            'cursor': lambda: client.iter_get_cursored(limit=size),
+            'offset': lambda: client.iter_get_offsets(limit=size),
+            'page': lambda: client.iter_get_pages(page_size=size),
+        }
+        print(f"{args.items} items, {size} per page")
+        print(f"\n{'style':<8} {'first ' + str(args.first):>12} {'all':>7} {'items':>7} "
+              f"{'lazy peak KB':>13} {'list peak KB':>13} {'s':>6}")
+        for style, make in iterators.items():
+            before = stub.request_count
+            for n, _ in enumerate(make(), 1):
+                if n == args.first:
+                    break
+            first = stub.request_count - before
+
+            before = stub.request_count
+            start = time.perf_counter()
+            tracemalloc.start()
+            seen = sum(1 for _ in make())
+            lazy_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            seconds = time.perf_counter() - start
+            every = stub.request_count - before
+
+            tracemalloc.start()
+            eager = len(list(make()))
+            list_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert seen == eager == args.items, (style, seen, eager)
+            print(f"{style:<8} {first:>12} {every:>7} {seen:>7} {lazy_peak / 1e3:>13.0f} "
+                  f"{list_peak / 1e3:>13.0f} {seconds:>6.2f}")
+
+        print(f"\n{'cache':<28} {'requests':>9} {'ms/read':>8}")
+        for label, cache_ttl, read in (
+            ('off', 0, 'get_cached'),
+            ('ttl 60s, max-age=300', 60, 'get_cached'),
+            ('ttl 60s, ETag + no-cache', 60, 'get_revalidated'),
+        ):
+            cached = Client(base_url=stub.url, cache_ttl=cache_ttl)
+            before = stub.request_count
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                getattr(cached, read)()
+            seconds = time.perf_counter() - start
+            print(f"{label:<28} {stub.request_count - before:>9} {seconds * 1000 / args.repeats:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Retrieval modes and re-ranking cost.
+
+Part one times the vectorized ``rank_hits`` against the original
+per-hit Python loop. Part two runs vector, hybrid and RRF retrieval on a
+synthetic catalog in the ES stand-in. It reports candidates fetched per
+query and hit@1 for queries that name a tool's domain. The stand-in model
+has no semantics, so the lexical leg is what finds the right tool here.
+
+    python -m benchmarks.bench_hybrid_search
+"""
+import argparse
+import random
+import time
+
+from src.agents.ranking import rank_hits
+from src.agents.search import CatalogSearch
+from src.embeddings.cache import EmbeddingCache
+from benchmarks.fake_es import FakeES
+from benchmarks.stand_in_model import StandInModel
+
+DOMAINS = ['weather', 'payments', 'git', 'maps', 'email', 'calendar', 'storage', 'translation',
+           'shipping', 'crypto', 'music', 'video', 'sms', 'search', 'news', 'sports']
+
+
+def loop_rank(hits):
+    # The pre-vectorization _rank_results, kept as the baseline
+    scored = []
+    for hit in hits:
+        tool = hit['_source']
+        es_score = hit['_score']
+        popularity_score = min(tool.get('usage_count', 0) / 1000.0, 1.0)
+        rating_score = tool.get('rating', 0) / 5.0
+        composite_score = es_score * 0.7 + popularity_score * 0.2 + rating_score * 0.1
+        scored.append({'tool': tool, 'relevance_score': es_score, 'popularity_score': popularity_score,
+                       'rating_score': rating_score, 'composite_score': composite_score})
+    scored.sort(key=lambda x: x['composite_score'], reverse=True)
+    return scored
+
+
+def time_rank(fn, hits, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(hits)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=800)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'candidates':>10} {'loop us':>9} {'numpy us':>9} {'top-5 us':>9}")
+    for size in (10, 100, 1000, 10000):
+        hits = [{'_id': str(i), '_score': rng.random(),
+                 '_source': {'usage_count': rng.randint(0, 5000), 'rating': rng.random() * 5}}
+                for i in range(size)]
+        repeat = max(3, 20000 // size)
+        print(f"{size:>10} {time_rank(loop_rank, hits, repeat):>9.1f} {time_rank(rank_hits, hits, repeat):>9.1f} "
+              f"{time_rank(lambda h: rank_hits(h, limit=5), hits, repeat):>9.1f}")
+
+    es = FakeES()
+    catalog = CatalogSearch(es, cache=EmbeddingCache('stand-in', 384), embedding_model=StandInModel())
+    tools = []
+    for i in range(args.tools):
+        domain = DOMAINS[i % len(DOMAINS)]
+        tool = {'tool_id': f"t{i}", 'tool_name': f"{domain}_{i}", 'display_name': f"{domain} api {i}",
+                'description': f"Tool {i} for {domain}", 'api_base_url': f"https://{domain}{i}.example",
+                'auth_type': ['none', 'api_key', 'bearer'][i % 3], 'categories': [domain],
+                'usage_count': rng.randint(0, 2000), 'rating': rng.random() * 5, 'endpoints_count': 5}
+        es.write('agent-tools', tool['tool_id'], tool)
+        tools.append(tool)
+    catalog.index_tools(tools)
+
+    queries = [rng.choice(DOMAINS) for _ in range(args.queries)]
+    print(f"\n{'retrieval':<16} {'hit@1':>6} {'hits/query':>11} {'ms/query':>9}")
+    for label, retrieval, filtered in [('vector', 'vector', False), ('hybrid', 'hybrid', False),
+                                       ('rrf', 'rrf', False), ('vector+filter', 'vector', True)]:
+        correct = fetched = 0
+        start = time.perf_counter()
+        for domain in queries:
+            filters = {'categories': [domain]} if filtered else None
+            hits = catalog.backend.search(catalog.encode([f"{domain} api"])[0], args.top_k,
+                                          num_candidates=50, filters=filters,
+                                          query_text=f"{domain} api", retrieval=retrieval)
+            fetched += len(hits)
+            ranked = catalog._rank_results(hits, normalize_relevance=(retrieval == 'hybrid'), limit=args.top_k)
+            correct += bool(ranked) and ranked[0]['tool']['tool_name'].startswith(f"{domain}_")
+        elapsed = (time.perf_counter() - start) / len(queries) * 1000
+        print(f"{label:<16} {correct / len(queries):>6.2f} {fetched / len(queries):>11.1f} {elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
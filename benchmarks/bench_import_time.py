@@ -0,0 +1,73 @@
+"""Cold-start latency per CLI command, with a regression gate.
+
+Each sample is a fresh interpreter that imports ``src.cli`` plus the
+modules the command pulls in, then prints its own elapsed time. The
+script exits non-zero when a command's median exceeds its budget, or when
+a command that never embeds ends up importing the embedding stack.
+
+    python -m benchmarks.bench_import_time --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ['sentence_transformers', 'torch', 'transformers']
+
+COMMANDS = {
+    'help': [],
+    'generate': ['src.agents.introspector', 'src.agents.generator', 'src.elasticsearch.client'],
+    'generate-batch': ['src.batch', 'src.agents.search', 'src.elasticsearch.client'],
+    'setup': ['elasticsearch', 'src.elasticsearch.schemas'],
+    'search': ['src.agents.search', 'src.elasticsearch.client'],
+}
+
+# Commands allowed to load the model; they still must not import it up front
+EMBEDDING_COMMANDS = {'search', 'generate-batch'}
+
+PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+import src.cli
+for name in {modules!r}:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def sample(modules):
+    code = PROBE.format(modules=modules, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000.0, help='Max median cold start per command')
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'command':<16} {'median ms':>10} {'max ms':>8}  heavy imports")
+    for command, modules in COMMANDS.items():
+        runs = [sample(modules) for _ in range(args.runs)]
+        timings = [run['ms'] for run in runs]
+        heavy = sorted({m for run in runs for m in run['heavy']})
+        median = statistics.median(timings)
+        print(f"{command:<16} {median:>10.1f} {max(timings):>8.1f}  {', '.join(heavy) or '-'}")
+
+        if median > args.budget_ms:
+            print(f"  FAIL: {command} cold start {median:.0f}ms exceeds {args.budget_ms:.0f}ms")
+            failed = True
+        if heavy:
+            reason = 'imported eagerly' if command in EMBEDDING_COMMANDS else 'never needs embeddings'
+            print(f"  FAIL: {command} loaded {', '.join(heavy)} ({reason})")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Cost of instrumentation, disabled and enabled, per call and on a full batch run.
+
+    python -m benchmarks.bench_instrumentation --hosts 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from src import instrumentation
+from src.batch import BatchPipeline
+from src.lookup_cache import LookupCache
+from benchmarks.bench_batch import stand_in_catalog, start_hosts
+from benchmarks.fake_es import FakeES
+
+
+def per_call_ns(calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        with instrumentation.span('bench'):
+            pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def batch_seconds(urls, es_latency: float, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            es = FakeES(latency=es_latency)
+            pipeline = BatchPipeline(es, os.path.join(tmp, 'tools'), os.path.join(tmp, 'report.jsonl'),
+                                     search_agent=stand_in_catalog(es))
+            # A fresh cache each run, so every run does the same lookups
+            pipeline.introspector.cache = pipeline.generator.cache = LookupCache()
+            best = min(best, pipeline.run(urls).elapsed_seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.01, help='Fake API latency per request')
+    parser.add_argument('--es-latency', type=float, default=0.002)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--calls', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    off = per_call_ns(args.calls)
+    instrumentation.enable()
+    on = per_call_ns(args.calls // 10)
+    instrumentation.disable()
+    print(f"span(): {off:.0f} ns disabled, {on:.0f} ns enabled")
+
+    servers = start_hosts(args.hosts, args.latency, endpoints=20)
+    urls = [s.url for s in servers]
+    try:
+        disabled = batch_seconds(urls, args.es_latency, args.repeat)
+        instrumentation.enable()
+        enabled = batch_seconds(urls, args.es_latency, args.repeat)
+        instrumentation.disable()
+    finally:
+        for server in servers:
+            server.stop()
+
+    spans = sum(stats['count'] for stats in instrumentation.recorder.snapshot()['spans'].values())
+    per_run = spans / args.repeat
+    print(f"batch of {args.hosts}: {disabled:.3f}s disabled, {enabled:.3f}s enabled "
+          f"({(enabled / disabled - 1) * 100:+.1f}%), {per_run:.0f} spans per run")
+    # Disabled overhead: every span site still pays one no-op call
+    print(f"estimated disabled overhead: {per_run * off / 1e9 / disabled * 100:.4f}% of the run")
+    print()
+    print(instrumentation.summary(), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
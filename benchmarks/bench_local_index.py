@@ -0,0 +1,83 @@
+"""In-process vector index: snapshot load time, exact and IVF search latency, IVF recall.
+
+    python -m benchmarks.bench_local_index --tools 100000
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from src.backends import LocalVectorIndex
+
+
+def synthetic_tools(count: int, dims: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # Clustered vectors look more like real description embeddings than uniform noise
+    centers = rng.standard_normal((max(1, count // 500), dims)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.3 * rng.standard_normal((count, dims)).astype(np.float32)
+    for i, vector in enumerate(vectors):
+        yield {
+            'tool_id': f"tool{i}", 'tool_name': f"tool_{i}", 'display_name': f"Tool {i}",
+            'description': f"Synthetic tool {i}", 'api_base_url': f"https://api{i}.example",
+            'auth_type': ['none', 'api_key', 'bearer', 'oauth2'][i % 4], 'usage_count': i % 1000,
+            'rating': i % 5, 'endpoints_count': 10, 'description_embedding': vector
+        }
+
+
+def latency_ms(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=100000)
+    parser.add_argument('--dims', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--nprobe', type=int, default=8)
+    args = parser.parse_args()
+
+    index = LocalVectorIndex(args.dims)
+    start = time.perf_counter()
+    index.add(synthetic_tools(args.tools, args.dims))
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    index.build_ivf()
+    ivf_build = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    queries = index.vectors[rng.integers(0, args.tools, args.queries)] + 0.1 * rng.standard_normal(
+        (args.queries, args.dims)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as path:
+        index.save(path)
+        start = time.perf_counter()
+        loaded = LocalVectorIndex.load(path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        exact = latency_ms(lambda q: loaded.search(q, args.top_k, method='exact'), queries)
+        ivf = latency_ms(lambda q: loaded.search(q, args.top_k, method='ivf', nprobe=args.nprobe), queries)
+        filtered = latency_ms(lambda q: loaded.search(q, args.top_k, filters={'auth_type': 'bearer'}), queries)
+
+        recall = np.mean([
+            len({h['_id'] for h in loaded.search(q, args.top_k, method='exact')} &
+                {h['_id'] for h in loaded.search(q, args.top_k, method='ivf', nprobe=args.nprobe)}) / args.top_k
+            for q in queries
+        ])
+
+    print(f"tools: {args.tools}  add: {build:.2f}s  ivf build: {ivf_build:.2f}s  snapshot load: {load_ms:.2f}ms")
+    print(f"{'mode':<14} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'exact':<14} {exact[0]:>8.3f} {exact[1]:>8.3f}")
+    print(f"{'ivf':<14} {ivf[0]:>8.3f} {ivf[1]:>8.3f}")
+    print(f"{'exact+filter':<14} {filtered[0]:>8.3f} {filtered[1]:>8.3f}")
+    print(f"ivf recall@{args.top_k} (nprobe={args.nprobe}): {recall:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Elasticsearch round-trips and probe time saved by the lookup cache on repeat runs.
+
+Every URL is looked up the way ``agent-nexus generate`` does it. The first
+run starts with an empty SQLite-backed cache. The second run opens a new
+cache on the same file, the way a later process would. Dead hosts are
+closed local ports.
+
+    python -m benchmarks.bench_lookup_cache --apis 200 --dead 10
+"""
+import argparse
+import os
+import socket
+import tempfile
+import time
+
+from src.agents.generator import ToolGenerator
+from src.agents.introspector import APIIntrospector
+from src.lookup_cache import LookupCache
+from src.urls import discovery_doc_id
+from benchmarks.fake_es import FakeES
+
+
+def closed_port_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def seed(es: FakeES, count: int):
+    urls = []
+    for i in range(count):
+        url = f"https://api{i}.example.com"
+        discovery = {'api_url': url, 'api_name': f"API {i}", 'api_description': '', 'base_url': url,
+                     'auth_type': 'none', 'endpoints': [], 'total_endpoints': 0,
+                     'discovery_status': 'complete'}
+        es.data.setdefault('api-discoveries', {})[discovery_doc_id(url)] = discovery
+        es.data.setdefault('agent-tools', {})[f"tool{i}"] = {'tool_id': f"tool{i}", 'tool_name': f"api_{i}",
+                                                            'source_api_discovery_id': url}
+        urls.append(url)
+    return urls
+
+
+def run(es: FakeES, cache: LookupCache, urls, dead):
+    introspector = APIIntrospector(es, cache=cache)
+    generator = ToolGenerator(es, cache=cache)
+    before = es.request_count
+    start = time.perf_counter()
+    for url in urls:
+        discovery = introspector.discover(url)
+        generator.generate(url, discovery_data=discovery)
+    lookups = time.perf_counter() - start
+
+    start = time.perf_counter()
+    failed = sum(introspector.discover(url)['discovery_status'] == 'failed' for url in dead)
+    probing = time.perf_counter() - start
+    return es.request_count - before, lookups, failed, probing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apis', type=int, default=200, help='APIs already discovered and generated')
+    parser.add_argument('--dead', type=int, default=10, help='Unreachable hosts')
+    parser.add_argument('--es-latency', type=float, default=0.005, help='Stand-in ES latency per call')
+    args = parser.parse_args()
+
+    es = FakeES(latency=args.es_latency)
+    urls = seed(es, args.apis)
+    dead = [closed_port_url() for _ in range(args.dead)]
+
+    print(f"{'run':<22} {'ES calls':>9} {'lookup s':>9} {'dead failed':>12} {'dead s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'lookups.sqlite')
+        rows = [('no cache', LookupCache(ttl=0, backoff=0.001, max_backoff=0.001)),
+                ('cold (first run)', LookupCache(path=path)),
+                ('warm (next process)', LookupCache(path=path))]
+        for label, cache in rows:
+            calls, lookups, failed, probing = run(es, cache, urls, dead)
+            print(f"{label:<22} {calls:>9} {lookups:>9.3f} {failed:>12} {probing:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Workflow wall time against the critical path and the sum of its calls.
+
+Two stub APIs with fixed per-route latency serve a fan-out workflow. One
+user lookup feeds three per-user listings through an inferred ``{login}``
+binding, next to two independent calls on the other API. The workflow is
+run one call at a time, then concurrently, then again with the GET cache
+warm.
+
+    python -m benchmarks.bench_orchestrator --latency-ms 50 --runs 5
+"""
+import argparse
+import statistics
+
+from src.agents.workflow import Workflow, WorkflowExecutor
+from src.lookup_cache import LookupCache
+from src.transport import Transport
+from benchmarks.stub_server import Route, StubServer
+
+
+def _object(*fields):
+    return {'200': {'content': {'application/json': {'schema': {
+        'type': 'object', 'properties': {field: {'type': 'string'} for field in fields}}}}}}
+
+
+def _list(*fields):
+    return {'200': {'content': {'application/json': {'schema': {
+        'type': 'array', 'items': {'type': 'object', 'properties': {field: {'type': 'string'} for field in fields}}}}}}}
+
+
+def _endpoint(path, responses):
+    return {'method': 'GET', 'path': path, 'parameters': [], 'responses': responses}
+
+
+def workflow(users_url: str, orgs_url: str) -> Workflow:
+    steps = [
+        {'id': 'me', 'base_url': users_url, 'endpoint': _endpoint('/user', _object('login', 'id'))},
+        {'id': 'org_list', 'base_url': orgs_url, 'endpoint': _endpoint('/orgs', _list('org', 'id'))},
+        {'id': 'rate', 'base_url': orgs_url, 'endpoint': _endpoint('/rate_limit', _object('remaining'))},
+    ]
+    for listing in ('repos', 'followers', 'gists'):
+        steps.append({'id': listing, 'base_url': users_url,
+                      'endpoint': _endpoint(f"/users/{{login}}/{listing}", _list('id'))})
+    # Same request as ``me``: shares its in-flight response instead of a second call
+    steps.append({'id': 'me_again', 'base_url': users_url, 'endpoint': _endpoint('/user', _object('login'))})
+    return Workflow.from_dicts(steps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency-ms', type=float, default=50, help='Base latency of every stub route')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    delay = args.latency_ms / 1000
+    users = StubServer({
+        '/user': Route(body={'login': 'octocat', 'id': 1}, delay=delay),
+        '/users/octocat/repos': Route(body=[{'id': 1}], delay=delay * 2),
+        '/users/octocat/followers': Route(body=[{'id': 2}], delay=delay * 1.5),
+        '/users/octocat/gists': Route(body=[{'id': 3}], delay=delay),
+    })
+    orgs = StubServer({
+        '/orgs': Route(body=[{'org': 'github', 'id': 1}], delay=delay * 2),
+        '/rate_limit': Route(body={'remaining': 5000}, delay=delay / 2),
+    })
+
+    with users, orgs:
+        transport = Transport()
+        plan = workflow(users.url, orgs.url)
+        inferred = plan.steps['repos'].args['login']
+        print(f"{len(plan.steps)} steps, order {plan.order}; repos.login <- {inferred}")
+
+        cases = [
+            ('sequential', dict(max_concurrency=1), True),
+            ('concurrent', dict(), True),
+            ('warm cache', dict(), False),
+        ]
+        print(f"{'mode':<12} {'wall ms':>9} {'critical ms':>12} {'sum ms':>9} {'requests':>9}")
+        for label, options, cold in cases:
+            walls, critical, sums, requests = [], [], [], []
+            cache = LookupCache(ttl=60, path=None)
+            if not cold:
+                WorkflowExecutor(transport=transport, cache=cache).run(plan)
+            for _ in range(args.runs):
+                if cold:
+                    cache = LookupCache(ttl=60, path=None)
+                executor = WorkflowExecutor(transport=transport, cache=cache, **options)
+                before = users.request_count + orgs.request_count
+                result = executor.run(plan)
+                assert result['status'] == 'completed', result
+                requests.append(users.request_count + orgs.request_count - before)
+                walls.append(result['elapsed_ms'])
+                critical.append(result['critical_path_ms'])
+                sums.append(result['sum_ms'])
+            print(f"{label:<12} {statistics.median(walls):>9.1f} {statistics.median(critical):>12.1f} "
+                  f"{statistics.median(sums):>9.1f} {statistics.median(requests):>9.0f}")
+        transport.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Conditional refresh sweep vs full re-discovery of the same catalog.
+
+Half of the fake APIs send an ETag, so their refresh is a 304. The rest
+are matched by content hash. ``--changed`` of them get a new endpoint
+before the sweep.
+
+    python -m benchmarks.bench_refresh --apis 200 --endpoints 500 --changed 0.1
+"""
+import argparse
+import copy
+import tempfile
+import time
+
+from src.batch import BatchPipeline
+from src.lookup_cache import get_lookup_cache
+from src.refresh import RefreshPipeline
+from benchmarks.bench_batch import stand_in_catalog
+from benchmarks.fake_es import FakeES
+from benchmarks.specs import large_spec
+from benchmarks.stub_server import Route, StubServer
+
+
+def full_run(urls, output_dir):
+    # A fresh cluster: lookups cached against the previous one would not find their endpoints
+    get_lookup_cache().clear()
+    es = FakeES()
+    catalog = stand_in_catalog(es)
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = BatchPipeline(es, output_dir, f"{tmp}/report.jsonl", search_agent=catalog)
+        start = time.perf_counter()
+        pipeline.run(urls)
+        elapsed = time.perf_counter() - start
+    return es, catalog, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apis', type=int, default=200)
+    parser.add_argument('--endpoints', type=int, default=500)
+    parser.add_argument('--changed', type=float, default=0.1, help='Share of specs changed before the sweep')
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    base = large_spec(endpoints=args.endpoints, schemas=20)
+
+    def spec_for(i, added=False):
+        spec = copy.deepcopy(base)
+        spec['info']['title'] = f"Refresh API {i}"
+        if added:
+            # First in the document, so it survives MAX_ENDPOINTS_PER_TOOL
+            added_path = {'get': {'summary': 'Added endpoint', 'responses': {'200': {'description': 'OK'}}}}
+            spec['paths'] = {'/added': added_path, **spec['paths']}
+        return spec
+
+    # One host per API: the batch pipeline dedupes URLs by host
+    servers = [StubServer({'/openapi.json': Route(body=spec_for(i), headers={'ETag': f'"v1-{i}"'} if i % 2 == 0 else {})}).start()
+               for i in range(args.apis)]
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            urls = [server.url for server in servers]
+            es, catalog, _ = full_run(urls, output_dir)
+            _, _, full_seconds = full_run(urls, output_dir)
+
+            changed = set(range(0, args.apis, max(1, round(1 / args.changed)))) if args.changed else set()
+            for i in changed:
+                headers = {'ETag': f'"v2-{i}"'} if i % 2 == 0 else {}
+                servers[i].routes['/openapi.json'] = Route(body=spec_for(i, added=True), headers=headers)
+
+            model_calls = catalog.embedding_model.calls
+            requests_before = sum(server.request_count for server in servers)
+            stats = RefreshPipeline(es, output_dir=output_dir, search_agent=catalog, workers=args.workers).run()
+            requests = sum(server.request_count for server in servers) - requests_before
+    finally:
+        for server in servers:
+            server.stop()
+
+    print(f"{args.apis} APIs x {args.endpoints} endpoints, {len(changed)} changed")
+    print(f"  full re-discovery: {full_seconds:.2f}s")
+    print(f"  refresh sweep:     {stats.elapsed_seconds:.2f}s, {requests} HTTP requests, "
+          f"{catalog.embedding_model.calls - model_calls} model calls")
+    print(f"  {stats.to_dict()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Regenerating a catalog into an existing output directory, and big-spec rendering on the pool.
+
+Part one writes N tools, then writes them again with a tenth changed.
+Unchanged files must not be rewritten, so their mtimes survive. Part two
+renders one huge spec inline and then on the process pool. The pool only
+pays off with more than one core. Generation skips it on single-core
+hosts, but this benchmark forces it so the overhead is visible.
+
+    python -m benchmarks.bench_regenerate --tools 1000 --big 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.agents.generator import ToolGenerator
+from src.config import Config
+from benchmarks.bench_render import discovery_for
+from benchmarks.fake_es import FakeES
+
+
+def small_discovery(i: int, version: int = 1):
+    endpoints = [{'path': f"/items{j}", 'method': 'GET', 'summary': f"List items {j} v{version}"} for j in range(20)]
+    return {'api_url': f"https://api{i}.example.com", 'api_name': f"Catalog API {i}",
+            'api_description': f"API {i}", 'base_url': f"https://api{i}.example.com", 'auth_type': 'none',
+            'endpoints': endpoints, 'total_endpoints': len(endpoints)}
+
+
+def write_catalog(generator, discoveries, out):
+    start = time.perf_counter()
+    for discovery in discoveries:
+        tool_data = generator.generate(discovery['api_url'], discovery_data=discovery)
+        generator.write_files(tool_data, out, discovery_data=discovery)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=1000)
+    parser.add_argument('--big', type=int, default=20000, help='Endpoints in the big spec')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as out:
+        generator = ToolGenerator(FakeES(), skip_index=True)
+        first = write_catalog(generator, [small_discovery(i) for i in range(args.tools)], out)
+        written = generator.files_written
+        mtimes = {name: os.stat(os.path.join(out, name)).st_mtime_ns for name in os.listdir(out)}
+
+        generator = ToolGenerator(FakeES(), skip_index=True)
+        changed = [small_discovery(i, version=2 if i % 10 == 0 else 1) for i in range(args.tools)]
+        second = write_catalog(generator, changed, out)
+        touched = sum(os.stat(os.path.join(out, name)).st_mtime_ns != mtime for name, mtime in mtimes.items())
+        leftovers = [name for name in os.listdir(out) if name.endswith('.tmp')]
+        print(f"first write:  {args.tools} tools, {written} files in {first:.2f}s")
+        print(f"regenerate:   {generator.files_written} rewritten, {generator.files_unchanged} unchanged, "
+              f"{touched} mtimes changed, {len(leftovers)} temp files left, {second:.2f}s")
+
+    discovery = discovery_for(args.big)
+    Config.render_workers = Config.render_workers or max(2, os.cpu_count() or 1)
+    for label, threshold in (('inline', 0), ('process pool', 1)):
+        Config.render_pool_min_endpoints = threshold
+        generator = ToolGenerator(FakeES())
+        generator._check_existing_tool = lambda api_url: None
+        generator._store_tool = lambda tool_data: None
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            generator.generate(discovery['api_url'], discovery_data=discovery)
+            timings.append(time.perf_counter() - start)
+        print(f"{args.big} endpoints, {label:<12}: first {timings[0] * 1000:.0f} ms, best {min(timings) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Relationship lookups: computed on demand vs the precomputed CSR graph.
+
+Synthetic APIs each produce and consume a few fields drawn from a skewed
+vocabulary. The benchmark times a full build, neighbour lookups on the
+memory-mapped graph after a reload, and adding one API incrementally.
+That is set against the on-demand path, which rebuilds the relationships
+from every discovery for each question.
+
+    python -m benchmarks.bench_relationships --apis 2000 --lookups 2000
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from src.agents.relationships import RelationshipGraph
+
+
+def _endpoint(path, produces, consumes):
+    properties = {field: {'type': 'string'} for field in produces}
+    return {
+        'method': 'GET',
+        'path': path,
+        'parameters': [{'name': field, 'in': 'query'} for field in consumes],
+        'responses': {'200': {'content': {'application/json': {'schema': {'type': 'object', 'properties': properties}}}}}
+    }
+
+
+def discoveries(apis: int, vocabulary: int, endpoints: int, seed: int = 7):
+    rng = random.Random(seed)
+    # Zipf-like field popularity: a few fields are everywhere, most are rare
+    fields = [f"field_{i}" for i in range(vocabulary)]
+    weights = [1 / (i + 1) for i in range(vocabulary)]
+    for i in range(apis):
+        yield {
+            'api_url': f"https://api{i}.example.com",
+            'endpoints': [_endpoint(f"/r{j}", rng.choices(fields, weights, k=4), rng.choices(fields, weights, k=2))
+                          for j in range(endpoints)]
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apis', type=int, default=2000)
+    parser.add_argument('--vocabulary', type=int, default=20000, help='Distinct field names')
+    parser.add_argument('--endpoints', type=int, default=10, help='Endpoints per API')
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--max-fanout', type=int, default=None, help='Defaults to RELATIONSHIP_MAX_FANOUT')
+    args = parser.parse_args()
+
+    catalog = list(discoveries(args.apis, args.vocabulary, args.endpoints))
+    rng = random.Random(1)
+
+    start = time.perf_counter()
+    graph = RelationshipGraph.build(catalog, args.max_fanout)
+    build_seconds = time.perf_counter() - start
+    edges = len(graph.arrays['out_indices'])
+    print(f"build        {build_seconds:>9.3f}s  {len(graph)} APIs, {edges} edges")
+
+    on_demand = []
+    for api in rng.sample(catalog, 3):
+        start = time.perf_counter()
+        RelationshipGraph.build(catalog, args.max_fanout).neighbors(api['api_url'])
+        on_demand.append(time.perf_counter() - start)
+    print(f"on demand    {sum(on_demand) / len(on_demand) * 1000:>9.1f}ms per lookup (rebuild from discoveries)")
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        graph.save(path)
+        save_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = RelationshipGraph.load(path, args.max_fanout)
+        print(f"save/load    {save_seconds:>9.3f}s / {time.perf_counter() - start:.3f}s")
+
+        urls = [rng.choice(catalog)['api_url'] for _ in range(args.lookups)]
+        start = time.perf_counter()
+        degree = sum(len(loaded.neighbors(url)) for url in urls)
+        seconds = time.perf_counter() - start
+        print(f"graph        {seconds / len(urls) * 1e6:>9.1f}us per lookup (mean degree {degree / len(urls):.1f})")
+
+        new = next(discoveries(1, args.vocabulary, args.endpoints, seed=99))
+        new['api_url'] = 'https://new.example.com'
+        start = time.perf_counter()
+        added = loaded.add(new['api_url'], new['endpoints'])
+        add_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded.save()
+        print(f"add one API  {add_seconds * 1000:>9.2f}ms ({added} edges), incremental save "
+              f"{(time.perf_counter() - start) * 1000:.2f}ms")
+
+        reloaded = RelationshipGraph.load(path, args.max_fanout)
+        fresh = RelationshipGraph.build(catalog + [new], args.max_fanout)
+        for url in [new['api_url']] + urls[:200]:
+            got = sorted((e['api_url'], e['direction'], tuple(e['fields'])) for e in reloaded.neighbors(url))
+            want = sorted((e['api_url'], e['direction'], tuple(e['fields'])) for e in fresh.neighbors(url))
+            assert got == want, url
+        print("incremental graph matches a full rebuild")
+
+
+if __name__ == '__main__':
+    main()
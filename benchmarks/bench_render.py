@@ -0,0 +1,61 @@
+"""Tool rendering time per 1k endpoints.
+
+``string`` renders the artifacts into the tool document, the way
+indexed generation does. ``stream`` writes them straight to files from
+the templates, the way ``--skip-index`` generation does. The first
+render in a fresh process includes template compilation, or loading it
+from the bytecode cache.
+
+    python -m benchmarks.bench_render --endpoints 1000 5000 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.agents.generator import ToolGenerator
+from src.agents.spec_parser import parse_spec
+from benchmarks.fake_es import FakeES
+from benchmarks.specs import large_spec
+
+
+def discovery_for(endpoints: int):
+    parsed = parse_spec(large_spec(endpoints=endpoints, schemas=20))
+    endpoints = [endpoint.to_dict() for endpoint in parsed.endpoints]
+    return {
+        'api_url': 'https://api.example.com', 'api_name': 'Large Synthetic API',
+        'api_description': 'Benchmark API', 'base_url': 'https://api.example.com',
+        'auth_type': 'bearer', 'endpoints': endpoints, 'total_endpoints': len(endpoints)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoints', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from src.templates import get_environment
+    get_environment()
+    print(f"environment + template compile: {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    print(f"{'endpoints':>9} {'mode':<7} {'ms':>8} {'ms/1k':>7} {'code KB':>8}")
+    with tempfile.TemporaryDirectory() as out:
+        for count in args.endpoints:
+            discovery = discovery_for(count)
+            for mode in ('string', 'stream'):
+                generator = ToolGenerator(FakeES(), skip_index=(mode == 'stream'))
+                generator._check_existing_tool = lambda api_url: None
+                best = float('inf')
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    tool_data = generator.generate(discovery['api_url'], discovery_data=discovery)
+                    paths = generator.write_files(tool_data, out, discovery_data=discovery)
+                    best = min(best, time.perf_counter() - start)
+                size = os.path.getsize(paths['tool_file']) / 1024
+                print(f"{count:>9} {mode:<7} {best * 1000:>8.1f} {best * 1000 / count * 1000:>7.1f} {size:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
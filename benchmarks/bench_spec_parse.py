@@ -0,0 +1,114 @@
+"""Peak RSS and time of OpenAPI parsing on large synthetic specs.
+
+Each measurement runs in a fresh interpreter so peak RSS is not shared
+between modes. ``eager`` is the previous parser: ``json.load`` plus one
+dict per endpoint carrying its raw parameters, body and responses.
+``dict`` decodes the whole document and then builds compact records.
+``stream`` parses the file incrementally (needs ijson).
+
+    python -m benchmarks.bench_spec_parse --endpoints 5000 20000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ['eager', 'dict', 'stream']
+
+
+def child(mode: str, path: str, max_endpoints: int) -> None:
+    from src.agents.spec_parser import SpecFile, parse_spec, ijson
+
+    start = time.perf_counter()
+    interned = 0
+    with open(path, 'rb') as f:
+        if mode == 'eager':
+            spec = json.load(f)
+            endpoints = []
+            for route, methods in spec.get('paths', {}).items():
+                for method, details in methods.items():
+                    if method in ['get', 'post', 'put', 'patch', 'delete']:
+                        endpoints.append({
+                            'path': route, 'method': method.upper(),
+                            'summary': details.get('summary', ''),
+                            'description': details.get('description', ''),
+                            'parameters': details.get('parameters', []),
+                            'request_body': details.get('requestBody'),
+                            'responses': details.get('responses', {})
+                        })
+        else:
+            if mode == 'stream' and ijson is None:
+                print(json.dumps({'skipped': 'ijson is not installed'}))
+                return
+            spec = SpecFile.open(f) if mode == 'stream' else json.load(f)
+            parsed = parse_spec(spec, max_endpoints=max_endpoints)
+            endpoints = [endpoint.to_dict() for endpoint in parsed.endpoints]
+            interned = len(parsed.interner)
+
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'seconds': elapsed, 'peak_rss_mb': peak, 'endpoints': len(endpoints),
+                      'interned': interned}))
+
+
+def write_spec(path: str, endpoints: int) -> None:
+    # Built in a child too: Linux carries a parent's peak RSS into forked children
+    subprocess.run(
+        [sys.executable, '-c', 'import json, sys; from benchmarks.specs import large_spec; '
+                               'json.dump(large_spec(endpoints=int(sys.argv[2])), open(sys.argv[1], "w"))',
+         path, str(endpoints)],
+        check=True
+    )
+
+
+def measure(mode: str, path: str, max_endpoints: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_spec_parse', '--child', mode, path, str(max_endpoints)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def baseline_rss() -> float:
+    out = subprocess.run(
+        [sys.executable, '-c', 'import resource, src.agents.spec_parser; '
+                               'print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)'],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(out)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        return child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoints', type=int, nargs='+', default=[5000, 20000])
+    parser.add_argument('--max-endpoints', type=int, nargs='+', default=[0, 50],
+                        help='Endpoint caps to test; 0 keeps all')
+    args = parser.parse_args()
+
+    print(f"interpreter + parser baseline: {baseline_rss():.1f} MB RSS\n")
+    print(f"{'endpoints':>9} {'file MB':>8} {'cap':>5} {'mode':<7} {'peak MB':>8} {'seconds':>8} {'kept':>6} {'interned':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.endpoints:
+            path = os.path.join(tmp, f"spec{count}.json")
+            write_spec(path, count)
+            size = os.path.getsize(path) / 1e6
+            for cap in args.max_endpoints:
+                for mode in MODES:
+                    result = measure(mode, path, cap)
+                    if 'skipped' in result:
+                        print(f"{count:>9} {size:>8.1f} {cap:>5} {mode:<7} skipped: {result['skipped']}")
+                        continue
+                    print(f"{count:>9} {size:>8.1f} {cap:>5} {mode:<7} {result['peak_rss_mb']:>8.1f} "
+                          f"{result['seconds']:>8.2f} {result['endpoints']:>6} {result['interned']:>8}")
+
+
+if __name__ == '__main__':
+    main()
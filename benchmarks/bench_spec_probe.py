@@ -0,0 +1,52 @@
+"""Sequential vs concurrent OpenAPI spec probing against a slow local host.
+
+    python -m benchmarks.bench_spec_probe --latency 1.0
+"""
+import argparse
+import time
+
+from src.agents.introspector import APIIntrospector
+from benchmarks.stub_server import Route, StubServer
+
+SPEC = {'openapi': '3.0.0', 'info': {'title': 'Stub API'}, 'paths': {}}
+
+
+def measure(introspector: APIIntrospector, api_url: str, repeat: int):
+    timings = []
+    found = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = introspector._find_openapi_spec(api_url)
+        timings.append(time.perf_counter() - start)
+    return min(timings), found is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=1.0, help='Delay on paths without a spec')
+    parser.add_argument('--spec-latency', type=float, default=0.2, help='Delay on the spec path')
+    parser.add_argument('--deadline', type=float, default=5.0, help='Concurrent probe deadline')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # The spec lives at the last candidate path: worst case for sequential probing
+    spec_path = APIIntrospector.COMMON_SPEC_PATHS[-1]
+    routes = {spec_path: Route(body=SPEC, delay=args.spec_latency)}
+
+    with StubServer(routes, default_delay=args.latency) as server:
+        scenarios = [
+            ('spec on last path', server.url),
+            ('no spec (all slow)', server.url + '/missing'),
+        ]
+        print(f"{'scenario':<22} {'mode':<11} {'seconds':>8}  found")
+        for label, api_url in scenarios:
+            for mode, concurrent in [('sequential', False), ('concurrent', True)]:
+                introspector = APIIntrospector(None, skip_index=True, concurrent_probe=concurrent,
+                                               probe_deadline=args.deadline)
+                introspector.probe_timeout = max(args.latency, args.spec_latency) + 1
+                seconds, found = measure(introspector, api_url, args.repeat)
+                print(f"{label:<22} {mode:<11} {seconds:>8.3f}  {found}")
+
+
+if __name__ == '__main__':
+    main()
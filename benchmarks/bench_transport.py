@@ -0,0 +1,56 @@
+"""Connection setup cost: module-level ``requests.get`` vs the shared Transport.
+
+Probes many paths on one local host, first sequentially and then from a
+thread pool, and reports how many TCP connections the server accepted.
+
+    python -m benchmarks.bench_transport --paths 500 --threads 8
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import time
+
+import requests
+
+from src.transport import Transport
+from benchmarks.stub_server import Route, StubServer
+
+
+def run(get, urls, threads: int) -> float:
+    start = time.perf_counter()
+    if threads <= 1:
+        for url in urls:
+            get(url).content
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            for response in pool.map(get, urls):
+                response.content
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paths', type=int, default=500, help='Distinct paths probed per run')
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    routes = {f"/v1/items/{i}": Route(body={'id': i}) for i in range(args.paths)}
+    clients = [
+        ('requests.get', lambda: (lambda url: requests.get(url, timeout=5), None)),
+        ('Transport', lambda: (lambda t: (t.get, t))(Transport(max_per_host=args.threads))),
+    ]
+
+    print(f"{'client':<14} {'threads':>7} {'seconds':>8} {'req/s':>8} {'connections':>12}")
+    for threads in (1, args.threads):
+        for label, make in clients:
+            with StubServer(routes) as server:
+                urls = [f"{server.url}{path}" for path in routes]
+                get, transport = make()
+                seconds = run(get, urls, threads)
+                if transport is not None:
+                    transport.close()
+                print(f"{label:<14} {threads:>7} {seconds:>8.3f} {len(urls) / seconds:>8.0f} "
+                      f"{server.connection_count:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Usage ingestion, rollup and popularity-table ranking against a stand-in ES.
+
+Part one ingests usage events one ``index`` call at a time, and then
+through ``UsageLogger``'s bulk writes. Part two rolls the logs up onto the
+tool documents. Part three ranks hits with usage read from ``_source``,
+and then from the ``PopularityTable`` the rollup filled.
+
+    python -m benchmarks.bench_usage --tools 500 --events 20000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from src.agents.ranking import rank_hits
+from src.usage import UsageLogger, UsageRollup, usage_event
+from benchmarks.fake_es import FakeES
+
+
+def events(tools: int, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    # Zipf-like: a few tools get most of the traffic
+    weights = [1.0 / (rank + 1) for rank in range(tools)]
+    for tool in rng.choices(range(tools), weights=weights, k=count):
+        yield {'tool_id': f"tool{tool}", 'execution_success': rng.random() < 0.9,
+               'execution_time_ms': rng.uniform(20, 800), 'agent_id': f"agent{rng.randrange(20)}"}
+
+
+def seed_tools(es: FakeES, tools: int):
+    for i in range(tools):
+        es.data.setdefault('agent-tools', {})[f"tool{i}"] = {
+            'tool_id': f"tool{i}", 'tool_name': f"tool_{i}", 'rating': round(random.Random(i).uniform(1, 5), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tools', type=int, default=500)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--es-latency', type=float, default=0.001, help='Stand-in ES latency per call')
+    parser.add_argument('--hits', type=int, default=100, help='Hits per ranked query')
+    args = parser.parse_args()
+
+    sample = list(events(args.tools, args.events))
+
+    es = FakeES(latency=args.es_latency)
+    per_event = sample[:max(1, args.events // 20)]
+    start = time.perf_counter()
+    for event in per_event:
+        document = usage_event(**event)
+        es.index('tool-usage-logs', document['log_id'], document)
+    single = (time.perf_counter() - start) / len(per_event) * len(sample)
+    print(f"ingest {len(sample)} events, one request each: {single:.2f}s (extrapolated from {len(per_event)})")
+
+    es = FakeES(latency=args.es_latency)
+    seed_tools(es, args.tools)
+    start = time.perf_counter()
+    with UsageLogger(es) as usage:
+        usage.log_many(sample)
+    print(f"ingest {len(sample)} events, UsageLogger bulk: {time.perf_counter() - start:.2f}s "
+          f"in {es.request_count} requests")
+
+    before = es.request_count
+    rollup = UsageRollup(es)
+    stats = rollup.run()
+    stored = sum(doc.get('usage_count', 0) for doc in es.data['agent-tools'].values())
+    print(f"rollup: {stats['tools']} tools, {stats['events']} events ({stored} stored) "
+          f"in {stats['elapsed_seconds']:.2f}s, {es.request_count - before} requests")
+
+    rng = np.random.default_rng(0)
+    tools = es.data['agent-tools']
+    ids = list(tools)
+    queries = [rng.choice(len(ids), size=min(args.hits, len(ids)), replace=False) for _ in range(200)]
+    full = [[{'_id': ids[i], '_score': float(rng.random()), '_source': dict(tools[ids[i]])} for i in q]
+            for q in queries]
+    # What a backend returning only catalog fields hands the ranker
+    slim = [[{'_id': h['_id'], '_score': h['_score'], '_source': {'tool_id': h['_id']}} for h in hits]
+            for hits in full]
+    for label, hits_list, table in [('_source fields', full, None),
+                                    ('popularity table', slim, rollup.table)]:
+        start = time.perf_counter()
+        ranked = [rank_hits(hits, limit=10, popularity=table) for hits in hits_list]
+        micros = (time.perf_counter() - start) / len(hits_list) * 1e6
+        top = [[r['tool'].get('tool_id') or r['tool']['tool_name'] for r in result] for result in ranked]
+        print(f"rank {args.hits} hits from {label:<17}: {micros:7.1f} us/query")
+        if table is None:
+            reference = top
+        elif top != reference:
+            print("  rankings differ from _source-based ranking")
+
+
+if __name__ == '__main__':
+    main()
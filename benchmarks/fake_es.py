@@ -0,0 +1,390 @@
+"""In-memory stand-in for Elasticsearch behind the real ``ESClient`` surface.
+
+Every call sleeps ``latency`` seconds to emulate a network round-trip, so
+round-trip savings show up in benchmarks the way they would against a
+real cluster.
+"""
+from typing import Dict, List, Optional
+import copy
+import random
+import threading
+import time
+
+import numpy as np
+
+from src.elasticsearch.client import ESClient
+
+
+class FakeNotFoundError(Exception):
+    pass
+
+
+class FakeIndices:
+    def __init__(self, store: 'FakeElasticsearch'):
+        self._store = store
+
+    def exists(self, index: str) -> bool:
+        return index in self._store.data
+
+    def create(self, index: str, body: Optional[Dict] = None, **kwargs):
+        self._store.data.setdefault(index, {})
+        return {'acknowledged': True, 'index': index}
+
+
+class FakeElasticsearch:
+    """Mimics the parts of ``elasticsearch.Elasticsearch`` that ``ESClient`` calls.
+
+    ``reject_ratio`` makes that share of bulk items fail with 429, which
+    exercises the retry path of the bulk writer.
+    """
+
+    def __init__(self, latency: float = 0.0, reject_ratio: float = 0.0):
+        self.latency = latency
+        self.reject_ratio = reject_ratio
+        self.data: Dict[str, Dict[str, Dict]] = {}
+        self.request_count = 0
+        self.indices = FakeIndices(self)
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self._scrolls: Dict[str, tuple] = {}
+
+    def options(self, **kwargs) -> 'FakeElasticsearch':
+        return self
+
+    def _round_trip(self):
+        with self._lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get(self, index: str, id: str, **kwargs):
+        self._round_trip()
+        with self._lock:
+            doc = self.data.get(index, {}).get(id)
+        if doc is None:
+            raise FakeNotFoundError(f"{index}/{id}")
+        return {'_index': index, '_id': id, 'found': True, '_source': _project(doc, _source_filter(kwargs))}
+
+    def mget(self, index: str, ids: List[str], **kwargs):
+        self._round_trip()
+        source = _source_filter(kwargs)
+        with self._lock:
+            docs = [(id, self.data.get(index, {}).get(id)) for id in ids]
+        return {'docs': [{'_index': index, '_id': id, 'found': False} if doc is None else
+                         {'_index': index, '_id': id, 'found': True, '_source': _project(doc, source)}
+                         for id, doc in docs]}
+
+    def delete(self, index: str, id: str, **kwargs):
+        self._round_trip()
+        with self._lock:
+            if self.data.get(index, {}).pop(id, None) is None:
+                raise FakeNotFoundError(f"{index}/{id}")
+        return {'_id': id, 'result': 'deleted'}
+
+    def index(self, index: str, id: str, document: Dict, **kwargs):
+        self._round_trip()
+        self._put(index, id, document)
+        return {'_id': id, 'result': 'created'}
+
+    def update(self, index: str, id: str, body: Optional[Dict] = None, **kwargs):
+        self._round_trip()
+        body = body or {'doc': kwargs.get('doc', {})}
+        self._merge(index, id, body['doc'], body.get('doc_as_upsert', False))
+        return {'_id': id, 'result': 'updated'}
+
+    def bulk(self, operations: List[Dict], **kwargs):
+        self._round_trip()
+        items = []
+        for action, source in _actions(operations):
+            op, meta = next(iter(action.items()))
+            if self.reject_ratio and self._random.random() < self.reject_ratio:
+                items.append({op: {'_id': meta['_id'], 'status': 429,
+                                   'error': {'type': 'es_rejected_execution_exception'}}})
+                continue
+            try:
+                if op == 'index':
+                    self._put(meta['_index'], meta['_id'], source)
+                elif op == 'delete':
+                    with self._lock:
+                        if self.data.get(meta['_index'], {}).pop(meta['_id'], None) is None:
+                            raise FakeNotFoundError(f"{meta['_index']}/{meta['_id']}")
+                else:
+                    self._merge(meta['_index'], meta['_id'], source['doc'], source.get('doc_as_upsert', False))
+                items.append({op: {'_id': meta['_id'], 'status': 200}})
+            except FakeNotFoundError:
+                items.append({op: {'_id': meta['_id'], 'status': 404,
+                                   'error': {'type': 'document_missing_exception'}}})
+        errors = any(next(iter(item.values()))['status'] >= 300 for item in items)
+        return {'errors': errors, 'items': items}
+
+    def search(self, index: str, body: Optional[Dict] = None, **kwargs):
+        self._round_trip()
+        body = body or kwargs
+        with self._lock:
+            docs = list(self.data.get(index, {}).items())
+
+        hits = self._query(docs, body)
+        size = body.get('size', body['knn'].get('k', 10) if 'knn' in body else 10)
+        source = body.get('_source')
+        response = {'_shards': {'total': 1, 'successful': 1, 'skipped': 0},
+                    'hits': {'total': {'value': len(hits), 'relation': 'eq'},
+                             'hits': [_hit(index, hit, source) for hit in hits[:size]]}}
+        if 'aggs' in body:
+            response['aggregations'] = _aggregate([_project(doc, source) for _, doc, _ in hits], body['aggs'])
+        if 'scroll' in body:
+            scroll_id = f"scroll{len(self._scrolls)}"
+            self._scrolls[scroll_id] = (index, hits[size:], size, source)
+            response['_scroll_id'] = scroll_id
+        return response
+
+    def _query(self, docs, body: Dict) -> List:
+        query = body.get('query')
+        if 'knn' not in body:
+            query = query or {'match_all': {}}
+            return _lexical(docs, query) if _text_query(query) else [
+                (doc_id, doc, 1.0) for doc_id, doc in docs if _matches(doc, query)]
+
+        knn = body['knn']
+        hits = _knn(docs, knn)[:knn.get('k', 10)]
+        if query is None:
+            return hits
+        # Hybrid: ES sums the boosted kNN score with the lexical score
+        combined = {doc_id: (doc, score * knn.get('boost', 1.0)) for doc_id, doc, score in hits}
+        for doc_id, doc, score in _lexical(docs, query):
+            previous = combined.get(doc_id, (doc, 0.0))[1]
+            combined[doc_id] = (doc, previous + score)
+        merged = [(doc_id, doc, score) for doc_id, (doc, score) in combined.items()]
+        merged.sort(key=lambda item: item[2], reverse=True)
+        return merged
+
+    def msearch(self, searches: List[Dict], **kwargs):
+        self._round_trip()
+        responses = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            with self._lock:
+                docs = list(self.data.get(header['index'], {}).items())
+            hits = self._query(docs, body)
+            size = body.get('size', 10)
+            responses.append({'hits': {'total': {'value': len(hits), 'relation': 'eq'}, 'hits': [
+                {'_index': header['index'], '_id': doc_id, '_score': score,
+                 '_source': _project(doc, body.get('_source'))}
+                for doc_id, doc, score in hits[:size]
+            ]}})
+        return {'responses': responses}
+
+    def scroll(self, scroll_id: str, **kwargs):
+        self._round_trip()
+        index, remaining, size, source = self._scrolls.get(scroll_id, (None, [], 0, None))
+        page = [_hit(index, hit, source) for hit in remaining[:size]]
+        self._scrolls[scroll_id] = (index, remaining[size:], size, source)
+        return {'_scroll_id': scroll_id, '_shards': {'total': 1, 'successful': 1, 'skipped': 0},
+                'hits': {'total': {'value': len(page), 'relation': 'eq'}, 'hits': page}}
+
+    def clear_scroll(self, scroll_id: str, **kwargs):
+        self._scrolls.pop(scroll_id, None)
+        return {'succeeded': True}
+
+    def _put(self, index: str, id: str, document: Dict) -> None:
+        with self._lock:
+            self.data.setdefault(index, {})[id] = copy.deepcopy(document)
+
+    def _merge(self, index: str, id: str, doc: Dict, upsert: bool) -> None:
+        with self._lock:
+            docs = self.data.setdefault(index, {})
+            if id not in docs:
+                if not upsert:
+                    raise FakeNotFoundError(f"{index}/{id}")
+                docs[id] = {}
+            docs[id].update(copy.deepcopy(doc))
+
+
+class FakeES(ESClient):
+    """``ESClient`` wired to an in-memory ``FakeElasticsearch``."""
+
+    def __init__(self, latency: float = 0.0, reject_ratio: float = 0.0):
+        self.url = 'fake://'
+        self.client = FakeElasticsearch(latency=latency, reject_ratio=reject_ratio)
+        self.bulk_writer = None
+
+    @property
+    def data(self) -> Dict[str, Dict[str, Dict]]:
+        return self.client.data
+
+    @property
+    def request_count(self) -> int:
+        return self.client.request_count
+
+
+def _hit(index: str, hit: tuple, source) -> Dict:
+    doc_id, doc, score = hit
+    return {'_index': index, '_id': doc_id, '_score': score, '_source': _project(doc, source)}
+
+
+def _actions(operations: List[Dict]):
+    # Action lines pair with a source line, except deletes
+    operations = iter(operations)
+    for action in operations:
+        yield action, None if 'delete' in action else next(operations)
+
+
+def _source_filter(kwargs: Dict):
+    includes, excludes = kwargs.get('source_includes'), kwargs.get('source_excludes')
+    if excludes:
+        return {'includes': includes, 'excludes': excludes}
+    return includes or kwargs.get('_source')
+
+
+def _knn(docs, knn: Dict) -> List:
+    candidates = [
+        (doc_id, doc) for doc_id, doc in docs
+        if doc.get(knn['field']) and ('filter' not in knn or _matches(doc, knn['filter']))
+    ]
+    if not candidates:
+        return []
+    matrix = np.asarray([doc[knn['field']] for _, doc in candidates], dtype=np.float32)
+    query = np.asarray(knn['query_vector'], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    # ES maps cosine similarity into [0, 1]
+    scores = (1 + matrix @ query / np.where(norms == 0, 1.0, norms)) / 2
+    order = np.argsort(-scores)[:knn.get('num_candidates', len(candidates))]
+    return [(candidates[i][0], candidates[i][1], float(scores[i])) for i in order]
+
+
+def _text_query(query) -> Optional[Dict]:
+    """The first multi_match/match clause in a query tree, if any."""
+    if isinstance(query, list):
+        return next((found for q in query if (found := _text_query(q))), None)
+    if not isinstance(query, dict):
+        return None
+    if 'multi_match' in query:
+        return query['multi_match']
+    if 'match' in query:
+        (field, value), = query['match'].items()
+        return {'query': value['query'] if isinstance(value, dict) else value, 'fields': [field]}
+    if 'bool' in query:
+        for key in ('must', 'should'):
+            found = _text_query(query['bool'].get(key))
+            if found:
+                return found
+    return None
+
+
+def _lexical(docs, query: Dict) -> List:
+    """Term-overlap stand-in for BM25: boosted count of query terms found per field."""
+    text = _text_query(query)
+    terms = set(str(text['query']).lower().split())
+    boost = text.get('boost', 1.0)
+    scored = []
+    for doc_id, doc in docs:
+        if not _matches(doc, query):
+            continue
+        score = 0.0
+        for spec in text.get('fields', []):
+            name, _, weight = spec.partition('^')
+            value = _field(doc, name)
+            if isinstance(value, list):
+                value = ' '.join(str(v) for v in value)
+            if value:
+                score += len(terms & set(str(value).lower().split())) * float(weight or 1)
+        if score > 0:
+            scored.append((doc_id, doc, score * boost))
+    scored.sort(key=lambda item: item[2], reverse=True)
+    return scored
+
+
+def _field(doc: Dict, name: str):
+    if name.endswith('.keyword'):
+        name = name[:-len('.keyword')]
+    value = doc
+    for part in name.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _matches(doc: Dict, query) -> bool:
+    if isinstance(query, list):
+        return all(_matches(doc, q) for q in query)
+    if not query or 'match_all' in query:
+        return True
+    if 'term' in query:
+        (name, value), = query['term'].items()
+        if isinstance(value, dict):
+            value = value.get('value')
+        actual = _field(doc, name)
+        return value in actual if isinstance(actual, list) else actual == value
+    if 'terms' in query:
+        (name, values), = query['terms'].items()
+        actual = _field(doc, name)
+        actual = actual if isinstance(actual, list) else [actual]
+        return any(v in values for v in actual)
+    if 'exists' in query:
+        return _field(doc, query['exists']['field']) is not None
+    if 'bool' in query:
+        clauses = query['bool']
+        for key in ('must', 'filter'):
+            if key in clauses and not _matches(doc, clauses[key]):
+                return False
+        if 'must_not' in clauses:
+            must_not = clauses['must_not']
+            must_not = must_not if isinstance(must_not, list) else [must_not]
+            if any(_matches(doc, q) for q in must_not):
+                return False
+        if 'should' in clauses and clauses['should']:
+            return any(_matches(doc, q) for q in clauses['should'])
+        return True
+    return True
+
+
+def _aggregate(docs: List[Dict], aggs: Dict) -> Dict:
+    """composite (one terms source), filter, avg, max, sum and value_count aggregations."""
+    result = {}
+    for name, agg in aggs.items():
+        sub = agg.get('aggs', {})
+        if 'composite' in agg:
+            composite = agg['composite']
+            (source_name, source), = composite['sources'][0].items()
+            groups: Dict = {}
+            for doc in docs:
+                key = _field(doc, source['terms']['field'])
+                if key is not None:
+                    groups.setdefault(key, []).append(doc)
+            keys = sorted(groups)
+            if composite.get('after'):
+                keys = [key for key in keys if key > composite['after'][source_name]]
+            page = keys[:composite.get('size', 10)]
+            result[name] = {'buckets': [{'key': {source_name: key}, 'doc_count': len(groups[key]),
+                                         **_aggregate(groups[key], sub)} for key in page]}
+            if page:
+                result[name]['after_key'] = {source_name: page[-1]}
+        elif 'filter' in agg:
+            matched = [doc for doc in docs if _matches(doc, agg['filter'])]
+            result[name] = {'doc_count': len(matched), **_aggregate(matched, sub)}
+        else:
+            (kind, options), = agg.items()
+            values = [v for v in (_field(doc, options['field']) for doc in docs) if v is not None]
+            if kind == 'value_count':
+                result[name] = {'value': len(values)}
+            elif kind == 'max' and values and isinstance(values[0], str):
+                result[name] = {'value': None, 'value_as_string': max(values)}
+            elif kind == 'max':
+                result[name] = {'value': max(values) if values else None}
+            elif kind == 'sum':
+                result[name] = {'value': float(sum(values))}
+            elif kind == 'avg':
+                result[name] = {'value': sum(values) / len(values) if values else None}
+    return result
+
+
+def _project(doc: Dict, source) -> Dict:
+    if source is None or source is True:
+        return copy.deepcopy(doc)
+    if isinstance(source, dict):
+        includes = source.get('includes')
+        excludes = set(source.get('excludes', []))
+    else:
+        includes, excludes = source, set()
+    if includes is None:
+        return {k: copy.deepcopy(v) for k, v in doc.items() if k not in excludes}
+    return {k: copy.deepcopy(doc[k]) for k in includes if k in doc and k not in excludes}
@@ -0,0 +1,119 @@
+"""Load test for ``agent-nexus serve`` against a stand-in ES and model.
+
+Runs the real SearchService/HTTP server in-process twice: once with
+micro-batching disabled (``max_batch=1``) and once enabled. Concurrent
+keep-alive clients send distinct queries, so every request misses the
+embedding cache and has to reach the model.
+
+    python -m benchmarks.load_test_server --clients 32 --seconds 5
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import quote
+
+import numpy as np
+
+from src.agents.search import CatalogSearch
+from src.embeddings.cache import EmbeddingCache
+from src.server import SearchService, make_server
+from benchmarks.fake_es import FakeES
+from benchmarks.stand_in_model import StandInModel
+
+
+def seeded_catalog(tools: int, es_latency: float, model: StandInModel) -> CatalogSearch:
+    es = FakeES()
+    catalog = CatalogSearch(es, cache=EmbeddingCache('stand-in', model.dims), embedding_model=StandInModel())
+    docs = []
+    for i in range(tools):
+        doc = {'tool_id': f"t{i}", 'tool_name': f"tool_{i}", 'display_name': f"Tool {i}",
+               'description': f"Tool {i} for domain {i % 17}", 'api_base_url': f"https://api{i}.example",
+               'auth_type': 'none', 'usage_count': i, 'rating': i % 5, 'endpoints_count': 10}
+        es.write('agent-tools', doc['tool_id'], doc)
+        docs.append(doc)
+    catalog.index_tools(docs)
+    es.client.latency = es_latency
+    catalog._embedding_model = model
+    return catalog
+
+
+def client_loop(port: int, client_id: int, stop_at: float, latencies: list, errors: list):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    i = 0
+    while time.monotonic() < stop_at:
+        query = quote(f"client {client_id} query {i}")
+        start = time.perf_counter()
+        try:
+            conn.request('GET', f"/search?q={query}&top_k=5")
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    conn.close()
+
+
+def run(max_batch: int, args) -> dict:
+    model = StandInModel(per_call=args.model_call_ms / 1000, per_text=args.model_text_ms / 1000)
+    catalog = seeded_catalog(args.tools, args.es_latency, model)
+    service = SearchService(catalog, max_batch=max_batch, max_wait_ms=args.max_wait_ms)
+    server = make_server(service, port=0)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    latencies, errors = [], []
+    stop_at = time.monotonic() + args.seconds
+    clients = [threading.Thread(target=client_loop, args=(port, i, stop_at, latencies, errors))
+               for i in range(args.clients)]
+    started = time.monotonic()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('GET', '/metrics')
+    metrics = json.loads(conn.getresponse().read())
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+    return {
+        'qps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'p99_ms': float(np.percentile(latencies, 99)) * 1000,
+        'errors': len(errors),
+        'model_calls': model.calls,
+        'server_metrics': metrics
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--tools', type=int, default=200, help='Catalog size in the stand-in ES')
+    parser.add_argument('--es-latency', type=float, default=0.002)
+    parser.add_argument('--model-call-ms', type=float, default=8.0, help='Stand-in model fixed cost per call')
+    parser.add_argument('--model-text-ms', type=float, default=0.3, help='Stand-in model cost per text')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'qps':>8} {'p50 ms':>8} {'p99 ms':>8} {'model calls':>12} {'errors':>7}")
+    for mode, max_batch in [('unbatched', 1), ('batched', args.max_batch)]:
+        result = run(max_batch, args)
+        print(f"{mode:<10} {result['qps']:>8.0f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['model_calls']:>12} {result['errors']:>7}")
+    print(json.dumps(result['server_metrics'], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic OpenAPI documents for offline benchmarks."""
+from typing import Dict
+
+METHODS = ['get', 'post', 'put', 'patch', 'delete']
+
+
+def synthetic_spec(endpoints: int = 20, title: str = 'Synthetic API') -> Dict:
+    paths = {}
+    for i in range(endpoints):
+        resource = f"/resources{i // len(METHODS)}"
+        method = METHODS[i % len(METHODS)]
+        path = resource if method in ('get', 'post') else f"{resource}/{{id}}"
+        operation = {
+            'operationId': f"{method}Resource{i}",
+            'summary': f"{method.upper()} resource {i}",
+            'description': f"Operates on resource collection {i // len(METHODS)}",
+            'parameters': [{'name': 'id', 'in': 'path', 'required': True, 'schema': {'type': 'string'}}]
+            if '{id}' in path else [],
+            'responses': {'200': {'description': 'OK'}}
+        }
+        paths.setdefault(path, {})[method] = operation
+    return {
+        'openapi': '3.0.0',
+        'info': {'title': title, 'description': f"{title} for benchmarks", 'version': '1.0.0'},
+        'paths': paths
+    }
+
+
+def large_spec(endpoints: int = 5000, schemas: int = 200, ref_depth: int = 6,
+               title: str = 'Large Synthetic API') -> Dict:
+    """A cloud-provider-sized spec: shared ``$ref`` parameters, responses and deep schema chains.
+
+    Each schema nests ``ref_depth`` levels of ``$ref``s, and every
+    operation also carries inline response schemas that repeat across
+    operations, as generated specs tend to.
+    """
+    components = {
+        'schemas': {},
+        'parameters': {
+            'PageSize': {'name': 'page_size', 'in': 'query', 'schema': {'type': 'integer', 'maximum': 1000}},
+            'PageToken': {'name': 'page_token', 'in': 'query', 'schema': {'type': 'string'}},
+            'ResourceId': {'name': 'id', 'in': 'path', 'required': True, 'schema': {'type': 'string'}}
+        },
+        'responses': {
+            'Error': {'description': 'Error', 'content': {'application/json': {
+                'schema': {'$ref': '#/components/schemas/Error'}}}}
+        },
+        'securitySchemes': {'bearer': {'type': 'http', 'scheme': 'bearer'}}
+    }
+    components['schemas']['Error'] = {'type': 'object', 'properties': {
+        'code': {'type': 'integer'}, 'message': {'type': 'string'}}}
+    for s in range(schemas):
+        for level in range(ref_depth):
+            name = f"Model{s}L{level}"
+            properties = {f"field{f}": {'type': 'string', 'description': f"Field {f} of {name}"} for f in range(8)}
+            if level + 1 < ref_depth:
+                properties['child'] = {'$ref': f"#/components/schemas/Model{s}L{level + 1}"}
+            components['schemas'][name] = {'type': 'object', 'properties': properties}
+
+    paths = {}
+    for i in range(endpoints):
+        resource = f"/resources{i // len(METHODS)}"
+        method = METHODS[i % len(METHODS)]
+        path = resource if method in ('get', 'post') else f"{resource}/{{id}}"
+        model = f"#/components/schemas/Model{i % schemas}L0"
+        operation = {
+            'operationId': f"{method}Resource{i}",
+            'summary': f"{method.upper()} resource {i}",
+            'description': f"Operates on resource collection {i // len(METHODS)}. " * 4,
+            'parameters': [{'$ref': '#/components/parameters/PageSize'},
+                           {'$ref': '#/components/parameters/PageToken'}],
+            'responses': {
+                '200': {'description': 'OK', 'content': {'application/json': {'schema': {
+                    'type': 'object',
+                    'properties': {'items': {'type': 'array', 'items': {'$ref': model}},
+                                   'next_page_token': {'type': 'string'},
+                                   'total': {'type': 'integer'}}}}}},
+                'default': {'$ref': '#/components/responses/Error'}
+            }
+        }
+        if '{id}' in path:
+            paths.setdefault(path, {})['parameters'] = [{'$ref': '#/components/parameters/ResourceId'}]
+        if method in ('post', 'put', 'patch'):
+            operation['requestBody'] = {'content': {'application/json': {'schema': {'$ref': model}}}}
+        paths.setdefault(path, {})[method] = operation
+    return {
+        'openapi': '3.0.0',
+        'info': {'title': title, 'description': f"{title} for benchmarks", 'version': '1.0.0'},
+        'servers': [{'url': 'https://api.example.com'}],
+        'paths': paths,
+        'components': components
+    }
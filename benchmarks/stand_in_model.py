@@ -0,0 +1,39 @@
+"""Deterministic stand-in for a SentenceTransformer model.
+
+Vectors are derived from a hash of the text. Each call costs ``per_call``
+plus ``per_text * len(texts)`` seconds, and calls are serialized the way
+a CPU-bound model saturates the cores, so batching effects show up the
+way they do with the real model.
+"""
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+
+class StandInModel:
+    def __init__(self, dims: int = 384, per_call: float = 0.0, per_text: float = 0.0):
+        self.dims = dims
+        self.per_call = per_call
+        self.per_text = per_text
+        self.calls = 0
+        self.encoded = 0
+        self._lock = threading.Lock()
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        with self._lock:
+            self.calls += 1
+            self.encoded += len(texts)
+            cost = self.per_call + self.per_text * len(texts)
+            if cost:
+                time.sleep(cost)
+        vectors = np.vstack([self._vector(text) for text in texts]) if texts else np.empty((0, self.dims))
+        return vectors[0] if single else vectors
+
+    def _vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).standard_normal(self.dims).astype(np.float32)
+        return vector / np.linalg.norm(vector)
@@ -0,0 +1,147 @@
+"""Local HTTP stub with per-route latency injection for offline benchmarks."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+import json
+import socket
+import sys
+import threading
+import time
+
+
+class Route:
+    def __init__(self, status: int = 200, body=b'', content_type: str = 'application/json',
+                 delay: float = 0.0, headers: Optional[Dict[str, str]] = None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode()
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.delay = delay
+        self.headers = headers or {}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that abandon a request (probe deadlines, timeouts) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """Serves fixed routes from a background thread.
+
+    Unknown paths answer 404 after ``default_delay`` seconds, so a large
+    delay emulates a black-holed host.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Route]] = None, default_delay: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.routes = routes or {}
+        self.default_delay = default_delay
+        self.request_count = 0
+        self.connection_count = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def route(self, method: str, path: str) -> Tuple[Route, bool]:
+        """Route for ``path``; one keyed with the query string wins over the bare path."""
+        route = self.routes.get(f"{method} {path}") or self.routes.get(path)
+        if route is None and '?' in path:
+            return self.route(method, path.split('?')[0])
+        if route is None:
+            return Route(status=404, body={'error': 'not found'}, delay=self.default_delay), False
+        return route, True
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; without this, keep-alive
+                # clients stall on Nagle + delayed ACK like no real server makes them
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub.connection_count += 1
+
+            def _respond(self, send_body=True):
+                with stub._lock:
+                    stub.request_count += 1
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                route, _ = stub.route(self.command, self.path)
+                if route.delay:
+                    time.sleep(route.delay)
+                status, body = route.status, route.body
+                etag = route.headers.get('ETag')
+                if etag and self.headers.get('If-None-Match') == etag:
+                    status, body = 304, b''
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', route.content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    for name, value in route.headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    if send_body:
+                        self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                self._respond()
+
+            def do_PUT(self):
+                self._respond()
+
+            def do_PATCH(self):
+                self._respond()
+
+            def do_DELETE(self):
+                self._respond()
+
+            def do_HEAD(self):
+                self._respond(send_body=False)
+
+            def do_OPTIONS(self):
+                self._respond()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
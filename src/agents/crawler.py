@@ -0,0 +1,357 @@
+"""Endpoint discovery for APIs without a spec, from the links their responses publish.
+
+Many JSON APIs list their own endpoints. GitHub's root document maps names
+to URL templates (``"user_repos_url": ".../users/{user}/repos{?type,page}"``).
+HAL responses carry ``_links`` and Siren ones ``links`` and ``actions``.
+The crawler walks these breadth-first from the API root, within the API's
+host and base path:
+
+- Templated links (RFC 6570) are recorded with their path and query
+  parameters, not fetched. They also serve as patterns that fold concrete
+  URLs such as ``/users/octocat`` into ``/users/{user}``.
+- Concrete links are normalized to a path template first. ID-like
+  segments become placeholders, and so do the members of a collection
+  that was returned as a list. Only one URL per template is fetched.
+- Each template that answered a GET gets one OPTIONS request, whose
+  ``Allow`` header lists the methods. Links at the depth limit are only
+  checked with HEAD.
+
+A crawl stops when it runs out of links, requests (``max_requests``) or
+time (``time_limit``). At most ``max_per_host`` requests run against one
+host at a time.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlsplit
+import logging
+import re
+import threading
+import time
+
+from src.agents.signatures import resource_name
+from src.config import Config
+from src.instrumentation import count, timed
+from src.transport import Transport, get_probe_transport
+from src.urls import host_key
+
+logger = logging.getLogger(__name__)
+
+# RFC 6570 expressions: {var}, {+var}, {/var}, {?a,b}, {&a}, {.ext}, {;p}, {#frag}
+_EXPRESSION = re.compile(r'\{([+#./;?&]?)([^}]*)\}')
+_ID_SEGMENT = re.compile(
+    r'^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|(?=[a-f]*\d)[0-9a-f]{7,64})$', re.I)
+# Keys whose string value is a link even when relative
+_LINK_KEY = re.compile(r'(^|_)(href|url|uri|link)$', re.I)
+# Envelope keys whose list holds a collection's members
+_COLLECTION_KEYS = ('items', 'data', 'results', 'records', 'entries')
+# Methods the crawler sends itself; never recorded as an endpoint's methods
+_PROBE_METHODS = {'HEAD', 'OPTIONS'}
+_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class CrawlResult:
+    __slots__ = ('endpoints', 'reachable', 'requests', 'truncated', 'elapsed')
+
+    def __init__(self, endpoints: List[Dict], reachable: bool, requests: int, truncated: bool, elapsed: float):
+        self.endpoints = endpoints
+        self.reachable = reachable
+        self.requests = requests
+        self.truncated = truncated
+        self.elapsed = elapsed
+
+
+class LinkCrawler:
+    def __init__(self, transport: Optional[Transport] = None, max_requests: Optional[int] = None,
+                 time_limit: Optional[float] = None, concurrency: Optional[int] = None,
+                 max_per_host: Optional[int] = None, max_depth: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.http = transport or get_probe_transport()
+        self.max_requests = max_requests or Config.crawl_max_requests
+        self.time_limit = time_limit or Config.crawl_time_limit
+        self.concurrency = concurrency or Config.crawl_concurrency
+        self.max_per_host = max_per_host or Config.crawl_max_per_host
+        self.max_depth = Config.crawl_max_depth if max_depth is None else max_depth
+        self.timeout = timeout or Config.spec_probe_timeout
+        self._limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @timed('discover.crawl')
+    def crawl(self, api_url: str) -> CrawlResult:
+        """Endpoints found from ``api_url`` in discovery order; ``reachable`` is False if nothing answered."""
+        return _Crawl(self, api_url.rstrip('/')).run()
+
+    def fetch(self, method: str, url: str) -> Optional[Tuple[int, Dict, object]]:
+        """``(status, headers, JSON body or None)``; None when the request failed outright."""
+        key = host_key(url)
+        with self._lock:
+            limit = self._limits.setdefault(key, threading.BoundedSemaphore(self.max_per_host))
+        try:
+            with limit:
+                response = self.http.request(method, url, timeout=self.timeout,
+                                             headers={'Accept': 'application/json'})
+        except Exception as e:
+            logger.debug(f"Crawl {method} {url} failed: {e}")
+            return None
+        body = None
+        if method == 'GET' and 'json' in response.headers.get('Content-Type', ''):
+            try:
+                body = response.json()
+            except ValueError:
+                pass
+        return response.status_code, response.headers, body
+
+
+class _Template:
+    __slots__ = ('path', 'depth', 'methods', 'query', 'status', 'probed')
+
+    def __init__(self, path: str, depth: int):
+        self.path = path
+        self.depth = depth
+        self.methods: Set[str] = set()
+        self.query: List[str] = []
+        self.status = None
+        self.probed = False
+
+
+class _Crawl:
+    def __init__(self, crawler: LinkCrawler, api_url: str):
+        self.crawler = crawler
+        parts = urlsplit(api_url)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.host = host_key(api_url)
+        self.prefix = parts.path.rstrip('/')
+        self.templates: Dict[str, _Template] = {}
+        self.patterns: List[Tuple[re.Pattern, str]] = []
+        self.published: Set[str] = set()
+        self.collections: Set[str] = set()
+        self.frontier = deque([('GET', f"{api_url}/", 0), ('GET', f"{api_url}/api", 0)])
+        self.queued: Set[str] = {'/', '/api'}
+        self.requests = 0
+        self.reachable = False
+        self.truncated = False
+
+    def run(self) -> CrawlResult:
+        start = time.monotonic()
+        deadline = start + self.crawler.time_limit
+        executor = ThreadPoolExecutor(self.crawler.concurrency, thread_name_prefix='crawl')
+        pending = {}
+        try:
+            while self.frontier or pending:
+                while self.frontier and len(pending) < self.crawler.concurrency:
+                    if self.requests >= self.crawler.max_requests:
+                        self.truncated = True
+                        self.frontier.clear()
+                        break
+                    method, url, depth = self.frontier.popleft()
+                    self.requests += 1
+                    pending[executor.submit(self.crawler.fetch, method, url)] = (method, url, depth)
+                if not pending:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.truncated = True
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    method, url, depth = pending.pop(future)
+                    result = future.result()
+                    if result is not None:
+                        self.reachable = True
+                        self._handle(method, url, depth, *result)
+        finally:
+            # In-flight requests are abandoned and end on their own timeout
+            executor.shutdown(wait=False, cancel_futures=True)
+        if self.truncated:
+            count('discover.crawl_truncated')
+        return CrawlResult(self._endpoints(), self.reachable, self.requests, self.truncated,
+                           time.monotonic() - start)
+
+    def _handle(self, method: str, url: str, depth: int, status: int, headers, body) -> None:
+        path = self._relative(urlsplit(url).path)
+        allowed = {m.strip().upper() for m in headers.get('Allow', '').split(',') if m.strip()}
+        if status in (404, 410) or status >= 500 or path is None:
+            return
+        key = self._template_for(path)
+        template = self.templates.get(key)
+        if template is None:
+            template = self.templates[key] = _Template(key, depth)
+        if allowed:
+            template.methods.update(allowed - _PROBE_METHODS)
+        if method == 'OPTIONS':
+            return
+        template.status = template.status or status
+        if status != 405:
+            template.methods.add('GET')
+        if method == 'GET' and status < 400 and not allowed and not template.probed:
+            template.probed = True
+            self.frontier.append(('OPTIONS', url, depth))
+        if body is not None and status < 400:
+            if _members(body) is not None:
+                self.collections.add(key)
+            for link, link_method in _links(body):
+                self._follow(urljoin(url, link), depth + 1, link_method)
+
+    def _follow(self, url: str, depth: int, method: Optional[str]) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or '{' in parts.netloc or host_key(url) != self.host:
+            return
+        if '{' in url:
+            self._template(url, depth, method)
+            return
+        path = self._relative(parts.path)
+        if path is None:
+            return
+        key = self._template_for(path)
+        if method is not None and method != 'GET':
+            # Unsafe methods are recorded from the link, never sent
+            self._record(key, depth).methods.add(method)
+            return
+        if key in self.queued or depth > self.crawler.max_depth:
+            return
+        self.queued.add(key)
+        self.frontier.append(('GET' if depth < self.crawler.max_depth else 'HEAD', url.split('#')[0], depth))
+
+    def _template(self, url: str, depth: int, method: Optional[str]) -> None:
+        for variant, query in _expand(url):
+            path = self._relative(urlsplit(variant).path)
+            if path is None:
+                continue
+            # Concrete segments before the placeholders fold into templates already known
+            key = self._template_for(path)
+            if key not in self.published:
+                self.published.add(key)
+                self.patterns.append((_pattern(key), key))
+            template = self._record(key, depth)
+            template.methods.add(method or 'GET')
+            template.query = sorted(set(template.query) | set(query))
+            if '{' not in variant:
+                # /gists{/gist_id} also names /gists itself, which can be fetched
+                self._follow(variant, depth, method)
+
+    def _record(self, key: str, depth: int) -> _Template:
+        template = self.templates.get(key)
+        if template is None:
+            template = self.templates[key] = _Template(key, depth)
+        return template
+
+    def _relative(self, path: str) -> Optional[str]:
+        # Paths outside the API's base path are out of scope
+        if self.prefix and not (path == self.prefix or path.startswith(self.prefix + '/')):
+            return None
+        return path[len(self.prefix):] or '/'
+
+    def _template_for(self, path: str) -> str:
+        segments = (path.rstrip('/') or '/').split('/')
+        # The longest prefix a published template matches takes its placeholders
+        for end in range(len(segments), 1, -1):
+            prefix = '/'.join(segments[:end])
+            key = next((key for pattern, key in self.patterns if pattern.match(prefix)), None)
+            if key is not None:
+                segments = key.split('/') + segments[end:]
+                break
+        for i in range(1, len(segments)):
+            if '{' in segments[i]:
+                continue
+            parent = '/'.join(segments[:i]) or '/'
+            if _ID_SEGMENT.match(segments[i]):
+                name = resource_name(parent)
+                segments[i] = f"{{{name}_id}}" if name else '{id}'
+            elif parent in self.collections and i == len(segments) - 1:
+                segments[i] = f"{{{resource_name(parent) or 'name'}}}"
+        return '/'.join(segments) or '/'
+
+    def _endpoints(self) -> List[Dict]:
+        # A concrete path recorded before a template that covers it was published folds into it
+        for key in list(self.templates):
+            for pattern, target in self.patterns:
+                if key != target and '{' not in key and pattern.match(key) and target in self.templates:
+                    merged = self.templates.pop(key)
+                    self.templates[target].methods |= merged.methods
+                    break
+
+        endpoints = []
+        for template in sorted(self.templates.values(), key=lambda t: (t.depth, t.path)):
+            parameters = [{'name': name, 'in': 'path', 'required': True, 'schema': {'type': 'string'}}
+                          for name in re.findall(r'{([^}]+)}', template.path)]
+            for method in sorted((template.methods & _METHODS) or {'GET'}):
+                endpoint = {
+                    'path': template.path,
+                    'method': method,
+                    'summary': f"{method} {template.path}",
+                    'description': '',
+                    'parameters': parameters + ([{'name': name, 'in': 'query', 'schema': {'type': 'string'}}
+                                                 for name in template.query] if method == 'GET' else [])
+                }
+                if template.status is not None:
+                    endpoint['status_code'] = template.status
+                endpoints.append(endpoint)
+        return endpoints
+
+
+def _links(body) -> Iterator[Tuple[str, Optional[str]]]:
+    """``(link, method)`` pairs anywhere in a JSON document; ``method`` only where a Siren action names one."""
+    stack = [(None, body)]
+    while stack:
+        key, node = stack.pop()
+        if isinstance(node, dict):
+            href = node.get('href')
+            if isinstance(href, str):
+                method = node.get('method')
+                yield href, method.upper() if isinstance(method, str) else None
+            for child_key, child in node.items():
+                if child_key != 'href':
+                    stack.append((child_key, child))
+        elif isinstance(node, list):
+            stack.extend((key, child) for child in node)
+        elif isinstance(node, str):
+            absolute = node.startswith(('http://', 'https://'))
+            if absolute or (isinstance(key, str) and _LINK_KEY.search(key) and node.startswith('/')):
+                yield node, None
+
+
+def _members(body) -> Optional[list]:
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict):
+        for key in _COLLECTION_KEYS:
+            if isinstance(body.get(key), list):
+                return body[key]
+    return None
+
+
+def _expand(url: str) -> List[Tuple[str, List[str]]]:
+    """URLs without query a URL template stands for, each with its query parameter names.
+
+    ``{/var}`` segments are optional, so ``/gists{/gist_id}`` yields both
+    ``/gists`` and ``/gists/{gist_id}``.
+    """
+    query: List[str] = []
+    variants = ['']
+    position = 0
+    for match in _EXPRESSION.finditer(url):
+        variants = [variant + url[position:match.start()] for variant in variants]
+        position = match.end()
+        operator = match.group(1)
+        names = [name.strip().rstrip('*').split(':')[0] for name in match.group(2).split(',')]
+        names = [name for name in names if name]
+        if operator in ('?', '&'):
+            query.extend(names)
+        elif '?' in variants[0] or not names:
+            # ?q={query} is named by its literal key, read below
+            continue
+        elif operator in ('', '+'):
+            variants = [f"{variant}{{{names[0]}}}" for variant in variants]
+        elif operator == '/':
+            variants = variants + [variant + ''.join(f"/{{{name}}}" for name in names) for variant in variants]
+    results = []
+    for variant in variants:
+        base, _, literal_query = (variant + url[position:]).split('#')[0].partition('?')
+        names = query + [pair.split('=')[0] for pair in literal_query.split('&') if pair.split('=')[0]]
+        results.append((base, sorted(set(names))))
+    return results
+
+
+def _pattern(key: str) -> re.Pattern:
+    return re.compile('^' + '/'.join('[^/]+' if segment.startswith('{') else re.escape(segment)
+                                      for segment in key.split('/')) + '$')
@@ -0,0 +1,165 @@
+"""Endpoint-level semantic search: which operations of which tools answer a request.
+
+Tool search returns whole tools, and a tool with thousands of operations
+brings all of them into the planner's context. This index holds one
+vector per endpoint instead, in ``tool-endpoints``. It embeds the method,
+path, summary and description, and carries the tool's id, name and
+filter fields. Its documents have the same ids as the ``api-endpoints``
+documents (API and position), so a hit leads straight to the full endpoint.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import logging
+
+from src.backends.base import SOURCE_FIELDS
+from src.backends.es import filter_clauses
+from src.config import Config
+from src.discovery_store import MAX_PAGE, DiscoveryStore, endpoint_doc_id
+from src.instrumentation import count, timed
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_INDEX = 'tool-endpoints'
+HIT_FIELDS = ['tool_id', 'api_url', 'position', 'method', 'path', 'summary', 'operation_id']
+# Long descriptions add little to an endpoint's meaning and dilute the vector
+DESCRIPTION_CHARS = 300
+
+
+def endpoint_text(endpoint: Dict) -> str:
+    """The text an endpoint is embedded from."""
+    return ' '.join(filter(None, (
+        endpoint.get('method'), endpoint.get('path'),
+        endpoint.get('summary') or endpoint.get('operation_id'),
+        (endpoint.get('description') or '')[:DESCRIPTION_CHARS]
+    )))
+
+
+class EndpointSearch:
+    """Indexes and searches endpoint vectors, encoding with a ``CatalogSearch``'s model and cache."""
+
+    def __init__(self, es_client, catalog, store: Optional[DiscoveryStore] = None, index: str = ENDPOINT_INDEX):
+        self.es = es_client
+        self.catalog = catalog
+        self.store = store or DiscoveryStore(es_client)
+        self.index = index
+
+    @timed('search.endpoints')
+    def search(self, query: str, top_k: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        """The ``top_k`` endpoints for ``query``, grouped by tool, best group first.
+
+        Each group is ``{'tool', 'score', 'endpoints'}``. ``tool`` holds the
+        catalog fields of the tool, and ``endpoints`` its matching endpoints
+        by descending score, each with its ``position`` in the discovery.
+        ``filters`` are tool fields such as ``auth_type`` and ``categories``.
+        """
+        knn = {
+            "field": "embedding",
+            "query_vector": self.catalog.encode([query])[0].tolist(),
+            "k": top_k,
+            "num_candidates": max(Config.search_num_candidates, top_k)
+        }
+        if filters:
+            knn["filter"] = filter_clauses(filters)
+        hits = self.es.search(self.index, {"knn": knn, "size": top_k, "_source": HIT_FIELDS})['hits']['hits']
+
+        groups: Dict[str, Dict] = OrderedDict()
+        for hit in hits:
+            source = hit['_source']
+            group = groups.get(source['tool_id'])
+            if group is None:
+                group = groups[source['tool_id']] = {'tool': None, 'score': hit['_score'], 'endpoints': []}
+            endpoint = {key: value for key, value in source.items() if key != 'tool_id'}
+            endpoint['score'] = hit['_score']
+            group['endpoints'].append(endpoint)
+
+        tools = self.es.mget('agent-tools', list(groups), source=SOURCE_FIELDS) if groups else []
+        results = []
+        for (tool_id, group), tool in zip(groups.items(), tools):
+            if tool is None:
+                # Deleted from the catalog since its endpoints were indexed
+                continue
+            group['tool'] = tool
+            results.append(group)
+        return results
+
+    @timed('index.endpoints')
+    def index_tools(self, tools: Iterable[Dict], batch_size: Optional[int] = None) -> Tuple[int, int]:
+        """Embed the endpoints of ``tools``; returns ``(endpoints written, endpoints unchanged)``.
+
+        A tool needs ``tool_id``, ``tool_name`` and ``source_api_discovery_id``.
+        Endpoints come from the stored discovery of that API. Texts are
+        encoded in batches of ``batch_size`` spanning many tools. Endpoints
+        whose text is unchanged since the last run are skipped, and those
+        the API no longer has are deleted.
+        """
+        batch_size = batch_size or Config.embedding_batch_size
+        written = unchanged = 0
+        pending: List[Tuple[str, Dict]] = []
+        owns_bulk = self.es.bulk_writer is None
+        self.es.start_bulk()
+        try:
+            for tool in tools:
+                changed, kept = self._changed_endpoints(tool)
+                pending.extend(changed)
+                unchanged += kept
+                while len(pending) >= batch_size:
+                    written += self._write(pending[:batch_size])
+                    pending = pending[batch_size:]
+            written += self._write(pending)
+        finally:
+            if owns_bulk:
+                self.es.stop_bulk()
+            count('index.endpoints_written', written)
+        return written, unchanged
+
+    def _write(self, docs: List[Tuple[str, Dict]]) -> int:
+        if not docs:
+            return 0
+        vectors = self.catalog.encode([doc.pop('text') for _, doc in docs])
+        for (doc_id, doc), vector in zip(docs, vectors):
+            doc['embedding'] = vector.tolist()
+            self.es.write(self.index, doc_id, doc)
+        return len(docs)
+
+    def _changed_endpoints(self, tool: Dict) -> Tuple[List[Tuple[str, Dict]], int]:
+        api_url = tool.get('source_api_discovery_id')
+        if not api_url:
+            return [], 0
+        try:
+            endpoints = self.store.endpoints(api_url, schemas=())
+        except Exception as e:
+            logger.warning(f"No stored endpoints for {tool['tool_name']}: {e}")
+            return [], 0
+
+        stored = {hit['_source']['position']: hit['_source'].get('content_hash') for hit in self.es.scan(
+            self.index, query={'term': {'api_url': api_url}}, source=['position', 'content_hash'], size=MAX_PAGE)}
+        for position in stored:
+            if position >= len(endpoints):
+                self.es.write_delete(self.index, endpoint_doc_id(api_url, position))
+
+        changed = []
+        for position, endpoint in enumerate(endpoints):
+            text = endpoint_text(endpoint)
+            # Tool fields are copied into the document, so a change to them rewrites it too
+            content_hash = hashlib.blake2b(
+                f"{tool['tool_id']}\0{tool['tool_name']}\0{tool.get('auth_type')}\0{tool.get('categories')}\0{text}".encode(),
+                digest_size=8
+            ).hexdigest()
+            if stored.get(position) == content_hash:
+                continue
+            changed.append((endpoint_doc_id(api_url, position), {
+                'tool_id': tool['tool_id'],
+                'tool_name': tool['tool_name'],
+                'api_url': api_url,
+                'position': position,
+                'method': endpoint.get('method'),
+                'path': endpoint.get('path'),
+                'summary': endpoint.get('summary'),
+                'operation_id': endpoint.get('operation_id'),
+                'auth_type': tool.get('auth_type'),
+                'categories': tool.get('categories') or [],
+                'content_hash': content_hash,
+                'text': text
+            }))
+        return changed, len(endpoints) - len(changed)
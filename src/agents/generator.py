@@ -1,34 +1,66 @@
-from jinja2 import Environment, FileSystemLoader
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional
 
 import logging
 import hashlib
+import threading
 import time
+import os
 import re
 
+from src.agents.pagination import endpoint_pagination, may_paginate
+from src.agents.signatures import endpoint_signatures
+from src.config import Config
+from src.discovery_store import DiscoveryStore
+from src.files import write_if_changed
+from src.instrumentation import timed
+from src.lookup_cache import LookupCache, get_lookup_cache
+from src.templates import render_all, write_all
+
 logger = logging.getLogger(__name__)
 
 class ToolGenerator:
-    def __init__(self, es_client, templates_dir='templates', skip_index=False):
+    CARRIED_FIELDS = ['usage_count', 'success_rate', 'avg_execution_time_ms', 'last_used',
+                      'rating', 'review_count', 'is_verified', 'generated_at',
+                      'description', 'description_embedding']
+    
+    # Artifact field in tool_data -> template, and the file it is written to (None: not written)
+    ARTIFACTS = {
+        'tool_code': ('tool.py.j2', '{tool_name}.py'),
+        'mcp_server_code': ('mcp_server.py.j2', None),
+        'readme': ('readme.md.j2', '{tool_name}_README.md')
+    }
+    FILE_KEYS = {'tool_code': 'tool_file', 'readme': 'readme_file'}
+    
+    def __init__(self, es_client, templates_dir=None, skip_index=False, cache: Optional[LookupCache] = None):
         self.es = es_client
-        self.jinja_env = Environment(loader=FileSystemLoader(templates_dir))
+        self.cache = cache or get_lookup_cache()
+        self.store = DiscoveryStore(es_client)
+        self.templates_dir = templates_dir
         self.skip_index = skip_index
+        self.files_written = 0
+        self.files_unchanged = 0
+        self._stats_lock = threading.Lock()
     
-    def generate(self, api_url: str) -> Dict:
-        start_time = time.time()
+    @timed('generate')
+    def generate(self, api_url: str, discovery_data: Optional[Dict] = None, force: bool = False) -> Dict:
+        """Build the tool for an API; ``force`` regenerates even if a tool is already stored.
+        
+        ``generation_time_seconds`` is the time this call took, including
+        when it returns the already stored tool.
+        """
+        start_time = time.perf_counter()
         
-        discovery_data = self._get_discovery_data(api_url)
+        if discovery_data is None:
+            discovery_data = self._get_discovery_data(api_url)
         if not discovery_data:
             raise ValueError(f"No discovery data found for: {api_url}")
         
-        existing_tool = self._check_existing_tool(api_url)
-        if existing_tool:
-            return existing_tool
-        
-        tool_code = self._generate_tool_code(discovery_data)
-        mcp_code = self._generate_mcp_code(discovery_data)
-        readme = self._generate_readme(discovery_data)
+        if not force:
+            existing_tool = self._check_existing_tool(api_url)
+            if existing_tool:
+                # A copy: the stored document may be shared through the lookup cache
+                return {**existing_tool, 'generation_time_seconds': time.perf_counter() - start_time}
         
         tool_data = {
             'tool_id': self._generate_tool_id(discovery_data['api_name']),
@@ -40,77 +72,153 @@ class ToolGenerator:
             'generated_at': datetime.utcnow().isoformat(),
             'updated_at': datetime.utcnow().isoformat(),
             'source_api_discovery_id': api_url,
-            'tool_code': tool_code,
-            'mcp_server_code': mcp_code,
-            'readme': readme,
             'endpoints_count': discovery_data['total_endpoints'],
             'usage_count': 0,
             'rating': 0.0,
             'review_count': 0,
-            'is_verified': False,
-            'generation_time_seconds': time.time() - start_time
+            'is_verified': False
         }
         
+        # The catalog document stores the artifacts; without it they are
+        # only rendered by write_files, straight into the output files
+        if not self.skip_index:
+            context = self._render_context(discovery_data)
+            templates = {field: template for field, (template, _) in self.ARTIFACTS.items()}
+            tool_data.update(render_all(templates, context, self.templates_dir, parallel=self._parallel(context)))
+        tool_data['generation_time_seconds'] = time.perf_counter() - start_time
+        
+        if force:
+            self._carry_over(tool_data)
+        
         if not self.skip_index:
             self._store_tool(tool_data)
         
         return tool_data
 
     
+    @timed('generate.write')
+    def write_files(self, tool_data: Dict, output_dir: str, discovery_data: Optional[Dict] = None) -> Dict[str, str]:
+        """Write the tool module and README.
+        
+        Artifacts already rendered into ``tool_data`` are written as they
+        are. Otherwise they are streamed from the templates using
+        ``discovery_data``. Every file is replaced atomically, and a file
+        whose content did not change is left untouched.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        
+        paths = {}
+        to_render = {}
+        written = {}
+        for field, (template, filename) in self.ARTIFACTS.items():
+            if filename is None:
+                continue
+            path = os.path.join(output_dir, filename.format(tool_name=tool_data['tool_name']))
+            paths[self.FILE_KEYS[field]] = path
+            if field in tool_data:
+                text = tool_data[field]
+                written[field] = write_if_changed(path, lambda fp: fp.write(text))
+            else:
+                to_render[field] = (template, path)
+        
+        if to_render:
+            if discovery_data is None:
+                raise ValueError(f"{tool_data['tool_name']} has no rendered artifacts; pass discovery_data")
+            context = self._render_context(discovery_data)
+            written.update(write_all(to_render, context, self.templates_dir, parallel=self._parallel(context)))
+        
+        with self._stats_lock:
+            self.files_written += sum(written.values())
+            self.files_unchanged += len(written) - sum(written.values())
+        return paths
+
+    
     def _get_discovery_data(self, api_url: str) -> Dict:
-        doc_id = api_url.replace('/', '_').replace(':', '_').replace('.', '_')
+        return self.cache.read_through('discovery', api_url, lambda: self._load_discovery_data(api_url))
+    
+    def _load_discovery_data(self, api_url: str) -> Dict:
         try:
-            result = self.es.client.get(index="api-discoveries", id=doc_id)
-            return result['_source']
+            return self.store.header(api_url)
         except Exception as e:
-            query = {"query": {"term": {"api_url.keyword": api_url}}}
+            query = {"query": {"term": {"api_url.keyword": api_url}}, "_source": {"excludes": ["endpoints"]}}
             result = self.es.search(index="api-discoveries", body=query)
             if result['hits']['total']['value'] > 0:
                 return result['hits']['hits'][0]['_source']
         return None
     
     def _check_existing_tool(self, api_url: str) -> Dict:
+        try:
+            return self.cache.read_through('tool', api_url, lambda: self._search_existing_tool(api_url))
+        except Exception as e:
+            if not self.skip_index:
+                raise
+            logger.warning(f"Skipping existing-tool lookup, Elasticsearch unavailable: {e}")
+            return None
+    
+    def _search_existing_tool(self, api_url: str) -> Dict:
         query = {"query": {"term": {"source_api_discovery_id.keyword": api_url}}}
         result = self.es.search(index="agent-tools", body=query)
         if result['hits']['total']['value'] > 0:
             return result['hits']['hits'][0]['_source']
         return None
     
-    def _generate_tool_code(self, discovery_data: Dict) -> str:
-        tool_class = self._to_class_name(discovery_data['api_name'])
-        tool_name = self._to_snake_case(discovery_data['api_name'])
-        
-        code = f'''"""
-            {discovery_data['api_name']} - Auto-generated Tool
-            Base URL: {discovery_data['base_url']}
-            """
-            import requests
-
-            class {tool_class}:
-                def __init__(self, api_key=None):
-                    self.base_url = "{discovery_data['base_url']}"
-                    self.api_key = api_key
-                
-                def _headers(self):
-                    headers = {{"Content-Type": "application/json"}}
-                    if self.api_key:
-                        headers["Authorization"] = f"Bearer {{self.api_key}}"
-                    return headers
-        '''
-        return code
-    
-    def _generate_mcp_code(self, discovery_data: Dict) -> str:
-        return f"# MCP Server for {discovery_data['api_name']}\n# Coming soon"
-    
-    def _generate_readme(self, discovery_data: Dict) -> str:
-        return f"# {discovery_data['api_name']}\n\n{discovery_data['api_description']}\n\nEndpoints: {discovery_data['total_endpoints']}"
+    def _carry_over(self, tool_data: Dict) -> None:
+        """Keep usage stats of the stored tool, and its embedding if the description is unchanged."""
+        try:
+            previous = self.es.get('agent-tools', tool_data['tool_id'], source=self.CARRIED_FIELDS)
+        except Exception:
+            return
+        for field in ('usage_count', 'success_rate', 'avg_execution_time_ms', 'last_used',
+                      'rating', 'review_count', 'is_verified', 'generated_at'):
+            if field in previous:
+                tool_data[field] = previous[field]
+        if previous.get('description') == tool_data['description'] and previous.get('description_embedding'):
+            tool_data['description_embedding'] = previous['description_embedding']
+    
+    def _parallel(self, context: Dict) -> bool:
+        # A single core gains nothing from the pool and still pays to pickle the context
+        threshold = Config.render_pool_min_endpoints
+        workers = Config.render_workers or os.cpu_count() or 1
+        return bool(threshold) and workers > 1 and len(context['endpoints']) >= threshold
+    
+    def _render_context(self, discovery_data: Dict) -> Dict:
+        endpoints = self._endpoints(discovery_data)
+        signatures = endpoint_signatures(endpoints)
+        for endpoint, signature in zip(endpoints, signatures):
+            signature['pagination'] = endpoint_pagination(endpoint, signature)
+        return {
+            'api_name': discovery_data['api_name'],
+            'api_description': discovery_data['api_description'],
+            'base_url': discovery_data['base_url'],
+            'auth_type': discovery_data['auth_type'],
+            'total_endpoints': discovery_data['total_endpoints'],
+            'class_name': self._to_class_name(discovery_data['api_name']),
+            'tool_name': self._to_snake_case(discovery_data['api_name']),
+            'endpoints': signatures
+        }
+    
+    def _endpoints(self, discovery_data: Dict) -> List[Dict]:
+        # A stored header leaves its endpoints behind. Signatures need no response
+        # schemas, so only list endpoints that may paginate have theirs resolved.
+        if 'endpoints' in discovery_data:
+            return discovery_data['endpoints'] or []
+        api_url = discovery_data['api_url']
+        endpoints = self.store.endpoints(api_url, schemas=('parameters', 'request_body'), header=discovery_data)
+        positions = [position for position, endpoint in enumerate(endpoints) if may_paginate(endpoint)]
+        if positions:
+            listed = self.store.endpoints_at(api_url, positions, schemas=('responses',), header=discovery_data)
+            if len(listed) == len(positions):
+                for position, endpoint in zip(positions, listed):
+                    endpoints[position]['responses'] = endpoint.get('responses')
+        return endpoints
     
     def _generate_tool_id(self, api_name: str) -> str:
         return hashlib.md5(api_name.encode()).hexdigest()[:12]
     
     def _to_class_name(self, name: str) -> str:
-        words = name.replace('-', ' ').replace('_', ' ').replace('.', ' ').split()
-        return ''.join(word.capitalize() for word in words)
+        words = re.sub(r'[^0-9a-zA-Z]+', ' ', name).split()
+        class_name = ''.join(word.capitalize() for word in words) or 'Api'
+        return f"Api{class_name}" if class_name[0].isdigit() else class_name
     
     def _to_snake_case(self, name: str) -> str:
         s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
@@ -118,6 +226,7 @@ class ToolGenerator:
     
     def _store_tool(self, tool_data: Dict) -> None:
         try:
-            self.es.index(index='agent-tools', id=tool_data['tool_id'], document=tool_data, timeout='2s')
+            self.es.write('agent-tools', tool_data['tool_id'], tool_data)
+            self.cache.put('tool', tool_data['source_api_discovery_id'], tool_data)
         except Exception as e:
-            pass
+            logger.warning(f"Failed to store tool {tool_data['tool_name']}: {e}")
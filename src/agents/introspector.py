@@ -1,8 +1,21 @@
-import requests
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Union
+import hashlib
+import json
 import logging
+import tempfile
+import time
 from datetime import datetime
 
+from src.agents.crawler import LinkCrawler
+from src.agents.spec_parser import SpecFile, diff_endpoints, parse_spec
+from src.config import Config
+from src.discovery_store import DiscoveryStore
+from src.instrumentation import count, timed
+from src.lookup_cache import LookupCache, get_lookup_cache
+from src.transport import Transport, get_probe_transport
+from src.urls import discovery_doc_id
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,10 +33,23 @@ class APIIntrospector:
         "/", "/api"
     ]
     
-    def __init__(self, es_client, skip_index=False):
+    def __init__(self, es_client, skip_index=False, concurrent_probe=None, probe_deadline=None,
+                 transport: Optional[Transport] = None, cache: Optional[LookupCache] = None):
         self.es = es_client
         self.skip_index = skip_index
+        self.concurrent_probe = Config.spec_probe_concurrent if concurrent_probe is None else concurrent_probe
+        self.probe_timeout = Config.spec_probe_timeout
+        self.probe_deadline = probe_deadline or Config.spec_probe_deadline
+        self.stream_threshold = Config.spec_stream_threshold
+        self.max_endpoints = Config.max_endpoints_per_tool
+        # Shared keep-alive pools: probes against one host reuse its connections. No retries:
+        # a slow or throttled candidate must not hold up the others past the deadline
+        self.http = transport or get_probe_transport()
+        self.crawler = LinkCrawler(self.http)
+        self.cache = cache or get_lookup_cache()
+        self.store = DiscoveryStore(es_client)
     
+    @timed('discover')
     def discover(self, api_url: str) -> Dict:
         api_url = api_url.rstrip('/')
         
@@ -31,12 +57,21 @@ class APIIntrospector:
         if existing:
             return existing
         
-        spec_data = self._find_openapi_spec(api_url)
+        retry_after = self.cache.host_retry_after(api_url)
+        if retry_after:
+            count('discover.host_backoff_skips')
+            return self._unreachable(api_url, retry_after)
+        
+        fetched = self._find_openapi_spec(api_url)
         
-        if spec_data:
-            discovery_result = self._parse_openapi_spec(spec_data, api_url)
+        if fetched:
+            discovery_result = self._parse_openapi_spec(fetched['spec'], api_url)
+            discovery_result.update(self._spec_fields(fetched))
         else:
             discovery_result = self._manual_discovery(api_url)
+            if discovery_result is None:
+                return self._unreachable(api_url, self.cache.host_failed(api_url))
+        self.cache.host_ok(api_url)
         
         discovery_result['discovered_at'] = datetime.utcnow().isoformat()
         
@@ -44,12 +79,76 @@ class APIIntrospector:
             self._store_discovery(discovery_result)
         
         return discovery_result
-
+    
+    @timed('refresh')
+    def refresh(self, existing: Dict) -> Dict:
+        """Re-check a stored discovery, parsing the spec only if it really changed.
+        
+        The stored spec URL is fetched with ``If-None-Match``/``If-Modified-Since``.
+        Returns ``{'status', 'discovery', 'diff'}``, where ``status`` is one of:
+        ``not_modified`` (304), ``unchanged`` (same content hash), ``no_spec``
+        (still no spec to be found), ``changed`` or ``failed``. Only ``changed``
+        carries a new ``discovery`` and a per-endpoint ``diff``.
+        """
+        api_url = existing['api_url']
+        fetched = None
+        spec_url = existing.get('openapi_spec_url')
+        # Older discoveries recorded the API URL here rather than the spec's own URL
+        if existing.get('has_openapi_spec') and spec_url and spec_url != api_url:
+            headers = {}
+            if existing.get('spec_etag'):
+                headers['If-None-Match'] = existing['spec_etag']
+            if existing.get('spec_last_modified'):
+                headers['If-Modified-Since'] = existing['spec_last_modified']
+            fetched = self._fetch_spec(spec_url, headers=headers, known_hash=existing.get('spec_hash'))
+        if fetched is None:
+            fetched = self._find_openapi_spec(api_url)
+        
+        now = datetime.utcnow().isoformat()
+        if fetched is None:
+            status = 'failed' if existing.get('has_openapi_spec') else 'no_spec'
+            return {'api_url': api_url, 'status': status, 'discovery': None, 'diff': None}
+        
+        if fetched['status_code'] == 304 or fetched['spec_hash'] == existing.get('spec_hash'):
+            self._close_spec(fetched.get('spec'))
+            status = 'not_modified' if fetched['status_code'] == 304 else 'unchanged'
+            update = {'refreshed_at': now}
+            if status == 'unchanged':
+                update.update(self._spec_fields(fetched))
+            self._update_discovery(api_url, update)
+            return {'api_url': api_url, 'status': status, 'discovery': None, 'diff': None}
+        
+        discovery = self._parse_openapi_spec(fetched['spec'], api_url)
+        if discovery['discovery_status'] == 'failed':
+            return {'api_url': api_url, 'status': 'failed', 'discovery': discovery, 'diff': None}
+        discovery.update(self._spec_fields(fetched))
+        discovery['discovered_at'] = now
+        discovery['refreshed_at'] = now
+        
+        old_endpoints = existing.get('endpoints')
+        if old_endpoints is None:
+            old_endpoints = self._stored_endpoints(api_url)
+        diff = diff_endpoints(old_endpoints, discovery['endpoints'])
+        
+        if not self.skip_index:
+            self._store_discovery(discovery)
+        return {'api_url': api_url, 'status': 'changed', 'discovery': discovery, 'diff': diff}
     
     def _check_existing(self, api_url: str) -> Optional[Dict]:
+        try:
+            return self.cache.read_through('discovery', api_url, lambda: self._search_existing(api_url))
+        except Exception as e:
+            if not self.skip_index:
+                raise
+            logger.warning(f"Skipping existing-discovery lookup, Elasticsearch unavailable: {e}")
+            return None
+    
+    def _search_existing(self, api_url: str) -> Optional[Dict]:
+        # The header only: endpoints are fetched by the stages that need them
         query = {
             "query": {"term": {"api_url.keyword": api_url}},
             "sort": [{"discovered_at": "desc"}],
+            "_source": {"excludes": ["endpoints"]},
             "size": 1
         }
         result = self.es.search(index="api-discoveries", body=query)
@@ -57,68 +156,189 @@ class APIIntrospector:
             return result['hits']['hits'][0]['_source']
         return None
     
+    @timed('discover.probe')
     def _find_openapi_spec(self, api_url: str) -> Optional[Dict]:
+        if self.concurrent_probe:
+            return self._find_openapi_spec_concurrent(api_url)
+        
         for spec_path in self.COMMON_SPEC_PATHS:
-            spec_url = f"{api_url}{spec_path}"
-            try:
-                response = requests.get(spec_url, timeout=2)
-                if response.status_code == 200:
-                    content_type = response.headers.get('content-type', '')
-                    if 'json' in content_type:
-                        spec = response.json()
-                    elif 'yaml' in content_type or 'yml' in content_type:
-                        import yaml
-                        spec = yaml.safe_load(response.text)
-                    else:
-                        try:
-                            spec = response.json()
-                        except:
-                            import yaml
-                            spec = yaml.safe_load(response.text)
-                    
-                    if 'openapi' in spec or 'swagger' in spec:
-                        return spec
-            except Exception as e:
-                continue
+            fetched = self._fetch_spec(f"{api_url}{spec_path}")
+            if fetched is not None:
+                return fetched
         return None
-
     
-    def _parse_openapi_spec(self, spec: Dict, api_url: str) -> Dict:
+    def _find_openapi_spec_concurrent(self, api_url: str) -> Optional[Dict]:
+        """Probe all spec paths in parallel and return the first valid document.
+        
+        The whole probe is bounded by ``probe_deadline`` seconds, however many
+        paths hang. Probes still queued when a spec is found are cancelled;
+        in-flight ones are abandoned and finish on their own request timeout.
+        Whatever a probe other than the returned one fetched is closed once it
+        finishes, so abandoned probes leave no open temp files behind.
+        """
+        deadline = time.monotonic() + self.probe_deadline
+        executor = ThreadPoolExecutor(
+            max_workers=len(self.COMMON_SPEC_PATHS),
+            thread_name_prefix='spec-probe'
+        )
+        futures = [
+            executor.submit(self._fetch_spec, f"{api_url}{spec_path}")
+            for spec_path in self.COMMON_SPEC_PATHS
+        ]
+        pending = set(futures)
+        winner = None
         try:
-            info = spec.get('info', {})
-            servers = spec.get('servers', [])
-            base_url = servers[0]['url'] if servers else api_url
-            
-            endpoints = []
-            paths = spec.get('paths', {})
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Spec probe deadline ({self.probe_deadline}s) exceeded for {api_url}")
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    fetched = future.result()
+                    if fetched is not None:
+                        winner = future
+                        return fetched
+            return None
+        finally:
+            for future in pending:
+                future.cancel()
+            for future in futures:
+                if future is not winner:
+                    # Runs at once for finished probes, otherwise when an abandoned one completes
+                    future.add_done_callback(self._discard_probe)
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _discard_probe(self, future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        fetched = future.result()
+        if fetched is not None:
+            self._close_spec(fetched['spec'])
+    
+    def _fetch_spec(self, spec_url: str, headers: Optional[Dict] = None,
+                    known_hash: Optional[str] = None) -> Optional[Dict]:
+        """Fetch and decode one candidate spec URL.
+        
+        Returns ``{'spec', 'spec_url', 'status_code', 'etag', 'last_modified',
+        'spec_hash'}`` for a valid spec, or for a 304 answer to conditional
+        ``headers`` (with ``spec`` None); otherwise None. A body whose hash
+        equals ``known_hash`` is not decoded either.
+        """
+        try:
+            response = self.http.get(spec_url, timeout=self.probe_timeout, stream=True, headers=headers)
+            fetched = {
+                'spec': None,
+                'spec_url': spec_url,
+                'status_code': response.status_code,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+                'spec_hash': None
+            }
+            if response.status_code == 304 and headers:
+                response.close()
+                return fetched
+            if response.status_code != 200:
+                response.close()
+                return None
             
-            for path, methods in paths.items():
-                for method, details in methods.items():
-                    if method in ['get', 'post', 'put', 'patch', 'delete']:
-                        endpoints.append({
-                            'path': path,
-                            'method': method.upper(),
-                            'summary': details.get('summary', ''),
-                            'description': details.get('description', ''),
-                            'parameters': details.get('parameters', []),
-                            'request_body': details.get('requestBody'),
-                            'responses': details.get('responses', {})
-                        })
+            content_type = response.headers.get('content-type', '')
+            body, size, fetched['spec_hash'] = self._spool(response)
+        except Exception as e:
+            logger.debug(f"Spec probe failed for {spec_url}: {e}")
+            return None
+        
+        if known_hash and fetched['spec_hash'] == known_hash:
+            body.close()
+            return fetched
+        
+        spec = None
+        try:
+            if 'yaml' in content_type or 'yml' in content_type:
+                spec = self._load_yaml(body)
+            elif size > self.stream_threshold and ('json' in content_type or self._looks_like_json(body)):
+                # Large JSON bodies stay on disk and are parsed path by path
+                spec = SpecFile.open(body)
+            else:
+                try:
+                    spec = json.load(body)
+                except ValueError:
+                    spec = self._load_yaml(body)
+        except Exception as e:
+            logger.debug(f"Spec probe failed for {spec_url}: {e}")
+        
+        if not isinstance(spec, SpecFile):
+            body.close()
+        if isinstance(spec, (dict, SpecFile)) and ('openapi' in spec or 'swagger' in spec):
+            fetched['spec'] = spec
+            return fetched
+        self._close_spec(spec)
+        return None
+    
+    def _spool(self, response) -> tuple:
+        body = tempfile.SpooledTemporaryFile(max_size=self.stream_threshold)
+        digest = hashlib.sha256()
+        size = 0
+        with response:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        body.seek(0)
+        return body, size, digest.hexdigest()
+    
+    @staticmethod
+    def _close_spec(spec) -> None:
+        if isinstance(spec, SpecFile):
+            spec.close()
+    
+    @staticmethod
+    def _spec_fields(fetched: Dict) -> Dict:
+        return {
+            'openapi_spec_url': fetched['spec_url'],
+            'spec_etag': fetched['etag'],
+            'spec_last_modified': fetched['last_modified'],
+            'spec_hash': fetched['spec_hash']
+        }
+    
+    @staticmethod
+    def _looks_like_json(body) -> bool:
+        head = body.read(64).lstrip()
+        body.seek(0)
+        return head.startswith(b'{')
+    
+    @staticmethod
+    def _load_yaml(body):
+        import yaml
+        body.seek(0)
+        return yaml.safe_load(body)
+    
+    @timed('discover.parse')
+    def _parse_openapi_spec(self, spec: Union[Dict, SpecFile], api_url: str) -> Dict:
+        try:
+            parsed = parse_spec(spec, max_endpoints=self.max_endpoints)
+            header = parsed.header
+            info = header.get('info', {})
+            servers = header.get('servers', [])
+            base_url = servers[0]['url'] if servers else api_url
             
-            auth_type = self._detect_auth_from_spec(spec)
+            endpoints = [endpoint.to_dict() for endpoint in parsed.endpoints]
+            auth_type = self._detect_auth_from_spec(header)
             
-            return {
+            result = {
                 'api_url': api_url,
                 'api_name': info.get('title', 'Unknown API'),
                 'api_description': info.get('description', ''),
                 'base_url': base_url,
                 'has_openapi_spec': True,
-                'openapi_spec_url': api_url,
                 'auth_type': auth_type,
                 'endpoints': endpoints,
                 'total_endpoints': len(endpoints),
                 'discovery_status': 'complete'
             }
+            if parsed.truncated:
+                result['endpoints_truncated'] = True
+            return result
         except Exception as e:
             logger.error(f"Error parsing OpenAPI spec: {e}")
             return {
@@ -126,6 +346,8 @@ class APIIntrospector:
                 'discovery_status': 'failed',
                 'error_message': str(e)
             }
+        finally:
+            self._close_spec(spec)
 
     
     def _detect_auth_from_spec(self, spec: Dict) -> str:
@@ -145,26 +367,14 @@ class APIIntrospector:
             return 'api_key'
         return 'unknown'
     
-    def _manual_discovery(self, api_url: str) -> Dict:
-        discovered_endpoints = []
-        
-        # Quick probe - just check root
-        for path in ["/", "/api"]:
-            test_url = f"{api_url}{path}"
-            try:
-                response = requests.get(test_url, timeout=2)
-                if response.status_code < 500:
-                    discovered_endpoints.append({
-                        'path': path,
-                        'method': 'GET',
-                        'status_code': response.status_code,
-                        'summary': f"Discovered endpoint",
-                        'description': ''
-                    })
-                    break
-            except Exception as e:
-                continue
+    def _manual_discovery(self, api_url: str) -> Optional[Dict]:
+        """Endpoints crawled from the links the API publishes; None if the host cannot be reached at all."""
+        crawl = self.crawler.crawl(api_url)
+        if not crawl.reachable:
+            return None
+        count('discover.crawl_requests', crawl.requests)
         
+        discovered_endpoints = crawl.endpoints
         # If nothing found, create minimal placeholder
         if not discovered_endpoints:
             discovered_endpoints = [{
@@ -174,10 +384,13 @@ class APIIntrospector:
                 'summary': 'API endpoint',
                 'description': ''
             }]
+        truncated = bool(self.max_endpoints) and len(discovered_endpoints) > self.max_endpoints
+        if truncated:
+            discovered_endpoints = discovered_endpoints[:self.max_endpoints]
         
         auth_type = 'unknown'
         
-        return {
+        result = {
             'api_url': api_url,
             'api_name': api_url.split('//')[1].split('/')[0],
             'api_description': f'API integration for {api_url}',
@@ -188,10 +401,38 @@ class APIIntrospector:
             'total_endpoints': len(discovered_endpoints),
             'discovery_status': 'complete'
         }
+        if truncated:
+            result['endpoints_truncated'] = True
+        return result
+    
+    @staticmethod
+    def _unreachable(api_url: str, retry_after: float) -> Dict:
+        return {
+            'api_url': api_url,
+            'discovery_status': 'failed',
+            'error_message': f"Host unreachable, not retried for another {retry_after:.0f}s"
+        }
+    
+    def _stored_endpoints(self, api_url: str) -> List[Dict]:
+        try:
+            return self.store.fingerprints(api_url)
+        except Exception as e:
+            logger.warning(f"Could not load stored endpoints for {api_url}: {e}")
+            return []
+    
+    def _update_discovery(self, api_url: str, fields: Dict) -> None:
+        if self.skip_index:
+            return
+        try:
+            self.es.write_update('api-discoveries', discovery_doc_id(api_url), fields)
+            self.cache.invalidate('discovery', api_url)
+        except Exception as e:
+            logger.warning(f"Failed to update discovery for {api_url}: {e}")
     
     def _store_discovery(self, discovery_data: Dict) -> None:
         try:
-            doc_id = discovery_data['api_url'].replace('/', '_').replace(':', '_').replace('.', '_')
-            self.es.index(index='api-discoveries', id=doc_id, document=discovery_data, timeout='2s')
+            header = self.store.write(discovery_data)
+            self.cache.put('discovery', discovery_data['api_url'], header)
+            self.cache.invalidate('endpoints', discovery_data['api_url'])
         except Exception as e:
-            pass
+            logger.warning(f"Failed to store discovery for {discovery_data['api_url']}: {e}")
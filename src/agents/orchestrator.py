@@ -1,27 +1,264 @@
-from typing import List, Dict
+from typing import Dict, List, Optional, Set, Tuple
 import logging
+import re
+
+from src.agents.endpoint_search import EndpointSearch
+from src.agents.signatures import binding_field, body_schema, endpoint_signature, produced_fields
+from src.agents.relationships import RelationshipGraph
+from src.agents.workflow import Step, Workflow, WorkflowError, WorkflowExecutor
+from src.config import Config
+from src.discovery_store import DiscoveryStore
+from src.instrumentation import timed
+from src.lookup_cache import get_lookup_cache
 
 logger = logging.getLogger(__name__)
 
+_WORD = re.compile(r'[a-z0-9]+')
+# Planned steps that run without the caller allowing mutations
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD.findall(re.sub(r'(?<=[a-z0-9])(?=[A-Z])', ' ', text or '').lower()))
+
 
 class ToolOrchestrator:
-    def __init__(self, es_client, catalog_search):
+    """Plans a multi-tool workflow for a request and optionally executes it.
+
+    The plan takes the best-matching endpoint of each recommended tool,
+    with tools that feed others (per the relationship ``graph``) first.
+    Ahead of each such endpoint come the endpoints that produce its
+    missing path parameters. The steps are then wired into a dependency graph
+    (``src/agents/workflow.py``) that runs independent calls concurrently.
+
+    With an ``endpoint_search``, tools and their candidate endpoints come
+    from endpoint-level search, and only those endpoints are loaded. The
+    top match is taken as is, and producers are looked for among the other
+    matches only.
+    """
+
+    def __init__(self, es_client, catalog_search, executor: Optional[WorkflowExecutor] = None, cache=None,
+                 graph: Optional[RelationshipGraph] = None, endpoint_search: Optional[EndpointSearch] = None):
         self.es = es_client
         self.catalog = catalog_search
-    
-    def orchestrate(self, user_request: str) -> Dict:
+        self.endpoint_search = endpoint_search
+        self.graph = graph
+        self.executor = executor or WorkflowExecutor()
+        self.cache = cache if cache is not None else get_lookup_cache()
+        self.store = DiscoveryStore(es_client)
+
+    @timed('orchestrate')
+    def orchestrate(self, user_request: str, execute: bool = False, args: Optional[Dict] = None,
+                    top_k: int = 3, deadline: Optional[float] = None, allow_mutations: bool = False) -> Dict:
+        """Plan for ``user_request``; with ``execute=True`` the plan is also run.
+
+        ``args`` supplies parameter values by name to every step that takes them.
+        Endpoints are chosen by keyword overlap, so only read-only steps run
+        unless ``allow_mutations``. The others, and the steps that depend on
+        them, are reported ``skipped``.
+        """
         logger.info(f"Orchestrating workflow for: {user_request}")
-        
-        tools = self.catalog.search(user_request, top_k=3)
-        
+
+        candidates = None
+        if self.endpoint_search is not None:
+            groups = self.endpoint_search.search(user_request, top_k=Config.endpoint_search_top_k)[:top_k]
+            tools = [group['tool'] for group in groups]
+            candidates = {group['tool'].get('source_api_discovery_id'): self._matched_endpoints(group)
+                          for group in groups}
+        else:
+            tools = [t['tool'] for t in self.catalog.search(user_request, top_k=top_k)]
+        recommended = [tool['tool_name'] for tool in tools]
+        relationships = []
+        if self.graph is not None:
+            tools, relationships = self._related_first(tools)
+        workflow = Workflow(self._plan_steps(user_request, tools, args or {}, candidates))
+
         plan = {
             'request': user_request,
-            'recommended_tools': [t['tool']['tool_name'] for t in tools],
+            'recommended_tools': recommended,
+            'relationships': relationships,
+            'steps': workflow.to_dicts(),
             'status': 'planned'
         }
-        
-        logger.info(f"Execution plan: {plan}")
+        if execute:
+            plan['execution'] = self._execute_plan(workflow, deadline, allow_mutations)
+            plan['status'] = plan['execution']['status']
+
+        logger.info(f"Execution plan: {plan['recommended_tools']} in {len(plan['steps'])} steps")
         return plan
-    
-    def find_tool_relationships(self) -> List[Dict]:
-        return []
+
+    def _execute_plan(self, workflow: Workflow, deadline: Optional[float], allow_mutations: bool) -> Dict:
+        runnable: Set[str] = set()
+        for step_id in workflow.order:
+            step = workflow.steps[step_id]
+            if (allow_mutations or step.method in SAFE_METHODS) and all(dep in runnable for dep in step.depends_on):
+                runnable.add(step_id)
+        if len(runnable) == len(workflow.steps):
+            return self.executor.run(workflow, deadline)
+
+        execution = self.executor.run(
+            Workflow([workflow.steps[step_id] for step_id in workflow.order if step_id in runnable], infer=False),
+            deadline
+        )
+        results = execution['steps']
+        execution['steps'] = {
+            step_id: results[step_id] if step_id in runnable else
+            {'status': 'skipped', 'error': f"Not run: {workflow.steps[step_id].method} needs allow_mutations"
+             if workflow.steps[step_id].method not in SAFE_METHODS else "Not run: depends on a skipped step"}
+            for step_id in workflow.order
+        }
+        execution['order'] = workflow.order
+        if execution['status'] == 'completed':
+            execution['status'] = 'incomplete'
+        return execution
+
+    def execute(self, steps: List[Dict], deadline: Optional[float] = None) -> Dict:
+        """Run caller-supplied step dicts (see ``Step.from_dict``) as one workflow.
+
+        Steps may only call the APIs of catalog tools: every ``base_url``
+        has to be the ``api_base_url`` of one, and every path has to stay
+        on that host. Anything else raises ``WorkflowError``.
+        """
+        workflow = Workflow.from_dicts(steps)
+        for step in workflow.steps.values():
+            if not step.path.startswith('/') or step.path.startswith('//'):
+                raise WorkflowError(f"Step {step.id}: path must start with a single '/': {step.path}")
+        unknown = {step.base_url for step in workflow.steps.values()} - self._catalog_base_urls(
+            {step.base_url for step in workflow.steps.values()})
+        if unknown:
+            raise WorkflowError(f"Not the base URL of any catalog tool: {', '.join(sorted(unknown))}")
+        return self.executor.run(workflow, deadline)
+
+    def _catalog_base_urls(self, urls: Set[str]) -> Set[str]:
+        """Those of ``urls`` that catalog tools are generated for."""
+        candidates = sorted(urls | {f"{url}/" for url in urls})
+        response = self.es.search(index='agent-tools', body={
+            'size': 0,
+            'query': {'terms': {'api_base_url': candidates}},
+            'aggs': {'urls': {'terms': {'field': 'api_base_url', 'size': len(candidates)}}}
+        })
+        return {bucket['key'].rstrip('/') for bucket in response['aggregations']['urls']['buckets']}
+
+    def _plan_steps(self, user_request: str, tools: List[Dict], args: Dict,
+                    candidates: Optional[Dict[str, List[Dict]]] = None) -> List[Step]:
+        words = _words(user_request)
+        steps: List[Step] = []
+        produced: Set[str] = set()
+        for tool in tools:
+            if candidates is not None:
+                endpoints = candidates.get(tool.get('source_api_discovery_id')) or []
+            else:
+                endpoints = self._endpoints(tool.get('source_api_discovery_id'))
+            if not endpoints:
+                continue
+            base_url = tool.get('api_base_url') or self._discovery(tool['source_api_discovery_id']).get('base_url')
+            if candidates is not None:
+                # Already ranked by endpoint search
+                chosen = endpoints[0]
+            else:
+                chosen = max(endpoints, key=lambda e: (len(words & _endpoint_words(e)), e['method'] == 'GET'))
+            for endpoint in self._producers(chosen, endpoints, args, produced) + [chosen]:
+                signature = endpoint_signature(endpoint)
+                steps.append(Step(
+                    f"{tool['tool_name']}.{signature['name']}", base_url, endpoint['method'], endpoint['path'],
+                    endpoint=endpoint, tool=tool['tool_name'],
+                    args={name: value for name, value in args.items() if name in _accepted(endpoint)}
+                ))
+                produced.update(produced_fields(endpoint))
+        return steps
+
+    @staticmethod
+    def _producers(endpoint: Dict, endpoints: List[Dict], args: Dict, produced: Set[str]) -> List[Dict]:
+        # GET endpoints without path parameters of their own that return a required value
+        needed = []
+        for param in endpoint_signature(endpoint)['path_params']:
+            field = binding_field(param['name'], endpoint['path'])
+            if field and field not in produced and param['name'] not in args and param['arg'] not in args:
+                needed.append(field)
+        producers = []
+        for field in needed:
+            for candidate in endpoints:
+                if candidate['method'] == 'GET' and '{' not in candidate['path'] and candidate is not endpoint \
+                        and field in produced_fields(candidate):
+                    if candidate not in producers:
+                        producers.append(candidate)
+                    break
+        return producers
+
+    def _discovery(self, api_url: str) -> Dict:
+        try:
+            return self.cache.read_through('discovery', api_url, lambda: self._load_header(api_url)) or {}
+        except Exception as e:
+            logger.warning(f"Could not load discovery for {api_url}: {e}")
+            return {}
+
+    def _endpoints(self, api_url: Optional[str]) -> List[Dict]:
+        if not api_url:
+            return []
+        try:
+            cached = self.cache.read_through('endpoints', api_url, lambda: self._load_endpoints(api_url))
+        except Exception as e:
+            logger.warning(f"Could not load endpoints for {api_url}: {e}")
+            return []
+        return (cached or {}).get('endpoints') or []
+
+    def _matched_endpoints(self, group: Dict) -> List[Dict]:
+        api_url = group['tool'].get('source_api_discovery_id')
+        if not api_url:
+            return []
+        try:
+            return self.store.endpoints_at(api_url, [endpoint['position'] for endpoint in group['endpoints']])
+        except Exception as e:
+            logger.warning(f"Could not load endpoints for {api_url}: {e}")
+            return []
+
+    def _load_header(self, api_url: str) -> Optional[Dict]:
+        try:
+            return self.store.header(api_url)
+        except Exception as e:
+            logger.debug(f"No discovery stored for {api_url}: {e}")
+            return None
+
+    def _load_endpoints(self, api_url: str) -> Optional[Dict]:
+        header = self._discovery(api_url)
+        if not header:
+            return None
+        return {'endpoints': self.store.endpoints(api_url, header=header)}
+
+    def find_tool_relationships(self, api_url: Optional[str] = None) -> List[Dict]:
+        """Edges of the API relationship graph: every edge, or the neighbours of ``api_url``.
+
+        Uses the precomputed graph when one was given; otherwise one is
+        built from the stored discoveries for this call.
+        """
+        graph = self.graph
+        if graph is None:
+            graph = RelationshipGraph.build(self.store.discoveries())
+        if api_url is not None:
+            return graph.neighbors(api_url)
+        return list(graph.edges())
+
+    def _related_first(self, tools: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        # Producers ahead of the tools they feed, so bindings can be inferred across tools
+        urls = {tool.get('source_api_discovery_id'): tool for tool in tools}
+        edges = [{'source': urls[url]['tool_name'], 'target': urls[edge['api_url']]['tool_name'],
+                  'fields': edge['fields']}
+                 for url in urls if url for edge in self.graph.neighbors(url, direction='out')
+                 if edge['api_url'] in urls and edge['api_url'] != url]
+        fed = {edge['target'] for edge in edges}
+        ordered = [tool for tool in tools if tool['tool_name'] not in fed] + \
+                  [tool for tool in tools if tool['tool_name'] in fed]
+        return ordered, edges
+
+
+def _accepted(endpoint: Dict) -> Set[str]:
+    signature = endpoint_signature(endpoint)
+    names = {key for param in signature['path_params'] + signature['query_params']
+             for key in (param['name'], param['arg'])}
+    body = body_schema(endpoint.get('request_body'))
+    return names | set((body or {}).get('properties') or {})
+
+
+def _endpoint_words(endpoint: Dict) -> Set[str]:
+    return _words(' '.join(filter(None, (endpoint.get('path'), endpoint.get('summary'),
+                                         endpoint.get('operation_id'), endpoint.get('description')))))
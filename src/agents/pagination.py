@@ -0,0 +1,144 @@
+"""How a list endpoint pages through its results, read from its spec.
+
+Generated clients get a lazy iterator for each paginated endpoint, and
+this module tells them how to drive it. Four styles are recognized:
+
+- ``link``: the response declares a ``Link`` header, and the next page is
+  its ``rel="next"`` URL, as GitHub does it.
+- ``cursor``: a query parameter such as ``cursor``, ``page_token`` or
+  ``starting_after`` takes a token from the previous response. The token
+  is its ``next_cursor``-like field, or the last item's ``id`` when the
+  response only says ``has_more``.
+- ``offset``: ``offset`` (or ``skip``/``start``) advances by the number of
+  items received.
+- ``page``: ``page`` counts up from 1.
+
+Where the spec leaves something out, such as which response field holds
+the items or the cursor, the generated client falls back to common names
+at run time.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from src.agents.signatures import to_identifier
+from src.agents.signatures import body_schema
+
+CURSOR_PARAMS = frozenset({
+    'cursor', 'page_token', 'next_token', 'next_page_token', 'continuation_token', 'continuation',
+    'marker', 'after', 'starting_after', 'page_cursor', 'next_cursor', 'next'
+})
+OFFSET_PARAMS = frozenset({'offset', 'skip', 'start', 'start_index'})
+PAGE_PARAMS = frozenset({'page', 'page_number', 'page_no', 'page_num'})
+SIZE_PARAMS = frozenset({'limit', 'per_page', 'page_size', 'size', 'count', 'max_results', 'top', 'page_limit'})
+NEXT_FIELDS = ('next_cursor', 'next_page_token', 'next_token', 'next_marker', 'continuation_token', 'cursor', 'next')
+ITEM_FIELDS = ('items', 'data', 'results', 'records', 'entries', 'values', 'elements')
+# Objects that commonly wrap the paging fields
+ENVELOPES = ('meta', 'pagination', 'paging', 'page_info', 'response_metadata', 'links')
+# Cursor parameters that take the id of the last item seen
+LAST_ID_PARAMS = frozenset({'starting_after', 'after'})
+
+
+def may_paginate(endpoint: Dict) -> bool:
+    """Whether a GET endpoint takes a cursor, offset or page parameter; needs no response schemas."""
+    if str(endpoint.get('method') or '').upper() != 'GET':
+        return False
+    names = CURSOR_PARAMS | OFFSET_PARAMS | PAGE_PARAMS
+    return any(isinstance(param, dict) and param.get('in') == 'query' and to_identifier(str(param.get('name'))) in names
+               for param in endpoint.get('parameters') or [])
+
+
+def endpoint_pagination(endpoint: Dict, signature: Dict) -> Optional[Dict]:
+    """Pagination of a GET endpoint, or None when it does not page.
+
+    ``{'style', 'param', 'size_param', 'items', 'next', 'last_id'}``:
+    ``param`` is the query parameter the iterator manages itself, ``items``
+    the response field holding the page (None: the body is the list, or
+    unknown), ``next`` the dotted path of the next cursor, and ``last_id``
+    the item field whose last value is the cursor.
+    """
+    if signature['method'] != 'GET':
+        return None
+    params: Dict[str, str] = {}
+    for param in signature['query_params']:
+        key = to_identifier(param['name'])
+        for kind, names in (('cursor', CURSOR_PARAMS), ('offset', OFFSET_PARAMS),
+                            ('page', PAGE_PARAMS), ('size', SIZE_PARAMS)):
+            if key in names:
+                params.setdefault(kind, param['name'])
+    schema, link_header = _list_response(endpoint)
+    if not link_header and not params.keys() & {'cursor', 'offset', 'page'}:
+        return None
+
+    style = 'link' if link_header else 'cursor' if 'cursor' in params else 'offset' if 'offset' in params else 'page'
+    if style == 'link':
+        param = params.get('page') or params.get('cursor') or params.get('offset')
+    else:
+        param = params[style]
+    pagination = {'style': style, 'param': param, 'size_param': params.get('size'),
+                  'items': _items_field(schema), 'next': None, 'last_id': None}
+    if style == 'cursor':
+        pagination['next'] = _next_field(schema)
+        if pagination['next'] is None and to_identifier(param) in LAST_ID_PARAMS and _has_more(schema):
+            pagination['last_id'] = 'id'
+    return pagination
+
+
+def _list_response(endpoint: Dict) -> Tuple[Optional[Dict], bool]:
+    """Schema of the success response, and whether any success response declares a ``Link`` header."""
+    responses = endpoint.get('responses') or {}
+    schema = None
+    link_header = False
+    for status in sorted(responses, key=str):
+        response = responses[status]
+        if not str(status).startswith('2') or not isinstance(response, dict):
+            continue
+        if any(str(name).lower() == 'link' for name in response.get('headers') or {}):
+            link_header = True
+        if schema is None:
+            schema = body_schema(response)
+    return schema, link_header
+
+
+def _properties(schema: Optional[Dict]) -> Dict:
+    if not isinstance(schema, dict):
+        return {}
+    properties = dict(schema.get('properties') or {})
+    for part in schema.get('allOf') or []:
+        if isinstance(part, dict):
+            properties.update(part.get('properties') or {})
+    return properties
+
+
+def _items_field(schema: Optional[Dict]) -> Optional[str]:
+    properties = _properties(schema)
+    arrays = [name for name, child in properties.items() if isinstance(child, dict) and child.get('type') == 'array']
+    for name in arrays:
+        if to_identifier(name) in ITEM_FIELDS:
+            return name
+    return arrays[0] if arrays else None
+
+
+def _next_field(schema: Optional[Dict]) -> Optional[str]:
+    properties = _properties(schema)
+    found = _named(properties, NEXT_FIELDS)
+    if found is not None:
+        return found
+    for name, child in properties.items():
+        if to_identifier(name) in ENVELOPES:
+            nested = _named(_properties(child), NEXT_FIELDS)
+            if nested is not None:
+                return f"{name}.{nested}"
+    return None
+
+
+def _named(properties: Dict, names: Tuple[str, ...]) -> Optional[str]:
+    by_key: Dict[str, List[str]] = {}
+    for name in properties:
+        by_key.setdefault(to_identifier(name), []).append(name)
+    for key in names:
+        if key in by_key:
+            return by_key[key][0]
+    return None
+
+
+def _has_more(schema: Optional[Dict]) -> bool:
+    return any(to_identifier(name) == 'has_more' for name in _properties(schema))
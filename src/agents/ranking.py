@@ -0,0 +1,135 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+
+import numpy as np
+
+
+class RankWeights:
+    """Weights of the composite score: relevance, popularity, rating and success rate."""
+
+    def __init__(self, relevance: float = 0.7, popularity: float = 0.2, rating: float = 0.1,
+                 popularity_scale: float = 1000.0, success: float = 0.0):
+        self.relevance = relevance
+        self.popularity = popularity
+        self.rating = rating
+        self.popularity_scale = popularity_scale
+        self.success = success
+
+    @classmethod
+    def from_env(cls) -> 'RankWeights':
+        """Reads ``RANK_WEIGHTS=relevance,popularity,rating[,success]`` (defaults 0.7,0.2,0.1,0)."""
+        value = os.getenv('RANK_WEIGHTS')
+        if not value:
+            return cls()
+        parts = [float(part) for part in value.split(',')]
+        return cls(*parts[:3], success=parts[3] if len(parts) > 3 else 0.0)
+
+
+class PopularityTable:
+    """Usage aggregates per tool id, held as columns for vectorized lookups.
+
+    Built by the usage rollup (``src.usage``) so ranking does not depend on
+    the usage fields of each hit's ``_source``. ``replace`` swaps in new
+    contents with one assignment, so concurrent readers see either the old
+    table or the new one, never a mix.
+    """
+
+    COLUMNS = ('usage_count', 'rating', 'success_rate')
+
+    def __init__(self, rows: Optional[Iterable[Dict]] = None):
+        self._data: Tuple[Dict[str, int], np.ndarray] = ({}, np.zeros((0, len(self.COLUMNS))))
+        if rows is not None:
+            self.replace(rows)
+
+    def __len__(self) -> int:
+        return len(self._data[0])
+
+    def replace(self, rows: Iterable[Dict]) -> None:
+        """``rows`` are dicts with ``tool_id`` and any of ``COLUMNS``; missing values count as 0."""
+        index: Dict[str, int] = {}
+        values = []
+        for row in rows:
+            index[row['tool_id']] = len(values)
+            values.append([row.get(column) or 0.0 for column in self.COLUMNS])
+        self._data = (index, np.asarray(values, dtype=np.float64).reshape(-1, len(self.COLUMNS)))
+
+    def lookup(self, tool_ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """``(found, values)``: a mask of ids in the table and their ``COLUMNS`` (zeros if absent)."""
+        index, table = self._data
+        rows = np.fromiter((index.get(tool_id, -1) for tool_id in tool_ids), dtype=np.int64, count=len(tool_ids))
+        found = rows >= 0
+        values = np.zeros((len(tool_ids), len(self.COLUMNS)))
+        values[found] = table[rows[found]]
+        return found, values
+
+
+def rank_hits(hits: List[Dict], weights: Optional[RankWeights] = None,
+              normalize_relevance: bool = False, limit: Optional[int] = None,
+              popularity: Optional[PopularityTable] = None) -> List[Dict]:
+    """Composite-score and sort search hits with array operations instead of a per-hit loop.
+
+    ``normalize_relevance`` divides relevance by the best score among the
+    hits. Use it for backends whose scores are not already in [0, 1],
+    e.g. BM25 plus kNN. With ``limit`` only the best ``limit`` hits are
+    sorted and returned. Usage, rating and success rate come from
+    ``popularity`` for tools it knows, and from ``_source`` otherwise.
+    """
+    if not hits:
+        return []
+    weights = weights or RankWeights()
+    n = len(hits)
+
+    sources = [hit['_source'] for hit in hits]
+    relevance = np.fromiter((hit['_score'] or 0.0 for hit in hits), dtype=np.float64, count=n)
+    if popularity is not None and len(popularity):
+        found, values = popularity.lookup([tool.get('tool_id') or hit['_id'] for tool, hit in zip(sources, hits)])
+        for i in np.flatnonzero(~found).tolist():
+            values[i] = [sources[i].get(column) or 0.0 for column in PopularityTable.COLUMNS]
+        usage, rating, success = values[:, 0], values[:, 1], values[:, 2]
+    else:
+        usage = np.fromiter((tool.get('usage_count') or 0 for tool in sources), dtype=np.float64, count=n)
+        rating = np.fromiter((tool.get('rating') or 0 for tool in sources), dtype=np.float64, count=n)
+        success = np.fromiter((tool.get('success_rate') or 0 for tool in sources), dtype=np.float64, count=n)
+
+    if normalize_relevance and relevance.max() > 0:
+        relevance /= relevance.max()
+    popularity_score = np.minimum(usage / weights.popularity_scale, 1.0)
+    rating = rating / 5.0
+    composite = (relevance * weights.relevance + popularity_score * weights.popularity
+                 + rating * weights.rating + success * weights.success)
+
+    if limit is not None and limit < n:
+        top = np.argpartition(-composite, limit - 1)[:limit]
+        order = top[np.argsort(-composite[top], kind='stable')]
+    else:
+        order = np.argsort(-composite, kind='stable')
+
+    # One bulk conversion per column; per-element float() dominates otherwise
+    return [
+        {
+            'tool': sources[i],
+            'relevance_score': r,
+            'popularity_score': p,
+            'rating_score': s,
+            'success_rate': u,
+            'composite_score': c
+        }
+        for i, r, p, s, u, c in zip(order.tolist(), relevance[order].tolist(), popularity_score[order].tolist(),
+                                    rating[order].tolist(), success[order].tolist(), composite[order].tolist())
+    ]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = 60) -> List[Dict]:
+    """Fuse ranked hit lists by RRF; fused ``_score`` is scaled to [0, 1]."""
+    fused: Dict[str, float] = {}
+    sources: Dict[str, Dict] = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits):
+            fused[hit['_id']] = fused.get(hit['_id'], 0.0) + 1.0 / (k + rank + 1)
+            sources.setdefault(hit['_id'], hit['_source'])
+
+    if not fused:
+        return []
+    best = len(result_lists) / (k + 1)
+    ids = sorted(fused, key=fused.get, reverse=True)
+    return [{'_id': doc_id, '_score': fused[doc_id] / best, '_source': sources[doc_id]} for doc_id in ids]
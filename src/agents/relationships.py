@@ -0,0 +1,371 @@
+"""Precomputed graph of which APIs can feed which.
+
+API A feeds API B when a field in A's response schemas (``login``,
+``repo_id``) matches a parameter or body property of B. Every API is
+reduced to two sets of field names, the fields it produces and the
+fields it consumes (see ``produced_fields``/``consumed_fields``). An
+inverted index maps each field to the APIs that produce or consume it.
+Building the graph therefore only pairs up APIs that share a field,
+rather than comparing every pair of APIs. A field with more than
+``max_fanout`` producers or consumers carries no signal and is skipped.
+
+The graph is stored in compressed sparse row form as ``.npy`` arrays,
+one set for outgoing edges and one for incoming. They are memory-mapped
+on load, so a tool's neighbours are one slice. ``add`` handles one new or
+changed API without a rebuild. It marks the API's stored edges stale,
+computes its current edges from the inverted index into a small overlay,
+and appends its fields to ``signatures.jsonl``. ``compact`` folds the
+overlay back into the arrays.
+
+``generate``, ``generate-batch`` and ``refresh`` keep a saved graph
+current through ``GraphUpdater``. It holds the graph's file lock from
+reload to save, so updates from concurrent processes neither interleave
+in ``signatures.jsonl`` nor overwrite each other's overlay.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import json
+import logging
+import os
+
+import numpy as np
+
+from src.agents.signatures import GENERIC_FIELDS, consumed_fields, produced_fields
+from src.config import Config
+from src.files import file_lock
+from src.instrumentation import count, timed
+
+logger = logging.getLogger(__name__)
+
+COMPACT_MIN_STALE = 256
+LOCK_FILE = '.lock'
+ARRAYS = ('out_indptr', 'out_indices', 'out_field_ptr', 'out_fields', 'in_indptr', 'in_indices', 'in_edges')
+
+
+def api_signature(endpoints: Iterable[Dict]) -> Tuple[Set[str], Set[str]]:
+    """Fields an API's endpoints produce and consume, without generic names."""
+    produces, consumes = set(), set()
+    for endpoint in endpoints:
+        produces.update(produced_fields(endpoint))
+        consumes.update(consumed_fields(endpoint))
+    return produces - GENERIC_FIELDS, consumes - GENERIC_FIELDS
+
+
+class RelationshipGraph:
+    """API-to-API edges labelled with the fields that connect them."""
+
+    def __init__(self, max_fanout: Optional[int] = None):
+        self.max_fanout = max_fanout or Config.relationship_max_fanout
+        self.nodes: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.fields: List[str] = []
+        self.field_ids: Dict[str, int] = {}
+        self.signatures: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        self.producers: Dict[str, Set[int]] = defaultdict(set)
+        self.consumers: Dict[str, Set[int]] = defaultdict(set)
+        self.arrays: Dict[str, np.ndarray] = {name: np.zeros(1 if name.endswith('ptr') else 0, dtype=np.int64)
+                                              for name in ARRAYS}
+        # Edges of APIs added since the last compaction, both directions, plus the APIs whose array edges are void
+        self.overlay_out: Dict[int, Dict[int, Tuple[str, ...]]] = defaultdict(dict)
+        self.overlay_in: Dict[int, Dict[int, Tuple[str, ...]]] = defaultdict(dict)
+        self.stale: Set[int] = set()
+        self.path: Optional[str] = None
+        self._pending: List[Dict] = []
+        self._arrays_dirty = True
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @classmethod
+    @timed('relationships.build')
+    def build(cls, discoveries: Iterable[Dict], max_fanout: Optional[int] = None) -> 'RelationshipGraph':
+        """Full build from discovery documents (``api_url`` plus ``endpoints``)."""
+        graph = cls(max_fanout)
+        for discovery in discoveries:
+            produces, consumes = api_signature(discovery.get('endpoints') or [])
+            graph._index(discovery['api_url'], produces, consumes)
+        graph.compact()
+        return graph
+
+    def _index(self, api_url: str, produces: Set[str], consumes: Set[str]) -> int:
+        node = self.ids.get(api_url)
+        if node is None:
+            node = self.ids[api_url] = len(self.nodes)
+            self.nodes.append(api_url)
+        else:
+            old_produces, old_consumes = self.signatures[api_url]
+            for field in old_produces:
+                self.producers[field].discard(node)
+            for field in old_consumes:
+                self.consumers[field].discard(node)
+        self.signatures[api_url] = (produces, consumes)
+        for field in produces:
+            self.producers[field].add(node)
+        for field in consumes:
+            self.consumers[field].add(node)
+        return node
+
+    def _connected(self, field: str) -> bool:
+        return len(self.producers[field]) <= self.max_fanout and len(self.consumers[field]) <= self.max_fanout
+
+    def _field_id(self, field: str) -> int:
+        field_id = self.field_ids.get(field)
+        if field_id is None:
+            field_id = self.field_ids[field] = len(self.fields)
+            self.fields.append(field)
+        return field_id
+
+    def compact(self) -> None:
+        """Rebuild the CSR arrays from the inverted index and drop the overlay."""
+        sources, targets, field_ids = [], [], []
+        for field in sorted(self.producers.keys() & self.consumers.keys()):
+            producers, consumers = self.producers[field], self.consumers[field]
+            if not producers or not consumers or not self._connected(field):
+                continue
+            producers = np.fromiter(producers, dtype=np.int64, count=len(producers))
+            consumers = np.fromiter(consumers, dtype=np.int64, count=len(consumers))
+            sources.append(np.repeat(producers, len(consumers)))
+            targets.append(np.tile(consumers, len(producers)))
+            field_ids.append(np.full(len(producers) * len(consumers), self._field_id(field), dtype=np.int32))
+
+        n = len(self.nodes)
+        if sources:
+            source, target, field_id = np.concatenate(sources), np.concatenate(targets), np.concatenate(field_ids)
+            keep = source != target
+            source, target, field_id = source[keep], target[keep], field_id[keep]
+        else:
+            source = target = np.zeros(0, dtype=np.int64)
+            field_id = np.zeros(0, dtype=np.int32)
+
+        # One edge per (source, target) pair, its fields contiguous in out_fields
+        pair = source * max(n, 1) + target
+        order = np.argsort(pair, kind='stable')
+        pair, field_id = pair[order], field_id[order]
+        edge_pairs, first = np.unique(pair, return_index=True)
+        edge_source, edge_target = edge_pairs // max(n, 1), edge_pairs % max(n, 1)
+        out_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_source, minlength=n), out=out_indptr[1:])
+        in_edges = np.argsort(edge_target, kind='stable')
+        in_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_target, minlength=n), out=in_indptr[1:])
+
+        self.arrays = {
+            'out_indptr': out_indptr,
+            'out_indices': edge_target.astype(np.int32),
+            'out_field_ptr': np.append(first, len(pair)).astype(np.int64),
+            'out_fields': field_id.astype(np.int32),
+            'in_indptr': in_indptr,
+            'in_indices': edge_source[in_edges].astype(np.int32),
+            'in_edges': in_edges.astype(np.int64)
+        }
+        self.overlay_out.clear()
+        self.overlay_in.clear()
+        self.stale.clear()
+        self._arrays_dirty = True
+
+    @timed('relationships.add')
+    def add(self, api_url: str, endpoints: Iterable[Dict]) -> int:
+        """Insert or replace one API; returns its number of edges.
+
+        Costs time in the number of APIs sharing a field with it, not in the size of the graph.
+        """
+        produces, consumes = api_signature(endpoints)
+        old_produces, old_consumes = self.signatures.get(api_url, (set(), set()))
+        touched = produces | consumes | old_produces | old_consumes
+        was_connected = {field: self._connected(field) for field in touched}
+        node = self._index(api_url, produces, consumes)
+        self._pending.append({'api_url': api_url, 'produces': sorted(produces), 'consumes': sorted(consumes)})
+        if any(self._connected(field) != connected for field, connected in was_connected.items()):
+            # A field crossed max_fanout, which adds or voids edges between other APIs too
+            self.compact()
+            count('relationships.fanout_compactions')
+            return sum(1 for _ in self._edges(node, 'out')) + sum(1 for _ in self._edges(node, 'in'))
+
+        for other in list(self.overlay_out.pop(node, {})):
+            self.overlay_in[other].pop(node, None)
+        for other in list(self.overlay_in.pop(node, {})):
+            self.overlay_out[other].pop(node, None)
+        self.stale.add(node)
+
+        outgoing: Dict[int, List[str]] = defaultdict(list)
+        incoming: Dict[int, List[str]] = defaultdict(list)
+        for field in produces:
+            if self._connected(field):
+                for target in self.consumers[field]:
+                    outgoing[target].append(field)
+        for field in consumes:
+            if self._connected(field):
+                for source in self.producers[field]:
+                    incoming[source].append(field)
+        # Array edges between the other API and this one are void now, so their overlay must carry them
+        for target, fields in outgoing.items():
+            if target != node:
+                self.overlay_out[node][target] = self.overlay_in[target][node] = tuple(sorted(fields))
+        for source, fields in incoming.items():
+            if source != node:
+                self.overlay_out[source][node] = self.overlay_in[node][source] = tuple(sorted(fields))
+        count('relationships.incremental_adds')
+        if len(self.stale) > max(COMPACT_MIN_STALE, len(self.nodes) // 10):
+            # Every stale API costs a set lookup per neighbour, so fold the overlay in once it grows
+            self.compact()
+        return len(outgoing) + len(incoming)
+
+    def neighbors(self, api_url: str, direction: str = 'both', limit: Optional[int] = None) -> List[Dict]:
+        """APIs this one feeds (``out``), is fed by (``in``) or both, most shared fields first."""
+        node = self.ids.get(api_url)
+        if node is None:
+            return []
+        edges = []
+        if direction in ('out', 'both'):
+            edges += [{'api_url': self.nodes[other], 'direction': 'out', 'fields': list(fields)}
+                      for other, fields in self._edges(node, 'out')]
+        if direction in ('in', 'both'):
+            edges += [{'api_url': self.nodes[other], 'direction': 'in', 'fields': list(fields)}
+                      for other, fields in self._edges(node, 'in')]
+        edges.sort(key=lambda edge: len(edge['fields']), reverse=True)
+        return edges[:limit] if limit else edges
+
+    def edges(self) -> Iterator[Dict]:
+        """Every edge once, as ``{'source', 'target', 'fields'}``."""
+        for node, api_url in enumerate(self.nodes):
+            for target, fields in self._edges(node, 'out'):
+                yield {'source': api_url, 'target': self.nodes[target], 'fields': list(fields)}
+
+    def _edges(self, node: int, direction: str) -> Iterator[Tuple[int, Tuple[str, ...]]]:
+        arrays = self.arrays
+        indptr = arrays[f'{direction}_indptr']
+        if node not in self.stale and node + 1 < len(indptr):
+            start, end = int(indptr[node]), int(indptr[node + 1])
+            others = arrays[f'{direction}_indices'][start:end].tolist()
+            edges = np.arange(start, end) if direction == 'out' else np.asarray(arrays['in_edges'][start:end])
+            # Gather every edge's field ids with one fancy index instead of a slice per edge
+            firsts = np.asarray(arrays['out_field_ptr'][edges])
+            lengths = np.asarray(arrays['out_field_ptr'][edges + 1]) - firsts
+            offsets = np.cumsum(lengths) - lengths
+            gather = np.repeat(firsts - offsets, lengths) + np.arange(int(lengths.sum()))
+            names = self.fields
+            flat = [names[i] for i in np.asarray(arrays['out_fields'])[gather].tolist()]
+            for other, offset, length in zip(others, offsets.tolist(), lengths.tolist()):
+                if other not in self.stale:
+                    yield other, tuple(flat[offset:offset + length])
+        overlay = self.overlay_out if direction == 'out' else self.overlay_in
+        yield from overlay.get(node, {}).items()
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the graph under ``path``.
+
+        When only ``add`` ran since the graph was loaded from or saved to
+        ``path``, the new signatures are appended and the overlay rewritten;
+        the arrays are left alone.
+        """
+        path = path or self.path or Config.relationship_graph_path
+        os.makedirs(path, exist_ok=True)
+        if self._arrays_dirty or path != self.path:
+            # Node ids follow first appearance in signatures.jsonl, so it is written in id order
+            lines = [{'api_url': api_url, 'produces': sorted(self.signatures[api_url][0]),
+                      'consumes': sorted(self.signatures[api_url][1])} for api_url in self.nodes]
+            _replace(path, 'signatures.jsonl', lambda f: f.writelines(json.dumps(line).encode() + b'\n'
+                                                                       for line in lines))
+            for name in ARRAYS:
+                _replace(path, f'{name}.npy', lambda f: np.save(f, np.ascontiguousarray(self.arrays[name])))
+        elif self._pending:
+            with open(os.path.join(path, 'signatures.jsonl'), 'a') as f:
+                f.writelines(json.dumps(line) + '\n' for line in self._pending)
+
+        state = {
+            'fields': self.fields,
+            'stale': sorted(self.stale),
+            'edges': [[source, target, list(fields)]
+                      for source, targets in self.overlay_out.items() for target, fields in targets.items()]
+        }
+        _replace(path, 'graph.json', lambda f: f.write(json.dumps(state).encode()))
+        self._pending.clear()
+        self._arrays_dirty = False
+        self.path = path
+
+    @classmethod
+    @timed('relationships.load')
+    def load(cls, path: Optional[str] = None, max_fanout: Optional[int] = None) -> 'RelationshipGraph':
+        path = path or Config.relationship_graph_path
+        graph = cls(max_fanout)
+        with open(os.path.join(path, 'signatures.jsonl')) as f:
+            for line in f:
+                try:
+                    signature = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-append
+                    continue
+                graph._index(signature['api_url'], set(signature['produces']), set(signature['consumes']))
+        with open(os.path.join(path, 'graph.json')) as f:
+            state = json.load(f)
+        graph.fields = state['fields']
+        graph.field_ids = {field: i for i, field in enumerate(graph.fields)}
+        graph.stale = set(state['stale'])
+        for source, target, fields in state['edges']:
+            graph.overlay_out[source][target] = graph.overlay_in[target][source] = tuple(fields)
+        graph.arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS}
+        graph._arrays_dirty = False
+        graph.path = path
+        return graph
+
+
+def load_graph(path: Optional[str] = None) -> Optional[RelationshipGraph]:
+    """The saved graph, or None if none was built yet or it cannot be read."""
+    path = path or Config.relationship_graph_path
+    if not os.path.exists(os.path.join(path, 'graph.json')):
+        return None
+    try:
+        return RelationshipGraph.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Relationship graph at {path} unreadable, ignoring it: {e}")
+        return None
+
+
+class GraphUpdater:
+    """Adds APIs to the saved graph, one locked reload-add-save at a time.
+
+    The graph stays loaded between calls and is reloaded only when
+    another process saved it since. Thread-safe. Nothing happens until
+    ``build-relationships`` has created a graph.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.relationship_graph_path
+        self._graph: Optional[RelationshipGraph] = None
+        self._stamp = None
+
+    def add(self, api_url: str, endpoints: Iterable[Dict]) -> bool:
+        """Add or update ``api_url``; False if there is no saved graph."""
+        if not os.path.exists(os.path.join(self.path, 'graph.json')):
+            return False
+        # flock excludes other threads of this process too: each call opens the lock file anew
+        with graph_lock(self.path):
+            if self._graph is None or _stamp(self.path) != self._stamp:
+                self._graph = load_graph(self.path)
+                if self._graph is None:
+                    return False
+            self._graph.add(api_url, endpoints)
+            self._graph.save(self.path)
+            self._stamp = _stamp(self.path)
+        return True
+
+
+def graph_lock(path: Optional[str] = None):
+    """Cross-process lock for the graph saved under ``path``; hold it from load to save."""
+    path = path or Config.relationship_graph_path
+    os.makedirs(path, exist_ok=True)
+    return file_lock(os.path.join(path, LOCK_FILE))
+
+
+def _stamp(path: str) -> Tuple[int, int]:
+    # graph.json is replaced on every save, so its inode changes even within one mtime tick
+    stat = os.stat(os.path.join(path, 'graph.json'))
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _replace(path: str, name: str, write) -> None:
+    target = os.path.join(path, name)
+    tmp = f"{target}.tmp"
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, target)
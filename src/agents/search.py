@@ -1,68 +1,110 @@
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from itertools import islice
+from typing import Iterable, List, Dict, Optional
 import logging
 
+import numpy as np
+
+from src.backends import ElasticsearchBackend, SearchBackend
+from src.agents.ranking import PopularityTable, RankWeights, rank_hits
+from src.config import Config
+from src.embeddings.cache import EmbeddingCache
+from src.embeddings.model import encoder_id, get_model
+from src.instrumentation import span, timed
+
 logger = logging.getLogger(__name__)
 
 
 class CatalogSearch:
-    def __init__(self, es_client):
+    def __init__(self, es_client, cache: Optional[EmbeddingCache] = None, embedding_model=None,
+                 backend: Optional[SearchBackend] = None, weights: Optional[RankWeights] = None,
+                 popularity: Optional[PopularityTable] = None):
         self.es = es_client
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.weights = weights or RankWeights.from_env()
+        # Usage aggregates from the rollup; without it ranking reads each hit's _source
+        self.popularity = popularity
+        self.backend = backend if backend is not None else ElasticsearchBackend(es_client)
+        self._embedding_model = embedding_model
+        # Optional MicroBatcher; when set, cache misses from concurrent callers share one model call
+        self.batcher = None
+        self.model_name = Config.embedding_model_name
+        self.cache = cache or EmbeddingCache(
+            encoder_id(self.model_name),
+            Config.embedding_dims,
+            cache_dir=Config.embedding_cache_dir,
+            memory_size=Config.embedding_cache_size
+        )
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        logger.info(f"Searching for: {query}")
-        
-        query_embedding = self.embedding_model.encode(query).tolist()
-        
-        search_body = {
-            "knn": {
-                "field": "description_embedding",
-                "query_vector": query_embedding,
-                "k": top_k,
-                "num_candidates": 100
-            },
-            "_source": [
-                "tool_id", "tool_name", "display_name",
-                "description", "api_base_url", "auth_type",
-                "usage_count", "rating", "endpoints_count"
-            ]
-        }
-        
-        result = self.es.search(index="agent-tools", body=search_body)
-        ranked_results = self._rank_results(result['hits']['hits'])
-        return ranked_results[:top_k]
+    @property
+    def embedding_model(self):
+        # Loaded on first encode so commands that never embed skip torch entirely
+        if self._embedding_model is None:
+            self._embedding_model = get_model(self.model_name)
+        return self._embedding_model
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts``, running the model only on text the cache has not seen."""
+        return self.cache.encode(texts, self._encode_batch)
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        if self.batcher is not None:
+            return self.batcher.encode(texts)
+        return self.run_model(texts)
     
-    def _rank_results(self, hits: List[Dict]) -> List[Dict]:
-        scored_results = []
+    def run_model(self, texts: List[str]) -> np.ndarray:
+        with span('embed.encode'):
+            return self.embedding_model.encode(
+                texts,
+                batch_size=Config.embedding_batch_size,
+                convert_to_numpy=True
+            )
+    
+    @timed('search')
+    def search(self, query: str, top_k: int = 5, filters: Optional[Dict] = None,
+               retrieval: Optional[str] = None) -> List[Dict]:
+        """Top tools for ``query``.
         
-        for hit in hits:
-            tool = hit['_source']
-            es_score = hit['_score']
-            
-            popularity_score = min(tool.get('usage_count', 0) / 1000.0, 1.0)
-            rating_score = tool.get('rating', 0) / 5.0
-            
-            composite_score = (es_score * 0.7 + popularity_score * 0.2 + rating_score * 0.1)
-            
-            scored_results.append({
-                'tool': tool,
-                'relevance_score': es_score,
-                'popularity_score': popularity_score,
-                'rating_score': rating_score,
-                'composite_score': composite_score
-            })
+        ``retrieval`` is ``vector`` (kNN only), ``hybrid`` (lexical and kNN
+        legs in one request) or ``rrf`` (both legs fused by reciprocal rank).
+        ``filters`` such as ``{'auth_type': 'bearer', 'categories': [...]}``
+        are applied inside the kNN search, not after it.
+        """
+        retrieval = retrieval or Config.search_retrieval
+        logger.info(f"Searching for: {query}")
         
-        scored_results.sort(key=lambda x: x['composite_score'], reverse=True)
-        return scored_results
+        query_embedding = self.encode([query])[0]
+        hits = self.backend.search(
+            query_embedding, top_k,
+            num_candidates=Config.search_num_candidates,
+            filters=filters,
+            query_text=query,
+            retrieval=retrieval
+        )
+        # Linear hybrid scores are BM25 + kNN sums, not cosine scores in [0, 1]
+        return self._rank_results(hits, normalize_relevance=(retrieval == 'hybrid'), limit=top_k)
+    
+    def _rank_results(self, hits: List[Dict], normalize_relevance: bool = False,
+                      limit: Optional[int] = None) -> List[Dict]:
+        return rank_hits(hits, self.weights, normalize_relevance=normalize_relevance, limit=limit,
+                         popularity=self.popularity)
     
     def index_tool(self, tool_data: Dict) -> None:
-        embedding = self.embedding_model.encode(tool_data['description']).tolist()
-        tool_data['description_embedding'] = embedding
-        
-        self.es.update(
-            index='agent-tools',
-            id=tool_data['tool_id'],
-            body={'doc': {'description_embedding': embedding}}
-        )
+        self.index_tools([tool_data])
         logger.info(f"Indexed tool with embedding: {tool_data['tool_name']}")
+    
+    @timed('index')
+    def index_tools(self, tools: Iterable[Dict], batch_size: Optional[int] = None) -> int:
+        """Embed and index tools in large batches; returns the number indexed."""
+        batch_size = batch_size or Config.embedding_batch_size
+        tools = iter(tools)
+        count = 0
+        
+        while True:
+            batch = list(islice(tools, batch_size))
+            if not batch:
+                return count
+            
+            embeddings = self.encode([tool['description'] or '' for tool in batch])
+            for tool_data, embedding in zip(batch, embeddings):
+                tool_data['description_embedding'] = embedding.tolist()
+            self.backend.add(batch)
+            count += len(batch)
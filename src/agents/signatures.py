@@ -0,0 +1,192 @@
+"""Python call signatures for discovered endpoints.
+
+Turns endpoint records (as stored in ``api-discoveries``) into what
+generated code needs: a unique method name, valid argument names for
+path and query parameters, and whether a JSON body is accepted. Also
+which fields an endpoint produces in its responses and consumes as
+parameters, used to wire workflows and the relationship graph.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+import keyword
+import re
+
+_NON_IDENTIFIER = re.compile(r'\W+')
+_CAMEL = re.compile(r'(?<=[a-z0-9])(?=[A-Z])')
+
+
+@lru_cache(maxsize=65536)
+def to_identifier(name: str, fallback: str = 'value') -> str:
+    """snake_case Python identifier for an arbitrary OpenAPI name."""
+    name = _NON_IDENTIFIER.sub('_', _CAMEL.sub('_', str(name))).strip('_').lower()
+    if not name:
+        name = fallback
+    if name[0].isdigit():
+        name = f"_{name}"
+    if keyword.iskeyword(name) or name in ('self', 'body'):
+        name = f"{name}_"
+    return name
+
+
+def method_name(endpoint: Dict) -> str:
+    """``operationId`` in snake_case, else ``<method>_<path segments>``."""
+    if endpoint.get('operation_id'):
+        return to_identifier(endpoint['operation_id'], fallback='call')
+    segments = [s.strip('{}') for s in endpoint['path'].split('/') if s]
+    return to_identifier('_'.join([endpoint['method'].lower()] + segments), fallback='call')
+
+
+def endpoint_signature(endpoint: Dict, taken: Optional[Set[str]] = None) -> Dict:
+    """Method name and argument lists for one endpoint.
+
+    ``taken`` collects method names already used in the same class;
+    collisions get a numeric suffix.
+    """
+    name = method_name(endpoint)
+    if taken is not None:
+        base, n = name, 2
+        while name in taken:
+            name = f"{base}_{n}"
+            n += 1
+        taken.add(name)
+
+    path_params: List[Dict] = []
+    query_params: List[Dict] = []
+    has_body = endpoint.get('request_body') is not None
+    used = set()
+    for parameter in endpoint.get('parameters') or []:
+        if not isinstance(parameter, dict) or 'name' not in parameter:
+            continue
+        location = parameter.get('in')
+        if location == 'body':
+            # Swagger 2.0 request body
+            has_body = True
+            continue
+        if location not in ('path', 'query'):
+            continue
+        arg = to_identifier(parameter['name'])
+        while arg in used:
+            arg = f"{arg}_"
+        used.add(arg)
+        param = {'name': parameter['name'], 'arg': arg, 'required': location == 'path' or bool(parameter.get('required'))}
+        (path_params if location == 'path' else query_params).append(param)
+
+    # Path placeholders the spec forgot to declare still need an argument
+    declared = {p['name'] for p in path_params}
+    for placeholder in re.findall(r'{([^}]+)}', endpoint['path']):
+        if placeholder not in declared:
+            arg = to_identifier(placeholder)
+            while arg in used:
+                arg = f"{arg}_"
+            used.add(arg)
+            path_params.append({'name': placeholder, 'arg': arg, 'required': True})
+
+    return {
+        'name': name,
+        'method': endpoint['method'].upper(),
+        'path': endpoint['path'],
+        'summary': endpoint.get('summary') or endpoint.get('description') or '',
+        'path_params': path_params,
+        'query_params': query_params,
+        'has_body': has_body
+    }
+
+
+def endpoint_signatures(endpoints: Iterable[Dict]) -> List[Dict]:
+    taken: Set[str] = set()
+    return [endpoint_signature(endpoint, taken) for endpoint in endpoints]
+
+
+# Too common to say anything about how two endpoints relate
+GENERIC_FIELDS = frozenset({
+    'id', 'name', 'type', 'status', 'description', 'url', 'created_at', 'updated_at',
+    'page', 'per_page', 'page_size', 'limit', 'offset', 'cursor', 'sort', 'order', 'q', 'query', 'format'
+})
+MAX_SCHEMA_DEPTH = 3
+
+
+def body_schema(node: Optional[Dict]) -> Optional[Dict]:
+    """JSON schema of a response or request body: OpenAPI 3 ``content``, or Swagger 2 inline ``schema``."""
+    if not isinstance(node, dict):
+        return None
+    if isinstance(node.get('schema'), dict):
+        return node['schema']
+    content = node.get('content')
+    if isinstance(content, dict):
+        for media_type, media in content.items():
+            if 'json' in media_type and isinstance(media, dict) and isinstance(media.get('schema'), dict):
+                return media['schema']
+    return None
+
+
+def _schema_fields(schema: Dict, prefix: str, fields: Dict[str, str], depth: int) -> None:
+    if depth > MAX_SCHEMA_DEPTH or not isinstance(schema, dict):
+        return
+    if isinstance(schema.get('items'), dict):
+        _schema_fields(schema['items'], f"{prefix}0.", fields, depth + 1)
+    for combined in ('allOf', 'oneOf', 'anyOf'):
+        for part in schema.get(combined) or []:
+            _schema_fields(part, prefix, fields, depth)
+    for name, child in (schema.get('properties') or {}).items():
+        fields.setdefault(to_identifier(name), f"{prefix}{name}")
+        _schema_fields(child, f"{prefix}{name}.", fields, depth + 1)
+
+
+def resource_name(path: str, placeholder: Optional[str] = None) -> Optional[str]:
+    """Singular name of the last literal path segment, or of the one before ``{placeholder}``.
+
+    ``/users/{id}`` -> ``user``; ``/users/{id}/repos`` -> ``repo``, or ``user`` for ``id``.
+    """
+    segments = [segment for segment in path.split('/') if segment]
+    if placeholder is not None and f"{{{placeholder}}}" in segments:
+        segments = segments[:segments.index(f"{{{placeholder}}}")]
+    literals = [segment for segment in segments if not segment.startswith('{')]
+    if not literals:
+        return None
+    name = to_identifier(literals[-1])
+    if name.endswith('ies'):
+        return name[:-3] + 'y'
+    return name[:-1] if name.endswith('s') and not name.endswith('ss') else name
+
+
+def produced_fields(endpoint: Dict) -> Dict[str, str]:
+    """Field name -> dotted path into the response body, for the endpoint's 2xx response schemas.
+
+    An ``id`` is also offered as ``<resource>_id``, so ``GET /users/{id}``
+    produces ``user_id``.
+    """
+    fields: Dict[str, str] = {}
+    for status, response in (endpoint.get('responses') or {}).items():
+        if str(status).startswith('2'):
+            schema = body_schema(response)
+            if schema is not None:
+                _schema_fields(schema, '', fields, 0)
+    resource = resource_name(endpoint.get('path') or '')
+    if resource and 'id' in fields:
+        fields.setdefault(f"{resource}_id", fields['id'])
+    return fields
+
+
+def binding_field(name: str, path: str) -> Optional[str]:
+    """Produced field that can feed parameter ``name`` of ``path``; None for generic names.
+
+    A bare ``{id}`` means the id of the path's resource, so it matches ``<resource>_id``.
+    """
+    field = to_identifier(name)
+    if field == 'id':
+        resource = resource_name(path, name)
+        field = f"{resource}_id" if resource else field
+    return None if field in GENERIC_FIELDS else field
+
+
+def consumed_fields(endpoint: Dict) -> Set[str]:
+    """Binding fields of the path/query parameters and top-level body properties an endpoint takes."""
+    path = endpoint.get('path') or ''
+    names = re.findall(r'{([^}]+)}', path)
+    for parameter in endpoint.get('parameters') or []:
+        if isinstance(parameter, dict) and parameter.get('in') in ('path', 'query') and parameter.get('name'):
+            names.append(parameter['name'])
+    body = body_schema(endpoint.get('request_body'))
+    if body is not None:
+        names.extend(body.get('properties') or {})
+    return {field for field in (binding_field(name, path) for name in names) if field}
@@ -0,0 +1,282 @@
+"""Memory-bounded OpenAPI parsing.
+
+Specs arrive either as an already-decoded dict or as a ``SpecFile``, the
+raw response body spooled to disk. A ``SpecFile`` is read in two passes
+when ijson is installed: one for everything except ``paths``, then one
+over ``paths`` a single path item at a time. Peak memory is therefore set
+by the components section and the records kept, not by the document
+size. Without ijson the file is decoded in one go.
+
+Endpoints become compact ``Endpoint`` records. Parameter, request body
+and response ``$ref``s are resolved only when they are reached, and each
+ref is resolved once. Schema fragments are interned, so identical
+schemas repeated across endpoints share one object.
+"""
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import hashlib
+import json
+import logging
+
+try:
+    import ijson
+except ImportError:  # optional: pip install ijson
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+
+class Endpoint:
+    __slots__ = ('path', 'method', 'summary', 'description', 'operation_id',
+                 'parameters', 'request_body', 'responses')
+
+    def __init__(self, path: str, method: str, summary: str = '', description: str = '',
+                 operation_id: Optional[str] = None, parameters: Tuple = (),
+                 request_body: Optional[Dict] = None, responses: Optional[Dict] = None):
+        self.path = path
+        self.method = method
+        self.summary = summary
+        self.description = description
+        self.operation_id = operation_id
+        self.parameters = parameters
+        self.request_body = request_body
+        self.responses = responses or {}
+
+    def to_dict(self) -> Dict:
+        endpoint = {
+            'path': self.path,
+            'method': self.method,
+            'summary': self.summary,
+            'description': self.description,
+            'parameters': list(self.parameters),
+            'request_body': self.request_body,
+            'responses': self.responses
+        }
+        if self.operation_id:
+            endpoint['operation_id'] = self.operation_id
+        endpoint['fingerprint'] = endpoint_fingerprint(endpoint)
+        return endpoint
+
+
+class SchemaInterner:
+    """Maps equal JSON fragments to one shared instance."""
+
+    def __init__(self):
+        self._pool: Dict[bytes, object] = {}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+    def intern(self, value):
+        if not isinstance(value, (dict, list)):
+            return value
+        key = hashlib.blake2b(
+            json.dumps(value, sort_keys=True, separators=(',', ':'), default=str).encode(),
+            digest_size=16
+        ).digest()
+        existing = self._pool.get(key)
+        if existing is not None:
+            self.hits += 1
+            return existing
+        self._pool[key] = value
+        return value
+
+
+class RefResolver:
+    """Resolves local ``$ref`` pointers against the spec header, memoized per ref."""
+
+    MAX_CHAIN = 32
+
+    def __init__(self, root: Dict):
+        self.root = root
+        self._resolved: Dict[str, object] = {}
+        self._expanded: Dict[str, object] = {}
+
+    def resolve(self, node):
+        """``node`` itself, or its target if it is a ``$ref``; chains are followed."""
+        ref = node.get('$ref') if isinstance(node, dict) else None
+        if not isinstance(ref, str):
+            return node
+        if ref not in self._resolved:
+            target, seen = node, set()
+            while isinstance(target, dict) and isinstance(target.get('$ref'), str):
+                current = target['$ref']
+                if current in seen or len(seen) >= self.MAX_CHAIN or not current.startswith('#/'):
+                    break
+                seen.add(current)
+                target = self._lookup(current)
+                if target is None:
+                    logger.debug(f"Unresolvable $ref: {current}")
+                    target = {'$ref': current}
+                    break
+            self._resolved[ref] = target
+        return self._resolved[ref]
+
+    def expand(self, node, max_depth: int = 8):
+        """Deep copy of ``node`` with nested refs inlined; recursive refs stay as ``$ref``."""
+        return self._expand(node, max_depth, ())
+
+    def _expand(self, node, depth: int, stack: Tuple[str, ...]):
+        if isinstance(node, list):
+            return [self._expand(item, depth, stack) for item in node]
+        if not isinstance(node, dict):
+            return node
+        ref = node.get('$ref')
+        if isinstance(ref, str):
+            if ref in stack or depth <= 0:
+                return {'$ref': ref}
+            # Only whole-subtree expansions at full depth are reusable
+            cacheable = not stack
+            if cacheable and ref in self._expanded:
+                return self._expanded[ref]
+            expanded = self._expand(self.resolve(node), depth - 1, stack + (ref,))
+            if cacheable:
+                self._expanded[ref] = expanded
+            return expanded
+        return {key: self._expand(value, depth, stack) for key, value in node.items()}
+
+    def _lookup(self, ref: str):
+        node = self.root
+        for part in ref[2:].split('/'):
+            part = part.replace('~1', '/').replace('~0', '~')
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+
+class SpecFile:
+    """A spooled spec body plus its decoded header (every top-level key but ``paths``)."""
+
+    def __init__(self, fp: IO[bytes], header: Dict):
+        self.fp = fp
+        self.header = header
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.header
+
+    def get(self, key: str, default=None):
+        return self.header.get(key, default)
+
+    def close(self) -> None:
+        self.fp.close()
+
+    @classmethod
+    def open(cls, fp: IO[bytes]) -> Union['SpecFile', Dict]:
+        """Header-only read when ijson is available, else the fully decoded document."""
+        fp.seek(0)
+        if ijson is None:
+            return json.load(fp)
+        return cls(fp, read_header(fp))
+
+
+class ParsedSpec:
+    __slots__ = ('header', 'endpoints', 'truncated', 'interner')
+
+    def __init__(self, header: Dict, endpoints: List[Endpoint], truncated: bool, interner: SchemaInterner):
+        self.header = header
+        self.endpoints = endpoints
+        self.truncated = truncated
+        self.interner = interner
+
+
+def read_header(fp: IO[bytes]) -> Dict:
+    """Decode every top-level value except ``paths`` in one streaming pass."""
+    header = {}
+    key = builder = None
+    for prefix, event, value in ijson.parse(fp, use_float=True):
+        if prefix == '':
+            if builder is not None and event in ('map_key', 'end_map'):
+                header[key] = builder.value
+                builder = None
+            if event == 'map_key':
+                key = value
+                builder = None if value == 'paths' else ijson.ObjectBuilder()
+            continue
+        if builder is not None:
+            builder.event(event, value)
+    return header
+
+
+def parse_spec(spec: Union[Dict, SpecFile], max_endpoints: Optional[int] = None) -> ParsedSpec:
+    """Compact endpoint records for ``spec``, at most ``max_endpoints`` of them (0/None = all)."""
+    if isinstance(spec, SpecFile):
+        header = spec.header
+        spec.fp.seek(0)
+        paths = ijson.kvitems(spec.fp, 'paths', use_float=True)
+    else:
+        header = {key: value for key, value in spec.items() if key != 'paths'}
+        paths = (spec.get('paths') or {}).items()
+
+    interner = SchemaInterner()
+    endpoints = []
+    truncated = False
+    for endpoint in iter_endpoints(paths, RefResolver(header), interner):
+        if max_endpoints and len(endpoints) >= max_endpoints:
+            truncated = True
+            break
+        endpoints.append(endpoint)
+    if truncated:
+        logger.info(f"Spec truncated to the first {max_endpoints} endpoints")
+    return ParsedSpec(header, endpoints, truncated, interner)
+
+
+def iter_endpoints(paths: Iterable[Tuple[str, Dict]], resolver: RefResolver,
+                   interner: SchemaInterner) -> Iterator[Endpoint]:
+    for path, path_item in paths:
+        path_item = resolver.resolve(path_item)
+        if not isinstance(path_item, dict):
+            continue
+        shared = path_item.get('parameters') or []
+        for method, operation in path_item.items():
+            if method not in HTTP_METHODS or not isinstance(operation, dict):
+                continue
+            yield Endpoint(
+                path=path,
+                method=method.upper(),
+                summary=operation.get('summary', ''),
+                description=operation.get('description', ''),
+                operation_id=operation.get('operationId'),
+                parameters=_parameters(shared, operation.get('parameters') or [], resolver, interner),
+                request_body=interner.intern(resolver.resolve(operation.get('requestBody'))),
+                responses={
+                    str(status): interner.intern(resolver.resolve(response))
+                    for status, response in (operation.get('responses') or {}).items()
+                }
+            )
+
+
+def endpoint_key(endpoint: Dict) -> str:
+    return f"{endpoint['method']} {endpoint['path']}"
+
+
+def endpoint_fingerprint(endpoint: Dict) -> str:
+    """Content hash of an endpoint dict, ignoring any stored fingerprint."""
+    content = {key: value for key, value in endpoint.items() if key != 'fingerprint'}
+    return hashlib.blake2b(
+        json.dumps(content, sort_keys=True, separators=(',', ':'), default=str).encode(),
+        digest_size=8
+    ).hexdigest()
+
+
+def diff_endpoints(old: Iterable[Dict], new: Iterable[Dict]) -> Dict[str, List[str]]:
+    """``METHOD path`` keys added, removed and changed between two endpoint lists."""
+    before = {endpoint_key(e): e.get('fingerprint') or endpoint_fingerprint(e) for e in old}
+    after = {endpoint_key(e): e.get('fingerprint') or endpoint_fingerprint(e) for e in new}
+    return {
+        'added': sorted(after.keys() - before.keys()),
+        'removed': sorted(before.keys() - after.keys()),
+        'changed': sorted(key for key in after.keys() & before.keys() if after[key] != before[key])
+    }
+
+
+def _parameters(shared: List, own: List, resolver: RefResolver, interner: SchemaInterner) -> Tuple:
+    # Operation-level parameters override path-level ones with the same name and location
+    merged = {}
+    for parameter in list(shared) + list(own):
+        parameter = resolver.resolve(parameter)
+        if isinstance(parameter, dict):
+            merged[(parameter.get('name'), parameter.get('in'))] = parameter
+    return tuple(interner.intern(parameter) for parameter in merged.values())
@@ -0,0 +1,380 @@
+"""Dependency graphs of tool calls and a concurrent executor for them.
+
+A workflow is a list of steps, where each step is one call to one endpoint
+of one tool. A step depends on another when one of its arguments is taken
+from the other step's response. Arguments can name their source
+explicitly (``{'$from': 'user', 'path': 'id'}``). A required path
+parameter with no value is bound to an earlier step whose response schema
+produces a field with the same name. For example, ``{owner}`` is taken
+from a step that returns ``owner``, and ``{user_id}`` from one that
+returns ``id`` under ``/users``.
+
+``WorkflowExecutor`` starts each step as soon as the steps it depends on
+have finished, so independent calls overlap. Wall time then follows the
+critical path rather than the sum of the calls. Every step has its own
+timeout. A failed step skips its dependents, and with ``fail_fast``
+cancels everything still running. GET responses are cached for a short
+TTL, and identical GETs issued within one run share a single request.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+import asyncio
+import logging
+import time
+
+from src.agents.signatures import binding_field, endpoint_signature, produced_fields
+from src.config import Config
+from src.instrumentation import count, span
+from src.lookup_cache import MISSING, LookupCache
+from src.transport import AsyncTransport, get_transport
+
+logger = logging.getLogger(__name__)
+
+class WorkflowError(ValueError):
+    """The steps do not form a valid dependency graph."""
+
+
+class Step:
+    """One endpoint call in a workflow.
+
+    ``args`` maps parameter names to literal values or to
+    ``{'$from': <step id>, 'path': 'dotted.path'}`` references.
+    """
+
+    __slots__ = ('id', 'tool', 'base_url', 'method', 'path', 'endpoint', 'args', 'depends_on', 'timeout')
+
+    def __init__(self, id: str, base_url: str, method: str, path: str, endpoint: Optional[Dict] = None,
+                 args: Optional[Dict] = None, depends_on: Iterable[str] = (), timeout: Optional[float] = None,
+                 tool: Optional[str] = None):
+        self.id = id
+        self.tool = tool
+        self.base_url = base_url.rstrip('/')
+        self.method = method.upper()
+        self.path = path
+        self.endpoint = endpoint or {'method': self.method, 'path': path}
+        self.args = dict(args or {})
+        self.depends_on = list(dict.fromkeys(depends_on))
+        self.timeout = timeout
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Step':
+        endpoint = data.get('endpoint')
+        method = data.get('method') or (endpoint or {}).get('method')
+        path = data.get('path') or (endpoint or {}).get('path')
+        if not data.get('id') or not data.get('base_url') or not method or not path:
+            raise WorkflowError(f"A step needs id, base_url, method and path: {data}")
+        return cls(data['id'], data['base_url'], method, path, endpoint=endpoint, args=data.get('args'),
+                   depends_on=data.get('depends_on') or (), timeout=data.get('timeout'), tool=data.get('tool'))
+
+    def references(self) -> List[str]:
+        return [value['$from'] for value in self.args.values() if _is_reference(value)]
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'tool': self.tool,
+            'method': self.method,
+            'path': self.path,
+            'base_url': self.base_url,
+            'args': self.args,
+            'depends_on': self.depends_on
+        }
+
+
+def _is_reference(value) -> bool:
+    return isinstance(value, dict) and '$from' in value
+
+
+class Workflow:
+    """Steps in dependency order, with the edge lists checked for unknown steps and cycles."""
+
+    def __init__(self, steps: Iterable[Step], infer: bool = True):
+        self.steps: Dict[str, Step] = {}
+        for step in steps:
+            if step.id in self.steps:
+                raise WorkflowError(f"Duplicate step id: {step.id}")
+            self.steps[step.id] = step
+        if infer:
+            self._infer_bindings()
+        for step in self.steps.values():
+            step.depends_on = list(dict.fromkeys(step.depends_on + step.references()))
+            unknown = [dep for dep in step.depends_on if dep not in self.steps]
+            if unknown:
+                raise WorkflowError(f"Step {step.id} depends on unknown steps: {', '.join(unknown)}")
+        self.order = self._topological_order()
+
+    @classmethod
+    def from_dicts(cls, steps: Iterable[Dict], infer: bool = True) -> 'Workflow':
+        return cls([Step.from_dict(step) for step in steps], infer=infer)
+
+    def _infer_bindings(self) -> None:
+        # Only earlier steps are candidates, so inferred edges can never close a cycle
+        producers: List[Tuple[Step, Dict[str, str]]] = []
+        for step in self.steps.values():
+            signature = endpoint_signature(step.endpoint)
+            for param in signature['path_params'] + [p for p in signature['query_params'] if p['required']]:
+                if param['name'] in step.args or param['arg'] in step.args:
+                    continue
+                wanted = binding_field(param['name'], step.path)
+                if wanted is None:
+                    continue
+                for producer, fields in reversed(producers):
+                    if wanted in fields:
+                        step.args[param['name']] = {'$from': producer.id, 'path': fields[wanted]}
+                        count('orchestrate.inferred_bindings')
+                        break
+            producers.append((step, produced_fields(step.endpoint)))
+
+    def _topological_order(self) -> List[str]:
+        pending = {step_id: len(step.depends_on) for step_id, step in self.steps.items()}
+        dependents: Dict[str, List[str]] = {step_id: [] for step_id in self.steps}
+        for step in self.steps.values():
+            for dep in step.depends_on:
+                dependents[dep].append(step.id)
+        ready = deque(step_id for step_id, n in pending.items() if n == 0)
+        order = []
+        while ready:
+            step_id = ready.popleft()
+            order.append(step_id)
+            for dependent in dependents[step_id]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(self.steps):
+            cyclic = sorted(step_id for step_id, n in pending.items() if n)
+            raise WorkflowError(f"Steps form a dependency cycle: {', '.join(cyclic)}")
+        return order
+
+    def critical_path(self, durations: Dict[str, float]) -> Tuple[float, List[str]]:
+        """Longest chain of ``durations`` through the graph, and the steps on it."""
+        finish: Dict[str, Tuple[float, Optional[str]]] = {}
+        for step_id in self.order:
+            deps = self.steps[step_id].depends_on
+            before, previous = max(((finish[dep][0], dep) for dep in deps), default=(0.0, None))
+            finish[step_id] = (before + durations.get(step_id, 0.0), previous)
+        if not finish:
+            return 0.0, []
+        step_id = max(finish, key=lambda key: finish[key][0])
+        total, path = finish[step_id][0], []
+        while step_id is not None:
+            path.append(step_id)
+            step_id = finish[step_id][1]
+        return total, path[::-1]
+
+    def to_dicts(self) -> List[Dict]:
+        return [self.steps[step_id].to_dict() for step_id in self.order]
+
+
+def resolve_path(value, path: str):
+    """``value['a'][0]['b']`` for ``'a.0.b'``; a missing key raises ``KeyError``."""
+    for part in filter(None, path.split('.')):
+        if isinstance(value, list):
+            try:
+                value = value[int(part)]
+            except (ValueError, IndexError):
+                raise KeyError(path)
+        elif isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            raise KeyError(path)
+    return value
+
+
+class WorkflowExecutor:
+    """Runs a ``Workflow`` on asyncio, overlapping every step whose dependencies are done.
+
+    HTTP goes through ``AsyncTransport`` when httpx is installed. Otherwise
+    the shared thread-safe ``Transport`` runs on a thread pool. ``cache``
+    keeps successful GET responses for ``Config.orchestrator_get_cache_ttl``
+    seconds.
+    """
+
+    def __init__(self, transport=None, cache: Optional[LookupCache] = None,
+                 step_timeout: Optional[float] = None, max_concurrency: Optional[int] = None,
+                 fail_fast: bool = False):
+        self.transport = transport
+        self.step_timeout = step_timeout or Config.orchestrator_step_timeout
+        self.max_concurrency = max_concurrency or Config.orchestrator_max_concurrency
+        self.fail_fast = fail_fast
+        self.cache = cache if cache is not None else LookupCache(ttl=Config.orchestrator_get_cache_ttl, path=None)
+
+    def run(self, workflow: Workflow, deadline: Optional[float] = None) -> Dict:
+        """Blocking form of ``execute``, for callers without an event loop."""
+        return asyncio.run(self.execute(workflow, deadline))
+
+    async def execute(self, workflow: Workflow, deadline: Optional[float] = None) -> Dict:
+        """Run every step; returns per-step results plus elapsed and critical-path times.
+
+        Steps still running when ``deadline`` seconds have passed are
+        cancelled.
+        """
+        deadline = deadline or Config.orchestrator_deadline
+        started = time.perf_counter()
+        transport, owned = self.transport, False
+        if transport is None:
+            try:
+                transport, owned = AsyncTransport(), True
+            except ImportError:
+                transport = get_transport()
+        run = _Run(self, workflow, transport, started)
+        try:
+            tasks = {step_id: asyncio.ensure_future(run.step(workflow.steps[step_id]))
+                     for step_id in workflow.order}
+            run.tasks = tasks
+            if tasks:
+                _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    await asyncio.wait(pending)
+        finally:
+            if owned:
+                await transport.aclose()
+            run.close()
+
+        elapsed = time.perf_counter() - started
+        for step_id in workflow.order:
+            run.results.setdefault(step_id, {'status': 'cancelled'})
+        # Network time only: queueing for a slot or for a shared GET is not part of the path
+        durations = {step_id: result['call_ms'] / 1000 for step_id, result in run.results.items()
+                     if result.get('call_ms') is not None}
+        critical, path = workflow.critical_path(durations)
+        failed = [step_id for step_id, result in run.results.items() if result['status'] != 'ok']
+        return {
+            'status': 'failed' if failed else 'completed',
+            'steps': {step_id: run.results[step_id] for step_id in workflow.order},
+            'order': workflow.order,
+            'elapsed_ms': round(elapsed * 1000, 3),
+            'critical_path': path,
+            'critical_path_ms': round(critical * 1000, 3),
+            'sum_ms': round(sum(durations.values()) * 1000, 3)
+        }
+
+
+class _Run:
+    """State of one ``execute`` call: results so far, running tasks, in-flight GETs."""
+
+    def __init__(self, executor: WorkflowExecutor, workflow: Workflow, transport, started: float):
+        self.executor = executor
+        self.workflow = workflow
+        self.transport = transport
+        self.started = started
+        self.is_async = asyncio.iscoroutinefunction(getattr(transport, 'request', None))
+        self.pool = None if self.is_async else ThreadPoolExecutor(
+            max_workers=executor.max_concurrency, thread_name_prefix='orchestrate')
+        self.limit = asyncio.Semaphore(executor.max_concurrency)
+        self.results: Dict[str, Dict] = {}
+        self.tasks: Dict[str, asyncio.Future] = {}
+        self.inflight: Dict[str, asyncio.Future] = {}
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
+    async def step(self, step: Step) -> None:
+        try:
+            deps = [self.tasks[dep] for dep in step.depends_on]
+            if deps:
+                await asyncio.wait(deps)
+            failed = [dep for dep in step.depends_on if self.results[dep]['status'] != 'ok']
+            if failed:
+                self.results[step.id] = {'status': 'skipped', 'error': f"Dependency failed: {', '.join(failed)}"}
+                return
+            self.results[step.id] = await self._call(step)
+        except asyncio.CancelledError:
+            self.results.setdefault(step.id, {'status': 'cancelled'})
+            raise
+        if self.results[step.id]['status'] != 'ok' and self.executor.fail_fast:
+            current = asyncio.current_task()
+            for task in self.tasks.values():
+                if task is not current:
+                    task.cancel()
+
+    async def _call(self, step: Step) -> Dict:
+        try:
+            method, url, params, body = self._request(step)
+        except KeyError as e:
+            return {'status': 'error', 'error': f"Unresolved argument {e}"}
+        timeout = step.timeout or self.executor.step_timeout
+        started = time.perf_counter()
+        result = {'status': 'ok', 'started_ms': round((started - self.started) * 1000, 3)}
+        try:
+            with span('orchestrate.step'):
+                status_code, data, source, seconds = await asyncio.wait_for(
+                    self._fetch(method, url, params, body, timeout), timeout)
+        except asyncio.TimeoutError:
+            result.update(status='timeout', error=f"No response within {timeout}s")
+        except Exception as e:
+            result.update(status='error', error=str(e))
+        else:
+            result.update(status_code=status_code, data=data, source=source, call_ms=round(seconds * 1000, 3))
+            if status_code >= 400:
+                result.update(status='error', error=f"HTTP {status_code}")
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        count(f"orchestrate.steps_{result['status']}")
+        return result
+
+    def _request(self, step: Step) -> Tuple[str, str, Dict, Optional[Dict]]:
+        args = {name: resolve_path(self.results[value['$from']].get('data'), value.get('path', ''))
+                if _is_reference(value) else value for name, value in step.args.items()}
+        signature = endpoint_signature(step.endpoint)
+        path = step.path
+        for param in signature['path_params']:
+            value = args.pop(param['name'], args.pop(param['arg'], None))
+            if value is None:
+                raise KeyError(param['name'])
+            path = path.replace(f"{{{param['name']}}}", quote(str(value), safe=''))
+        params = {}
+        for param in signature['query_params']:
+            if param['name'] in args or param['arg'] in args:
+                params[param['name']] = args.pop(param['name'], args.pop(param['arg'], None))
+        body = None
+        if args:
+            if signature['has_body'] or step.method in ('POST', 'PUT', 'PATCH'):
+                body = args
+            else:
+                params.update(args)
+        return step.method, f"{step.base_url}{path}", params, body
+
+    async def _fetch(self, method: str, url: str, params: Dict, body: Optional[Dict],
+                     timeout: float) -> Tuple[int, object, str, float]:
+        """Status, body, where it came from (``network``, ``cache``, ``shared``) and network seconds."""
+        if method != 'GET':
+            status_code, data, seconds = await self._send(method, url, params, body, timeout)
+            return status_code, data, 'network', seconds
+        key = f"{url}?{urlencode(sorted(params.items()), doseq=True)}" if params else url
+        cached = self.executor.cache.get('get', key)
+        if cached is not MISSING:
+            count('orchestrate.get_cache_hits')
+            return cached[0], cached[1], 'cache', 0.0
+        shared = self.inflight.get(key)
+        owner = shared is None
+        if owner:
+            shared = self.inflight[key] = asyncio.ensure_future(self._send(method, url, params, None, timeout))
+        # Shielded so one waiter timing out does not cancel the request for the others
+        status_code, data, seconds = await asyncio.shield(shared)
+        if not owner:
+            return status_code, data, 'shared', 0.0
+        if 200 <= status_code < 300:
+            self.executor.cache.put('get', key, [status_code, data])
+        return status_code, data, 'network', seconds
+
+    async def _send(self, method: str, url: str, params: Dict, body: Optional[Dict],
+                    timeout: float) -> Tuple[int, object, float]:
+        kwargs = {'params': params or None, 'json': body, 'timeout': timeout}
+        async with self.limit:
+            started = time.perf_counter()
+            if self.is_async:
+                response = await self.transport.request(method, url, **kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(
+                    self.pool, lambda: self.transport.request(method, url, **kwargs))
+            seconds = time.perf_counter() - started
+        try:
+            data = response.json()
+        except ValueError:
+            data = response.text
+        return response.status_code, data, seconds
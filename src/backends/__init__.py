@@ -0,0 +1,5 @@
+from src.backends.base import SearchBackend
+from src.backends.es import ElasticsearchBackend
+from src.backends.local import LocalVectorIndex
+
+__all__ = ['SearchBackend', 'ElasticsearchBackend', 'LocalVectorIndex']
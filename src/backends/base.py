@@ -0,0 +1,30 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Fields every backend returns in a hit's _source, as CatalogSearch._rank_results expects
+SOURCE_FIELDS = [
+    "tool_id", "tool_name", "display_name",
+    "description", "api_base_url", "auth_type",
+    "usage_count", "rating", "success_rate", "endpoints_count",
+    "source_api_discovery_id"
+]
+
+
+class SearchBackend:
+    """Vector search over catalog tools.
+
+    ``search`` returns Elasticsearch-shaped hits (``_id``, ``_score``,
+    ``_source``), so ranking works the same whatever the backend.
+    Backends without a lexical index answer ``hybrid``/``rrf`` retrieval
+    with vector search only.
+    """
+
+    def search(self, query_vector: np.ndarray, top_k: int, num_candidates: int = 100,
+               filters: Optional[Dict] = None, query_text: Optional[str] = None,
+               retrieval: str = 'vector') -> List[Dict]:
+        raise NotImplementedError
+
+    def add(self, tools: Iterable[Dict]) -> None:
+        """Store tools whose ``description_embedding`` is already set."""
+        raise NotImplementedError
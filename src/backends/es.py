@@ -0,0 +1,86 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.agents.ranking import reciprocal_rank_fusion
+from src.backends.base import SearchBackend, SOURCE_FIELDS
+from src.lookup_cache import get_lookup_cache
+
+LEXICAL_FIELDS = ["display_name^3", "description^2", "tags^2", "categories^2", "readme"]
+
+
+class ElasticsearchBackend(SearchBackend):
+    """kNN, hybrid or RRF-fused search against the ``agent-tools`` index."""
+
+    def __init__(self, es_client, index: str = 'agent-tools', lexical_boost: float = 0.3,
+                 vector_boost: float = 1.0, rrf_k: int = 60):
+        self.es = es_client
+        self.index = index
+        self.lexical_boost = lexical_boost
+        self.vector_boost = vector_boost
+        self.rrf_k = rrf_k
+
+    def search(self, query_vector: np.ndarray, top_k: int, num_candidates: int = 100,
+               filters: Optional[Dict] = None, query_text: Optional[str] = None,
+               retrieval: str = 'vector') -> List[Dict]:
+        clauses = filter_clauses(filters) if filters else []
+        knn = self._knn(query_vector, top_k, num_candidates, clauses)
+
+        if retrieval == 'rrf' and query_text:
+            # Both legs in one _msearch round-trip, fused client-side
+            lexical = {"query": self._lexical(query_text, clauses), "size": top_k * 2, "_source": SOURCE_FIELDS}
+            vector = {"knn": knn, "size": top_k * 2, "_source": SOURCE_FIELDS}
+            responses = self.es.msearch(index=self.index, searches=[lexical, vector])
+            return reciprocal_rank_fusion([r['hits']['hits'] for r in responses], k=self.rrf_k)
+
+        search_body = {"knn": knn, "size": top_k, "_source": SOURCE_FIELDS}
+        if retrieval == 'hybrid' and query_text:
+            knn["boost"] = self.vector_boost
+            search_body["query"] = self._lexical(query_text, clauses)
+
+        result = self.es.search(index=self.index, body=search_body)
+        return result['hits']['hits']
+
+    def _knn(self, query_vector: np.ndarray, top_k: int, num_candidates: int, clauses: List[Dict]) -> Dict:
+        knn = {
+            "field": "description_embedding",
+            "query_vector": np.asarray(query_vector).tolist(),
+            "k": top_k,
+            "num_candidates": max(num_candidates, top_k)
+        }
+        if clauses:
+            knn["filter"] = clauses
+        return knn
+
+    def _lexical(self, query_text: str, clauses: List[Dict]) -> Dict:
+        return {
+            "bool": {
+                "must": {
+                    "multi_match": {
+                        "query": query_text,
+                        "fields": LEXICAL_FIELDS,
+                        "type": "best_fields",
+                        "boost": self.lexical_boost
+                    }
+                },
+                "filter": clauses
+            }
+        }
+
+    def add(self, tools: Iterable[Dict]) -> None:
+        for tool_data in tools:
+            self.es.write_update(self.index, tool_data['tool_id'],
+                                 {'description_embedding': tool_data['description_embedding']})
+            if tool_data.get('source_api_discovery_id'):
+                # The cached tool document no longer matches the stored one
+                get_lookup_cache().invalidate('tool', tool_data['source_api_discovery_id'])
+
+
+def filter_clauses(filters: Dict) -> List[Dict]:
+    clauses = []
+    for field, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({"terms": {field: list(value)}})
+        else:
+            clauses.append({"term": {field: value}})
+    return clauses
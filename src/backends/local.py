@@ -0,0 +1,230 @@
+from typing import Dict, Iterable, List, Optional
+import json
+import logging
+import mmap
+import os
+
+import numpy as np
+
+from src.backends.base import SearchBackend, SOURCE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+META_FIELDS = SOURCE_FIELDS + ["categories", "tags"]
+
+
+class LocalVectorIndex(SearchBackend):
+    """In-process vector index over a contiguous float32 matrix.
+
+    A snapshot directory holds ``vectors.npy`` (unit-normalized rows),
+    ``meta.jsonl`` plus ``meta_offsets.npy`` (one compact metadata record
+    per row), and optionally ``ivf.npz``. Loading memory-maps all of it,
+    so it takes milliseconds whatever the catalog size. Metadata is only
+    decoded for the rows a query returns.
+
+    Search is an exact vectorized dot product. After ``build_ivf`` a
+    coarse inverted-file mode is available: rows are clustered with
+    k-means and a query only scans its ``nprobe`` nearest lists.
+    """
+
+    VECTORS_FILE = 'vectors.npy'
+    META_FILE = 'meta.jsonl'
+    OFFSETS_FILE = 'meta_offsets.npy'
+    IVF_FILE = 'ivf.npz'
+
+    def __init__(self, dims: int = 384, ivf_min_rows: int = 20000, nprobe: int = 8):
+        self.dims = dims
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.vectors = np.empty((0, dims), dtype=np.float32)
+        self._meta_bytes = None
+        self._meta_offsets = np.zeros(1, dtype=np.int64)
+        self._overrides: Dict[int, Dict] = {}
+        self._new_meta: List[Dict] = []
+        self._row_of: Optional[Dict[str, int]] = None
+        self._columns: Dict[str, np.ndarray] = {}
+        self._ivf = None
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'LocalVectorIndex':
+        index = cls(**kwargs)
+        index.vectors = np.load(os.path.join(path, cls.VECTORS_FILE), mmap_mode='r')
+        index.dims = index.vectors.shape[1]
+        index._meta_offsets = np.load(os.path.join(path, cls.OFFSETS_FILE), mmap_mode='r')
+        with open(os.path.join(path, cls.META_FILE), 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                index._meta_bytes = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        ivf_path = os.path.join(path, cls.IVF_FILE)
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            index._ivf = {name: ivf[name] for name in ivf.files}
+        return index
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        rows = [json.dumps(self._meta(i), separators=(',', ':')).encode() + b'\n' for i in range(len(self))]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(row) for row in rows])
+
+        def replace(name, write):
+            target = os.path.join(path, name)
+            tmp = f"{target}.tmp"
+            with open(tmp, 'wb') as f:
+                write(f)
+            os.replace(tmp, target)
+
+        replace(self.VECTORS_FILE, lambda f: np.save(f, np.ascontiguousarray(self.vectors)))
+        replace(self.OFFSETS_FILE, lambda f: np.save(f, offsets))
+        replace(self.META_FILE, lambda f: f.writelines(rows))
+        if self._ivf is not None:
+            replace(self.IVF_FILE, lambda f: np.savez(f, **self._ivf))
+        elif os.path.exists(os.path.join(path, self.IVF_FILE)):
+            os.remove(os.path.join(path, self.IVF_FILE))
+
+    def add(self, tools: Iterable[Dict]) -> None:
+        tools = [tool for tool in tools if tool.get('description_embedding') is not None]
+        if not tools:
+            return
+        row_of = self._rows_by_id()
+        vectors = _normalize(np.asarray([tool['description_embedding'] for tool in tools], dtype=np.float32))
+
+        appended = []
+        updates = {}
+        for tool, vector in zip(tools, vectors):
+            meta = {field: tool.get(field) for field in META_FIELDS if tool.get(field) is not None}
+            row = row_of.get(tool['tool_id'])
+            if row is None:
+                row_of[tool['tool_id']] = len(self) + len(appended)
+                appended.append((meta, vector))
+            else:
+                updates[row] = (meta, vector)
+
+        # Memory-mapped snapshots are read-only; the first write takes a private copy
+        if updates:
+            self.vectors = np.array(self.vectors)
+            for row, (meta, vector) in updates.items():
+                self.vectors[row] = vector
+                self._overrides[row] = meta
+        if appended:
+            self.vectors = np.vstack([self.vectors, np.asarray([v for _, v in appended])])
+            self._new_meta.extend(meta for meta, _ in appended)
+        self._columns = {}
+
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        """Cluster rows into ``n_lists`` inverted lists for approximate search."""
+        n = len(self)
+        if n == 0:
+            return
+        n_lists = min(n_lists or max(1, int(np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[rng.choice(n, size=min(n, n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        assignment = np.concatenate([
+            np.argmax(self.vectors[start:start + 65536] @ centroids.T, axis=1)
+            for start in range(0, n, 65536)
+        ])
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        self._ivf = {'centroids': centroids, 'order': order, 'offsets': offsets, 'rows': np.array(n)}
+
+    def search(self, query_vector: np.ndarray, top_k: int, num_candidates: int = 100,
+               filters: Optional[Dict] = None, query_text: Optional[str] = None,
+               retrieval: str = 'vector', method: str = 'auto', nprobe: Optional[int] = None) -> List[Dict]:
+        if len(self) == 0 or top_k <= 0:
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+
+        use_ivf = self._ivf is not None and (method == 'ivf' or (method == 'auto' and len(self) >= self.ivf_min_rows))
+        rows = self._ivf_candidates(query, nprobe or self.nprobe) if use_ivf else None
+
+        if filters:
+            mask = self._filter_mask(filters)
+            rows = np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+
+        if rows is None:
+            scores = self.vectors @ query
+        else:
+            if len(rows) == 0:
+                return []
+            scores = self.vectors[rows] @ query
+
+        k = min(top_k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for i in top:
+            row = int(i if rows is None else rows[i])
+            meta = self._meta(row)
+            hits.append({
+                '_id': meta.get('tool_id'),
+                # Same [0, 1] mapping Elasticsearch applies to cosine similarity
+                '_score': float((1 + scores[i]) / 2),
+                '_source': meta
+            })
+        return hits
+
+    def _ivf_candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        ivf = self._ivf
+        centroids, order, offsets = ivf['centroids'], ivf['order'], ivf['offsets']
+        nprobe = max(1, min(nprobe, len(centroids)))
+        lists = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        parts = [order[offsets[c]:offsets[c + 1]] for c in lists]
+        covered = int(ivf['rows'])
+        if covered < len(self):
+            # Rows added since the lists were built are always scanned exactly
+            parts.append(np.arange(covered, len(self)))
+        return np.sort(np.concatenate(parts))
+
+    def _filter_mask(self, filters: Dict) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        for field, wanted in filters.items():
+            wanted = set(wanted) if isinstance(wanted, (list, tuple, set)) else {wanted}
+            column = self._column(field)
+            mask &= np.fromiter(
+                (bool(wanted.intersection(v)) if isinstance(v, list) else v in wanted for v in column),
+                dtype=bool, count=len(column)
+            )
+        return mask
+
+    def _column(self, field: str) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            column = np.empty(len(self), dtype=object)
+            for row in range(len(self)):
+                column[row] = self._meta(row).get(field)
+            self._columns[field] = column
+        return column
+
+    def _rows_by_id(self) -> Dict[str, int]:
+        if self._row_of is None:
+            self._row_of = {self._meta(row)['tool_id']: row for row in range(len(self))}
+        return self._row_of
+
+    def _meta(self, row: int) -> Dict:
+        if row in self._overrides:
+            return self._overrides[row]
+        stored = len(self._meta_offsets) - 1
+        if row >= stored:
+            return self._new_meta[row - stored]
+        start, end = int(self._meta_offsets[row]), int(self._meta_offsets[row + 1])
+        return json.loads(self._meta_bytes[start:end])
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
@@ -0,0 +1,274 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from src.agents.introspector import APIIntrospector
+from src.agents.generator import ToolGenerator
+from src.agents.relationships import GraphUpdater
+from src.elasticsearch.client import bulk_tag
+from src.instrumentation import trace
+from src.urls import host_key, normalize_url
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('ok', 'failed', 'duplicate')
+
+
+def read_urls(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+class BatchReport:
+    """Append-only JSONL report; doubles as the resume checkpoint."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[str, Dict]:
+        """Last recorded entry per normalized URL."""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-write
+                    continue
+                entries[entry['url']] = entry
+        return entries
+
+    def write(self, entry: Dict) -> None:
+        with self._lock:
+            if self._file is None:
+                parent = os.path.dirname(self.path)
+                if parent:
+                    os.makedirs(parent, exist_ok=True)
+                self._file = open(self.path, 'a')
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class BatchStats:
+    def __init__(self):
+        self.ok = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.resumed = 0
+        self.index_failures = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def processed(self) -> int:
+        return self.ok + self.failed
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def urls_per_minute(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.processed / elapsed * 60 if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'ok': self.ok,
+            'failed': self.failed,
+            'duplicates': self.duplicates,
+            'resumed': self.resumed,
+            'index_failures': self.index_failures,
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'urls_per_minute': round(self.urls_per_minute, 1)
+        }
+
+
+class BatchPipeline:
+    """Runs discovery -> generation -> indexing for many API URLs.
+
+    Each stage has its own bounded thread pool, and the introspector,
+    generator and ES client are shared across all URLs. URLs are deduped
+    per host, and hosts already recorded in the report are skipped, so an
+    interrupted run can simply be started again. ES writes go through the
+    client's bulk writer for the duration of the run. A URL is reported
+    ``ok`` only once the writer has sent its documents. If any of them
+    failed, it is reported ``failed`` at the ``indexing`` stage.
+    """
+
+    def __init__(self, es_client, output_dir: str, report_path: str, skip_index: bool = False,
+                 search_agent=None, discovery_workers: int = 16, generation_workers: int = 4,
+                 index_workers: int = 2, retry_failed: bool = False):
+        self.es = es_client
+        self.output_dir = output_dir
+        self.report = BatchReport(report_path)
+        self.skip_index = skip_index
+        self.search_agent = search_agent
+        self.retry_failed = retry_failed
+
+        self.introspector = APIIntrospector(es_client, skip_index=skip_index)
+        self.generator = ToolGenerator(es_client, skip_index=skip_index)
+        self.graph = GraphUpdater()
+
+        self._discovery_pool = ThreadPoolExecutor(discovery_workers, thread_name_prefix='discover')
+        self._generation_pool = ThreadPoolExecutor(generation_workers, thread_name_prefix='generate')
+        self._index_pool = ThreadPoolExecutor(index_workers, thread_name_prefix='index')
+
+        # Caps URLs in flight so a huge input never queues up in memory
+        self._inflight = threading.BoundedSemaphore(discovery_workers * 4)
+        self._pending = 0
+        self._done = threading.Condition()
+        self.stats = BatchStats()
+
+    def run(self, urls: Iterable[str]) -> BatchStats:
+        seen_hosts, recorded = self._resume_state()
+        if not self.skip_index:
+            self.es.start_bulk()
+
+        try:
+            for raw_url in urls:
+                url = normalize_url(raw_url)
+                if url in recorded:
+                    continue
+                host = host_key(url)
+                if host in seen_hosts:
+                    if seen_hosts[host] != url:
+                        self.stats.duplicates += 1
+                        self.report.write({'url': url, 'status': 'duplicate', 'duplicate_of': seen_hosts[host]})
+                    continue
+                seen_hosts[host] = url
+
+                self._inflight.acquire()
+                with self._done:
+                    self._pending += 1
+                self._discovery_pool.submit(self._discover, url, time.monotonic())
+
+            with self._done:
+                self._done.wait_for(lambda: self._pending == 0)
+        finally:
+            for pool in (self._discovery_pool, self._generation_pool, self._index_pool):
+                pool.shutdown(wait=True)
+            writer = None if self.skip_index else self.es.stop_bulk()
+            if writer is not None:
+                self.stats.index_failures = len(writer.failures)
+            self.report.close()
+            self.stats.finished_at = time.monotonic()
+
+        return self.stats
+
+    def _resume_state(self) -> Tuple[Dict[str, str], Set[str]]:
+        seen_hosts = {}
+        recorded = set()
+        for url, entry in self.report.load().items():
+            if entry['status'] not in TERMINAL_STATUSES:
+                continue
+            if entry['status'] == 'failed' and self.retry_failed:
+                continue
+            recorded.add(url)
+            if entry['status'] == 'duplicate':
+                seen_hosts.setdefault(host_key(url), entry['duplicate_of'])
+            else:
+                seen_hosts[host_key(url)] = url
+                self.stats.resumed += 1
+        if self.stats.resumed:
+            logger.info(f"Resuming: {self.stats.resumed} URLs already processed")
+        return seen_hosts, recorded
+
+    def _discover(self, url: str, started: float) -> None:
+        try:
+            with trace(url), bulk_tag(url):
+                discovery = self.introspector.discover(url)
+        except Exception as e:
+            return self._finish(url, started, 'failed', stage='discovery', error=str(e))
+
+        if discovery.get('discovery_status') == 'failed':
+            return self._finish(url, started, 'failed', stage='discovery',
+                                error=discovery.get('error_message'))
+        self._generation_pool.submit(self._generate, url, discovery, started)
+
+    def _generate(self, url: str, discovery: Dict, started: float) -> None:
+        try:
+            with trace(url), bulk_tag(url):
+                tool_data = self.generator.generate(url, discovery_data=discovery)
+                paths = self.generator.write_files(tool_data, self.output_dir, discovery_data=discovery)
+        except Exception as e:
+            return self._finish(url, started, 'failed', stage='generation', error=str(e))
+        # A discovery already stored comes back as its header and is in the graph
+        if 'endpoints' in discovery:
+            try:
+                self.graph.add(url, discovery['endpoints'])
+            except Exception as e:
+                logger.warning(f"Relationship graph not updated for {url}: {e}")
+
+        if self.skip_index or self.search_agent is None or 'description_embedding' in tool_data:
+            return self._finish(url, started, 'ok', tool_data=tool_data, paths=paths)
+        self._index_pool.submit(self._index, url, tool_data, paths, started)
+
+    def _index(self, url: str, tool_data: Dict, paths: Dict, started: float) -> None:
+        try:
+            with trace(url), bulk_tag(url):
+                self.search_agent.index_tool(tool_data)
+        except Exception as e:
+            return self._finish(url, started, 'failed', stage='indexing', error=str(e))
+        self._finish(url, started, 'ok', tool_data=tool_data, paths=paths)
+
+    def _finish(self, url: str, started: float, status: str, stage: Optional[str] = None,
+                error: Optional[str] = None, tool_data: Optional[Dict] = None,
+                paths: Optional[Dict] = None) -> None:
+        entry = {'url': url, 'status': status, 'seconds': round(time.monotonic() - started, 3)}
+        if stage:
+            entry['stage'] = stage
+        if error:
+            entry['error'] = error
+        if tool_data:
+            entry['tool_name'] = tool_data['tool_name']
+            entry['endpoints_count'] = tool_data.get('endpoints_count')
+        if paths:
+            entry.update(paths)
+        writer = None if self.skip_index else self.es.bulk_writer
+        if status == 'ok' and writer is not None:
+            # The report is the resume checkpoint: wait until the URL's documents are sent
+            writer.after_flush(lambda: self._acknowledge(writer, entry))
+            return
+        self._record(entry)
+
+    def _acknowledge(self, writer, entry: Dict) -> None:
+        failed = [failure for failure in writer.failures if failure.get('tag') == entry['url']]
+        if failed:
+            first = failed[0]
+            entry.update(status='failed', stage='indexing',
+                         error=f"{len(failed)} bulk items failed, first {first['index']}/{first['id']}: "
+                               f"{first['status']} {first['error']}")
+        self._record(entry)
+
+    def _record(self, entry: Dict) -> None:
+        try:
+            self.report.write(entry)
+        except Exception as e:
+            logger.error(f"Could not record {entry['url']} in {self.report.path}: {e}")
+        finally:
+            with self._done:
+                if entry['status'] == 'ok':
+                    self.stats.ok += 1
+                else:
+                    self.stats.failed += 1
+                    logger.warning(f"{entry['url']} failed during {entry.get('stage')}: {entry.get('error')}")
+                self._pending -= 1
+                self._done.notify_all()
+            self._inflight.release()
@@ -1,23 +1,67 @@
 import click
-from elasticsearch import Elasticsearch
-from src.agents.introspector import APIIntrospector
-from src.agents.generator import ToolGenerator
-from src.agents.search import CatalogSearch
-from src.agents.orchestrator import ToolOrchestrator
 from src.config import Config
-from src.elasticsearch.client import ESClient
-from src.elasticsearch.schemas import (
-    API_DISCOVERIES_MAPPING,
-    AGENT_TOOLS_MAPPING,
-    TOOL_USAGE_LOGS_MAPPING
-)
+import functools
 import logging
 import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _search_backend(backend, index_path):
+    if backend == 'local':
+        from src.backends import LocalVectorIndex
+        return LocalVectorIndex.load(index_path)
+    return None
+
+
+BACKEND_OPTION = click.option(
+    '--backend', type=click.Choice(['elasticsearch', 'local']), default=Config.search_backend,
+    help='Search Elasticsearch or the in-process index snapshot'
+)
+INDEX_PATH_OPTION = click.option(
+    '--index-path', default=Config.local_index_path, help='Local vector index snapshot directory'
+)
+BULK_LOAD_OPTION = click.option(
+    '--bulk-load', is_flag=True,
+    help='Turn off refresh and replicas of the written indices while loading; force-merge afterwards'
+)
+
+
+def _bulk_load(es, enabled, names):
+    """Bulk-load mode for ``names`` if ``enabled``, else a no-op context."""
+    from contextlib import nullcontext
+    if not enabled:
+        return nullcontext()
+    from src.elasticsearch.indices import IndexManager
+    return IndexManager(es).bulk_load(names)
+
+
+def profile_options(fn):
+    """``--profile``/``--profile-out``: record spans while the command runs, then report them."""
+    @click.option('--profile', is_flag=True,
+                  help='Time HTTP probes, ES calls, encodes and renders; print a summary to stderr')
+    @click.option('--profile-out', default=None,
+                  help='Write the profile to this file: Prometheus text for .prom/.txt, JSON otherwise')
+    @functools.wraps(fn)
+    def wrapper(*args, profile, profile_out, **kwargs):
+        if not (profile or profile_out):
+            return fn(*args, **kwargs)
+        from src import instrumentation
+        
+        instrumentation.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            instrumentation.disable()
+            if profile:
+                click.echo(instrumentation.summary(), err=True)
+            if profile_out:
+                instrumentation.recorder.export(profile_out)
+    return wrapper
+
+
 @click.group()
 def cli():
     """Agent Nexus - Turn any API into an AI-native tool in 30 seconds"""
@@ -28,7 +72,23 @@ def cli():
 @click.argument('api_url')
 @click.option('--output-dir', default='generated_tools', help='Output directory')
 @click.option('--skip-index', is_flag=True, help='Skip Elasticsearch indexing for speed')
-def generate(api_url, output_dir, skip_index):
+@click.option('--local-index', 'local_index', default=None, help='Also add the tool to this local index snapshot')
+@profile_options
+def generate(api_url, output_dir, skip_index, local_index):
+    from src.instrumentation import trace
+    
+    # Attributes every span of this run to the API in --profile output
+    with trace(api_url):
+        _generate(api_url, output_dir, skip_index, local_index)
+
+
+def _generate(api_url, output_dir, skip_index, local_index):
+    from src.agents.introspector import APIIntrospector
+    from src.agents.generator import ToolGenerator
+    from src.agents.relationships import GraphUpdater
+    from src.elasticsearch.client import ESClient
+    
+    start = time.perf_counter()
     config = Config()
     es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
 
@@ -40,33 +100,138 @@ def generate(api_url, output_dir, skip_index):
         return
     
     generator = ToolGenerator(es, skip_index=skip_index)
-    tool_data = generator.generate(api_url)
+    tool_data = generator.generate(api_url, discovery_data=discovery)
+    generator.write_files(tool_data, output_dir, discovery_data=discovery)
+    
+    # Only an existing graph is kept up to date; `build-relationships` creates it.
+    # A discovery already stored comes back as its header and is in the graph.
+    if 'endpoints' in discovery:
+        GraphUpdater().add(api_url, discovery['endpoints'])
+    
+    if local_index:
+        from src.agents.search import CatalogSearch
+        from src.backends import LocalVectorIndex
+        
+        exists = os.path.exists(os.path.join(local_index, LocalVectorIndex.VECTORS_FILE))
+        index = LocalVectorIndex.load(local_index) if exists else LocalVectorIndex(config.embedding_dims)
+        CatalogSearch(es, backend=index).index_tool(tool_data)
+        index.save(local_index)
+    
+    click.echo(f"✓ {tool_data['tool_name']} ({time.perf_counter() - start:.1f}s)")
+
+
+@cli.command('generate-batch')
+@click.argument('source', type=click.File('r'), default='-')
+@click.option('--output-dir', default='generated_tools', help='Output directory')
+@click.option('--report', 'report_path', default='batch_report.jsonl', help='JSONL report, also used to resume')
+@click.option('--skip-index', is_flag=True, help='Skip Elasticsearch indexing for speed')
+@click.option('--discovery-workers', default=16, help='Concurrent discoveries')
+@click.option('--generation-workers', default=4, help='Concurrent generations')
+@click.option('--index-workers', default=2, help='Concurrent embedding index writes')
+@click.option('--retry-failed', is_flag=True, help='Re-run URLs recorded as failed in the report')
+@BULK_LOAD_OPTION
+@profile_options
+def generate_batch(source, output_dir, report_path, skip_index, discovery_workers,
+                   generation_workers, index_workers, retry_failed, bulk_load):
+    """Generate tools for every API URL in SOURCE (a file, or - for stdin)"""
+    from src.agents.search import CatalogSearch
+    from src.batch import BatchPipeline, read_urls
+    from src.elasticsearch.client import ESClient
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    search_agent = None if skip_index else CatalogSearch(es)
     
-    os.makedirs(output_dir, exist_ok=True)
+    pipeline = BatchPipeline(
+        es, output_dir, report_path,
+        skip_index=skip_index,
+        search_agent=search_agent,
+        discovery_workers=discovery_workers,
+        generation_workers=generation_workers,
+        index_workers=index_workers,
+        retry_failed=retry_failed
+    )
+    with _bulk_load(es, bulk_load and not skip_index, ['api-discoveries', 'api-endpoints', 'api-schemas', 'agent-tools']):
+        stats = pipeline.run(read_urls(source))
     
-    tool_file = os.path.join(output_dir, f"{tool_data['tool_name']}.py")
-    readme_file = os.path.join(output_dir, f"{tool_data['tool_name']}_README.md")
+    click.echo(f"✓ {stats.ok} ok, {stats.failed} failed, {stats.duplicates} duplicates, "
+               f"{stats.resumed} already done")
+    click.echo(f"  {stats.elapsed_seconds:.1f}s, {stats.urls_per_minute:.1f} URLs/min")
+    generator = pipeline.generator
+    click.echo(f"  {generator.files_written} files written, {generator.files_unchanged} unchanged")
+    if stats.index_failures:
+        click.echo(f"  {stats.index_failures} Elasticsearch writes failed (see log)")
+
+
+@cli.command()
+@click.option('--workers', default=8, help='APIs refreshed concurrently')
+@click.option('--output-dir', default=None, help='Rewrite generated files for changed APIs here')
+@click.option('--skip-embeddings', is_flag=True, help='Do not re-embed tools whose description changed')
+@profile_options
+def refresh(workers, output_dir, skip_embeddings):
+    """Re-check every stored discovery; only changed specs are re-processed"""
+    from src.agents.search import CatalogSearch
+    from src.elasticsearch.client import ESClient
+    from src.refresh import RefreshPipeline
     
-    with open(tool_file, 'w') as f:
-        f.write(tool_data['tool_code'])
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    search_agent = None if skip_embeddings else CatalogSearch(es)
     
-    with open(readme_file, 'w') as f:
-        f.write(tool_data['readme'])
+    stats = RefreshPipeline(es, output_dir=output_dir, search_agent=search_agent, workers=workers).run()
     
-    click.echo(f"✓ {tool_data['tool_name']} ({tool_data['generation_time_seconds']:.1f}s)")
+    counts = stats.counts
+    click.echo(f"✓ {stats.processed} APIs: {counts['changed']} changed, {counts['not_modified']} not modified, "
+               f"{counts['unchanged']} unchanged, {counts['no_spec']} without spec, {counts['failed']} failed")
+    endpoints = stats.endpoints
+    click.echo(f"  endpoints: +{endpoints['added']} -{endpoints['removed']} ~{endpoints['changed']}; "
+               f"{stats.regenerated} tools regenerated, {stats.reembedded} re-embedded ({stats.elapsed_seconds:.1f}s)")
 
 
 @cli.command()
 @click.argument('query')
 @click.option('--top-k', default=5, help='Number of results')
-def search(query, top_k):
+@click.option('--retrieval', type=click.Choice(['vector', 'hybrid', 'rrf']), default=Config.search_retrieval,
+              help='kNN only, lexical + kNN in one request, or reciprocal-rank fusion')
+@click.option('--auth-type', default=None, help='Only tools with this auth type')
+@click.option('--category', 'categories', multiple=True, help='Only tools in these categories')
+@click.option('--endpoints', 'by_endpoint', is_flag=True,
+              help='Return the top-k endpoints, grouped by tool (needs `index-endpoints`)')
+@BACKEND_OPTION
+@INDEX_PATH_OPTION
+@profile_options
+def search(query, top_k, retrieval, auth_type, categories, by_endpoint, backend, index_path):
+    from src.agents.search import CatalogSearch
+    from src.elasticsearch.client import ESClient
+    
     click.echo(f"Searching for: {query}")
     
     config = Config()
     es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
     
-    search_agent = CatalogSearch(es)
-    results = search_agent.search(query, top_k)
+    search_agent = CatalogSearch(es, backend=_search_backend(backend, index_path))
+    filters = {}
+    if auth_type:
+        filters['auth_type'] = auth_type
+    if categories:
+        filters['categories'] = list(categories)
+    
+    if by_endpoint:
+        from src.agents.endpoint_search import EndpointSearch
+        
+        groups = EndpointSearch(es, search_agent).search(query, top_k, filters=filters or None)
+        click.echo(f"\nTop {sum(len(group['endpoints']) for group in groups)} endpoints "
+                   f"in {len(groups)} tools:\n")
+        for i, group in enumerate(groups, 1):
+            tool = group['tool']
+            click.echo(f"{i}. {tool['display_name']} ({tool['api_base_url']})")
+            for endpoint in group['endpoints']:
+                click.echo(f"   {endpoint['score']:.2f}  {endpoint['method']} {endpoint['path']}"
+                           f"  {endpoint.get('summary') or ''}")
+            click.echo()
+        return
+    
+    results = search_agent.search(query, top_k, filters=filters or None, retrieval=retrieval)
     
     click.echo(f"\nTop {len(results)} results:\n")
     
@@ -81,25 +246,320 @@ def search(query, top_k):
 
 
 @cli.command()
-def setup():
+@click.argument('request')
+@click.option('--execute', is_flag=True, help='Run the planned calls, independent ones concurrently')
+@click.option('--allow-mutations', is_flag=True, help='With --execute, also run planned POST/PUT/PATCH/DELETE calls')
+@click.option('--arg', 'args', multiple=True, help='Parameter value as name=value, passed to every step that takes it')
+@click.option('--top-k', default=3, help='Tools considered for the plan')
+@click.option('--deadline', type=float, default=None, help='Cancel steps still running after this many seconds')
+@click.option('--endpoints', 'by_endpoint', is_flag=True,
+              help='Pick tools and endpoints by endpoint search, loading only the matched endpoints')
+@profile_options
+def orchestrate(request, execute, allow_mutations, args, top_k, deadline, by_endpoint):
+    """Plan the tool calls for REQUEST as a dependency graph, and optionally run them"""
+    from src.agents.orchestrator import ToolOrchestrator
+    from src.agents.relationships import load_graph
+    from src.agents.search import CatalogSearch
+    from src.elasticsearch.client import ESClient
+    
+    values = {}
+    for arg in args:
+        name, sep, value = arg.partition('=')
+        if not sep:
+            raise click.BadParameter(f"Expected name=value: {arg}", param_hint='--arg')
+        values[name] = value
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    catalog = CatalogSearch(es)
+    endpoint_search = None
+    if by_endpoint:
+        from src.agents.endpoint_search import EndpointSearch
+        endpoint_search = EndpointSearch(es, catalog)
+    orchestrator = ToolOrchestrator(es, catalog, graph=load_graph(), endpoint_search=endpoint_search)
+    plan = orchestrator.orchestrate(request, execute=execute, args=values, top_k=top_k, deadline=deadline,
+                                    allow_mutations=allow_mutations)
+    
+    click.echo(f"Tools: {', '.join(plan['recommended_tools']) or 'none'}")
+    for step in plan['steps']:
+        after = f" (after {', '.join(step['depends_on'])})" if step['depends_on'] else ''
+        click.echo(f"  {step['id']}: {step['method']} {step['path']}{after}")
+    execution = plan.get('execution')
+    if execution:
+        for step_id in execution['order']:
+            result = execution['steps'][step_id]
+            detail = result.get('error') or f"HTTP {result.get('status_code')}"
+            click.echo(f"  {step_id}: {result['status']} {detail} {result.get('elapsed_ms') or 0:.0f}ms")
+        click.echo(f"Done in {execution['elapsed_ms']:.0f}ms (critical path {execution['critical_path_ms']:.0f}ms, "
+                   f"calls sum to {execution['sum_ms']:.0f}ms)")
+
+
+@cli.command()
+@click.option('--host', default='127.0.0.1', help='Bind address')
+@click.option('--port', default=8765, help='Bind port')
+@click.option('--max-batch', default=64, help='Max query texts per model call')
+@click.option('--max-wait-ms', default=5.0, help='How long to collect concurrent queries into one batch')
+@click.option('--es-connections', default=32, help='Pooled Elasticsearch connections')
+@click.option('--popularity-refresh', default=300.0,
+              help='Seconds between reloads of the in-memory usage table used for ranking (0: read hit fields)')
+@click.option('--rollup', is_flag=True, help='Also roll up usage logs on every popularity reload')
+@BACKEND_OPTION
+@INDEX_PATH_OPTION
+@profile_options
+def serve(host, port, max_batch, max_wait_ms, es_connections, popularity_refresh, rollup, backend, index_path):
+    """Serve search and orchestration over HTTP with a warm embedding model"""
+    from src.agents.endpoint_search import EndpointSearch
+    from src.agents.search import CatalogSearch
+    from src.agents.orchestrator import ToolOrchestrator
+    from src.agents.relationships import load_graph
+    from src.elasticsearch.client import ESClient
+    from src.agents.ranking import PopularityTable
+    from src.server import SearchService, make_server
+    from src.usage import PopularityRefresher, UsageLogger
+    from src import instrumentation
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key,
+                  connections_per_node=es_connections)
+    refresher = None
+    # A local snapshot already carries the usage fields it was exported with
+    if popularity_refresh > 0 and backend != 'local':
+        refresher = PopularityRefresher(es, PopularityTable(), popularity_refresh, rollup=rollup).start()
+    catalog = CatalogSearch(es, backend=_search_backend(backend, index_path),
+                            popularity=refresher.table if refresher else None)
+    # Endpoint vectors live in Elasticsearch only
+    endpoint_search = EndpointSearch(es, catalog) if backend != 'local' else None
+    service = SearchService(catalog, ToolOrchestrator(es, catalog, graph=load_graph()),
+                            max_batch=max_batch, max_wait_ms=max_wait_ms, usage_logger=UsageLogger(es),
+                            endpoint_search=endpoint_search)
+    
+    click.echo("Loading embedding model...")
+    service.warm_up()
+    
+    server = make_server(service, host, port)
+    click.echo(f"Serving on http://{host}:{port} "
+               f"(GET /search?q=...[&endpoints=1], POST /orchestrate, POST /usage, GET /metrics)")
+    if instrumentation.enabled():
+        click.echo("  spans: GET /metrics?format=prometheus")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if refresher is not None:
+            refresher.stop()
+
+
+@cli.command('rollup-usage')
+@click.option('--since', default=None,
+              help='Only count events at or after this time, e.g. now-30d, into the recent_* fields')
+@click.option('--interval', type=float, default=0, help='Repeat every this many seconds (0: run once)')
+@profile_options
+def rollup_usage(since, interval):
+    """Aggregate tool-usage-logs into usage_count, success_rate, avg_execution_time_ms and last_used"""
+    from src.elasticsearch.client import ESClient
+    from src.usage import UsageRollup
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    rollup = UsageRollup(es)
+    
+    while True:
+        stats = rollup.run(since=since)
+        click.echo(f"✓ {stats['events']} events across {stats['tools']} tools rolled up "
+                   f"({stats['failed_updates']} updates failed, {stats['elapsed_seconds']:.1f}s)")
+        if not interval:
+            return
+        time.sleep(interval)
+
+
+@cli.command('export-index')
+@INDEX_PATH_OPTION
+@click.option('--ivf-lists', type=int, default=None, help='Build an approximate IVF layer with this many lists')
+def export_index(index_path, ivf_lists):
+    """Snapshot agent-tools embeddings into a local vector index for offline search"""
+    from itertools import islice
+    from src.backends import LocalVectorIndex
+    from src.backends.local import META_FIELDS
+    from src.elasticsearch.client import ESClient
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    index = LocalVectorIndex(config.embedding_dims)
+    
+    hits = es.scan('agent-tools', query={"exists": {"field": "description_embedding"}},
+                   source=META_FIELDS + ['description_embedding'])
+    tools = (hit['_source'] for hit in hits)
+    while True:
+        batch = list(islice(tools, 5000))
+        if not batch:
+            break
+        index.add(batch)
+    
+    if ivf_lists or len(index) >= index.ivf_min_rows:
+        index.build_ivf(ivf_lists)
+    index.save(index_path)
+    click.echo(f"✓ Exported {len(index)} tools to {index_path}")
+
+
+@cli.command('reindex-embeddings')
+@click.option('--batch-size', type=int, default=None, help='Descriptions encoded per model call')
+@BULK_LOAD_OPTION
+@profile_options
+def reindex_embeddings(batch_size, bulk_load):
+    """Re-embed every catalog tool; text already in the embedding cache is not re-encoded"""
+    from src.agents.search import CatalogSearch
+    from src.elasticsearch.client import ESClient
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    search_agent = CatalogSearch(es)
+    
+    tools = (
+        hit['_source'] for hit in
+        es.scan('agent-tools', source=['tool_id', 'tool_name', 'description'])
+    )
+    with _bulk_load(es, bulk_load, ['agent-tools']):
+        es.start_bulk()
+        try:
+            count = search_agent.index_tools(tools, batch_size=batch_size)
+        finally:
+            writer = es.stop_bulk()
+    
+    cache = search_agent.cache
+    click.echo(f"✓ Re-indexed {count} tools ({cache.hits} cached, {cache.misses} encoded)")
+    if writer.failures:
+        click.echo(f"  {len(writer.failures)} Elasticsearch writes failed (see log)")
+
+
+@cli.command('index-endpoints')
+@click.option('--batch-size', type=int, default=None, help='Endpoint texts encoded per model call')
+@BULK_LOAD_OPTION
+@profile_options
+def index_endpoints(batch_size, bulk_load):
+    """Embed every catalog tool's endpoints for endpoint-level search; unchanged endpoints are skipped"""
+    from src.agents.endpoint_search import EndpointSearch
+    from src.agents.search import CatalogSearch
+    from src.elasticsearch.client import ESClient
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    search_agent = CatalogSearch(es)
+    
+    tools = (
+        hit['_source'] for hit in
+        es.scan('agent-tools', source=['tool_id', 'tool_name', 'source_api_discovery_id', 'auth_type', 'categories'])
+    )
+    start = time.perf_counter()
+    with _bulk_load(es, bulk_load, ['tool-endpoints']):
+        es.start_bulk()
+        try:
+            written, unchanged = EndpointSearch(es, search_agent).index_tools(tools, batch_size=batch_size)
+        finally:
+            writer = es.stop_bulk()
+    
+    click.echo(f"✓ Indexed {written} endpoints, {unchanged} unchanged, in {time.perf_counter() - start:.1f}s")
+    if writer.failures:
+        click.echo(f"  {len(writer.failures)} Elasticsearch writes failed (see log)")
+
+
+@cli.command('build-relationships')
+@click.option('--path', 'graph_path', default=Config.relationship_graph_path, help='Graph directory')
+@profile_options
+def build_relationships(graph_path):
+    """Precompute which APIs feed which from the stored endpoints"""
+    from src.agents.relationships import RelationshipGraph, graph_lock
+    from src.discovery_store import DiscoveryStore
+    from src.elasticsearch.client import ESClient
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    start = time.perf_counter()
+    graph = RelationshipGraph.build(DiscoveryStore(es).discoveries())
+    with graph_lock(graph_path):
+        graph.save(graph_path)
+    edges = len(graph.arrays['out_indices'])
+    click.echo(f"✓ {len(graph)} APIs, {edges} relationships in {time.perf_counter() - start:.1f}s -> {graph_path}")
+
+
+@cli.command('migrate-discoveries')
+@BULK_LOAD_OPTION
+@profile_options
+def migrate_discoveries(bulk_load):
+    """Split discoveries stored as one document into a header, endpoints and shared schemas"""
+    from src.discovery_store import DiscoveryStore
+    from src.elasticsearch.client import ESClient
+    from src.lookup_cache import get_lookup_cache
+    
+    config = Config()
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    start = time.perf_counter()
+    with _bulk_load(es, bulk_load, ['api-discoveries', 'api-endpoints', 'api-schemas']):
+        es.start_bulk()
+        try:
+            migrated = DiscoveryStore(es).migrate()
+        finally:
+            writer = es.stop_bulk()
+    # Cached lookups may still hold the old single documents
+    get_lookup_cache().clear()
+    click.echo(f"✓ Migrated {migrated} discoveries in {time.perf_counter() - start:.1f}s")
+    if writer.failures:
+        click.echo(f"  {len(writer.failures)} Elasticsearch writes failed (see log)")
+
+
+@cli.command('clear-cache')
+def clear_cache():
+    """Forget cached discovery/tool lookups and unreachable-host backoffs"""
+    from src.lookup_cache import get_lookup_cache
+    
+    get_lookup_cache().clear()
+    click.echo(f"✓ Cleared lookup cache{f' ({Config.lookup_cache_path})' if Config.lookup_cache_path else ''}")
+
+
+@cli.command()
+@click.option('--delete-old', is_flag=True, help='Delete the previous version of a migrated index (an index from before aliases is otherwise kept as <name>-pre-alias)')
+def setup(delete_old):
+    """Create the versioned indices behind their aliases, or migrate them to the current mappings"""
+    from src.agents.endpoint_search import EndpointSearch
+    from src.agents.search import CatalogSearch
+    from src.backends.es import ElasticsearchBackend
+    from src.elasticsearch.client import ESClient
+    from src.elasticsearch.indices import IndexManager
+    
     click.echo("Setting up Elasticsearch...")
     
     config = Config()
-    es = Elasticsearch(config.elasticsearch_url)
-    
-    for index_name, mapping in [
-        ('api-discoveries', API_DISCOVERIES_MAPPING),
-        ('agent-tools', AGENT_TOOLS_MAPPING),
-        ('tool-usage-logs', TOOL_USAGE_LOGS_MAPPING)
-    ]:
-        if es.indices.exists(index=index_name):
-            click.echo(f"✓ Index already exists: {index_name}")
-        else:
-            es.indices.create(index=index_name, body=mapping)
-            click.echo(f"✓ Created index: {index_name}")
+    es = ESClient(config.elasticsearch_url, config.elasticsearch_api_key)
+    
+    # Used only when the embedding model changed: fill the new index before its alias moves
+    def reembed_tools(index):
+        catalog = CatalogSearch(es, backend=ElasticsearchBackend(es, index=index))
+        tools = (hit['_source'] for hit in es.scan(index, source=['tool_id', 'tool_name', 'description']))
+        return _bulk_write(es, lambda: catalog.index_tools(tools))
+    
+    def reembed_endpoints(index):
+        tools = (hit['_source'] for hit in es.scan(
+            'agent-tools', source=['tool_id', 'tool_name', 'source_api_discovery_id', 'auth_type', 'categories']))
+        return _bulk_write(es, lambda: EndpointSearch(es, CatalogSearch(es), index=index).index_tools(tools)[0])
+    
+    manager = IndexManager(es)
+    for alias, index, outcome in manager.setup(
+        reembed={'agent-tools': reembed_tools, 'tool-endpoints': reembed_endpoints}, delete_old=delete_old
+    ):
+        click.echo(f"✓ {alias} -> {index} ({outcome})")
     
     click.echo("\nSetup complete!")
 
 
+def _bulk_write(es, fn):
+    es.start_bulk()
+    try:
+        return fn()
+    finally:
+        es.stop_bulk()
+
+
 if __name__ == '__main__':
     cli()
@@ -7,9 +7,95 @@ load_dotenv()
 class Config:
     elasticsearch_url = os.getenv('ELASTICSEARCH_URL', 'http://localhost:9200')
     elasticsearch_api_key = os.getenv('ELASTICSEARCH_API_KEY')
+    # Index settings applied by `setup` (src/elasticsearch/indices.py)
+    es_shards = int(os.getenv('ES_SHARDS', 1))
+    es_replicas = int(os.getenv('ES_REPLICAS', 1))
+    es_refresh_interval = os.getenv('ES_REFRESH_INTERVAL', '1s')
+    # Vector fields: int8_hnsw keeps a quarter of the float32 vectors in memory
+    es_vector_index_type = os.getenv('ES_VECTOR_INDEX_TYPE', 'int8_hnsw')
+    es_hnsw_m = int(os.getenv('ES_HNSW_M', 16))
+    es_hnsw_ef_construction = int(os.getenv('ES_HNSW_EF_CONSTRUCTION', 100))
+    # Segments left per shard by the force-merge that ends a bulk load
+    es_merge_segments = int(os.getenv('ES_MERGE_SEGMENTS', 1))
     
     embedding_model_name = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
     embedding_dims = 384
+    embedding_batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', 256))
+    embedding_cache_dir = os.path.expanduser(
+        os.getenv('EMBEDDING_CACHE_DIR', '~/.cache/agent-nexus/embeddings')
+    )
+    embedding_cache_size = int(os.getenv('EMBEDDING_CACHE_SIZE', 10000))
+    # Encoder (src/embeddings/model.py): torch or onnx, int8 weights (onnx only), 0 threads = runtime default
+    embedding_backend = os.getenv('EMBEDDING_BACKEND', 'torch')
+    embedding_quantize = os.getenv('EMBEDDING_QUANTIZE', 'none')
+    embedding_threads = int(os.getenv('EMBEDDING_THREADS', 0))
+    embedding_onnx_dir = os.path.expanduser(
+        os.getenv('EMBEDDING_ONNX_DIR', '~/.cache/agent-nexus/onnx')
+    )
+    
+    search_backend = os.getenv('SEARCH_BACKEND', 'elasticsearch')
+    search_retrieval = os.getenv('SEARCH_RETRIEVAL', 'vector')
+    search_num_candidates = int(os.getenv('SEARCH_NUM_CANDIDATES', 50))
+    # Endpoints retrieved when search or orchestration works per endpoint (src/agents/endpoint_search.py)
+    endpoint_search_top_k = int(os.getenv('ENDPOINT_SEARCH_TOP_K', 20))
+    local_index_path = os.path.expanduser(
+        os.getenv('LOCAL_INDEX_PATH', '~/.cache/agent-nexus/index')
+    )
+    
+    template_cache_dir = os.path.expanduser(
+        os.getenv('TEMPLATE_CACHE_DIR', '~/.cache/agent-nexus/templates')
+    )
+    
+    # Tools with at least this many endpoints render on a process pool (0 disables it)
+    render_pool_min_endpoints = int(os.getenv('RENDER_POOL_MIN_ENDPOINTS', 2000))
+    render_workers = int(os.getenv('RENDER_WORKERS', 0))
     
     request_timeout = 30
-    max_endpoints_per_tool = 50
+    # Shared HTTP transport (src/transport.py)
+    http_retries = int(os.getenv('HTTP_RETRIES', 2))
+    http_backoff = float(os.getenv('HTTP_BACKOFF', 0.25))
+    # Longest wait a Retry-After answer can impose before a retry
+    http_retry_after_max = float(os.getenv('HTTP_RETRY_AFTER_MAX', 5))
+    http_max_per_host = int(os.getenv('HTTP_MAX_PER_HOST', 8))
+    # Requests per second per host; 0 disables rate limiting
+    http_rate_per_host = float(os.getenv('HTTP_RATE_PER_HOST', 0))
+    # 0 keeps every endpoint in the spec
+    max_endpoints_per_tool = int(os.getenv('MAX_ENDPOINTS_PER_TOOL', 50))
+    
+    # Read-through cache of discovery/tool lookups (src/lookup_cache.py); TTL 0 disables it
+    lookup_cache_ttl = float(os.getenv('LOOKUP_CACHE_TTL', 3600))
+    lookup_cache_negative_ttl = float(os.getenv('LOOKUP_CACHE_NEGATIVE_TTL', 60))
+    lookup_cache_size = int(os.getenv('LOOKUP_CACHE_SIZE', 10000))
+    # SQLite file that keeps the cache across runs; empty keeps it in memory only
+    lookup_cache_path = os.path.expanduser(
+        os.getenv('LOOKUP_CACHE_PATH', '~/.cache/agent-nexus/lookups.sqlite')
+    )
+    # Unreachable hosts are skipped for HOST_BACKOFF seconds, doubling per failure
+    host_backoff = float(os.getenv('HOST_BACKOFF', 300))
+    host_backoff_max = float(os.getenv('HOST_BACKOFF_MAX', 86400))
+    
+    # Workflow execution (src/agents/workflow.py)
+    orchestrator_step_timeout = float(os.getenv('ORCHESTRATOR_STEP_TIMEOUT', 10))
+    orchestrator_deadline = float(os.getenv('ORCHESTRATOR_DEADLINE', 30))
+    orchestrator_max_concurrency = int(os.getenv('ORCHESTRATOR_MAX_CONCURRENCY', 16))
+    # Successful GET responses are reused for this many seconds; 0 disables it
+    orchestrator_get_cache_ttl = float(os.getenv('ORCHESTRATOR_GET_CACHE_TTL', 60))
+    
+    # API relationship graph (src/agents/relationships.py), built by `build-relationships`
+    relationship_graph_path = os.path.expanduser(
+        os.getenv('RELATIONSHIP_GRAPH_PATH', '~/.cache/agent-nexus/relationships')
+    )
+    # Fields shared by more APIs than this are too common to relate them
+    relationship_max_fanout = int(os.getenv('RELATIONSHIP_MAX_FANOUT', 200))
+    
+    spec_probe_timeout = float(os.getenv('SPEC_PROBE_TIMEOUT', 2))
+    spec_probe_deadline = float(os.getenv('SPEC_PROBE_DEADLINE', 5))
+    spec_probe_concurrent = os.getenv('SPEC_PROBE_CONCURRENT', '1') != '0'
+    # Spec bodies above this many bytes are spooled to disk and parsed incrementally
+    spec_stream_threshold = int(os.getenv('SPEC_STREAM_THRESHOLD', 8 * 1024 * 1024))
+    # Link crawl for APIs without a spec (src/agents/crawler.py)
+    crawl_max_requests = int(os.getenv('CRAWL_MAX_REQUESTS', 200))
+    crawl_time_limit = float(os.getenv('CRAWL_TIME_LIMIT', 10))
+    crawl_concurrency = int(os.getenv('CRAWL_CONCURRENCY', 8))
+    crawl_max_per_host = int(os.getenv('CRAWL_MAX_PER_HOST', 4))
+    crawl_max_depth = int(os.getenv('CRAWL_MAX_DEPTH', 5))
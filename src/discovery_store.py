@@ -0,0 +1,323 @@
+"""Discovery storage split into a slim header, endpoint documents and shared schemas.
+
+A discovery used to be one document holding every endpoint with its fully
+resolved parameters, request body and responses. Each read fetched all of
+it, even a refresh that only compares fingerprints. Specs repeat the same
+fragments across endpoints, such as common error responses and paging
+parameters, and every copy was stored again. Now it is kept in three
+indices:
+
+- ``api-discoveries``: the header, i.e. the discovery without ``endpoints``.
+  It is marked ``storage: 'split'``. ``schema_ids`` lists the hashes of the
+  API's distinct schema fragments.
+- ``api-endpoints``: one document per endpoint, keyed by API and position.
+  Its ``schema_refs`` point into ``schema_ids`` by position, since small
+  integers compress far better than repeated hashes.
+- ``api-schemas``: each distinct schema fragment once, keyed by the hash of
+  its content, so APIs share the fragments they have in common.
+
+Readers ask for what they need. ``header`` is the header alone,
+``fingerprints`` is enough to diff endpoints, and ``endpoints`` resolves only
+the schema fields the caller names. Discoveries still stored the old way
+are read as before until ``migrate`` rewrites them.
+"""
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+import hashlib
+import json
+import logging
+import threading
+
+from src.elasticsearch.client import BulkIndexer
+from src.urls import discovery_doc_id
+
+logger = logging.getLogger(__name__)
+
+DISCOVERIES_INDEX = 'api-discoveries'
+ENDPOINTS_INDEX = 'api-endpoints'
+SCHEMAS_INDEX = 'api-schemas'
+
+SCHEMA_FIELDS = ('parameters', 'request_body', 'responses')
+FINGERPRINT_FIELDS = ['method', 'path', 'fingerprint']
+# What endpoint reads need from the header
+LAYOUT_FIELDS = ['storage', 'total_endpoints', 'schema_ids']
+SPLIT = 'split'
+
+# Largest page a single search may return (index.max_result_window)
+MAX_PAGE = 10000
+MGET_BATCH = 1000
+
+
+def endpoint_doc_id(api_url: str, position: int) -> str:
+    return f"{discovery_doc_id(api_url)}#{position}"
+
+
+def fragment_hash(fragment) -> str:
+    text = json.dumps(fragment, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class DiscoveryStore:
+    """Reads and writes discoveries in the split layout described above.
+
+    Schema fragments are kept in an in-process LRU of ``cache_size``
+    entries. It saves the fetch of fragments shared across endpoints and
+    APIs, and lets writes skip fragments already stored. A written fragment
+    joins it only once the bulk writer reports its write acknowledged.
+    """
+
+    def __init__(self, es_client, cache_size: int = 50000):
+        self.es = es_client
+        self.cache_size = cache_size
+        self._fragments: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def write(self, discovery: Dict, previous_total: Optional[int] = None) -> Dict:
+        """Store ``discovery`` and return its header.
+
+        Endpoint documents past the new endpoint count are deleted. That
+        count is read from the stored header unless ``previous_total`` is
+        given.
+        """
+        api_url = discovery['api_url']
+        endpoints = discovery.get('endpoints') or []
+        header = {key: value for key, value in discovery.items() if key != 'endpoints'}
+        header['total_endpoints'] = len(endpoints)
+        header['storage'] = SPLIT
+        if previous_total is None:
+            previous_total = self._stored_total(api_url)
+
+        shared = self.es.bulk_writer
+        # Without a bulk session of the caller's, a private writer: a shared one started
+        # here could be stopped by another thread while this one still writes to it
+        writer = shared or BulkIndexer(self.es.client)
+        written: Dict[str, object] = {}
+        try:
+            table: Dict[str, int] = {}
+            for position, endpoint in enumerate(endpoints):
+                writer.index(ENDPOINTS_INDEX, endpoint_doc_id(api_url, position),
+                             self._endpoint_doc(api_url, position, endpoint, table, writer, written))
+            header['schema_ids'] = list(table)
+            for position in range(len(endpoints), previous_total):
+                writer.delete(ENDPOINTS_INDEX, endpoint_doc_id(api_url, position))
+            # Header last: readers size their endpoint query by its total
+            writer.index(DISCOVERIES_INDEX, discovery_doc_id(api_url), header)
+        finally:
+            # Until then the fragments are written again by whoever meets them
+            writer.after_flush(lambda: self._acknowledge(writer, written))
+            if shared is None:
+                writer.close()
+        return {key: value for key, value in header.items() if key != 'schema_ids'}
+
+    def header(self, api_url: str, fields: Optional[List[str]] = None) -> Dict:
+        """The discovery without its endpoints or schema table; raises if none is stored."""
+        if fields is not None:
+            return self.es.get(DISCOVERIES_INDEX, discovery_doc_id(api_url), source=fields)
+        return self.es.get(DISCOVERIES_INDEX, discovery_doc_id(api_url), exclude=['endpoints', 'schema_ids'])
+
+    def endpoints(self, api_url: str, schemas: Sequence[str] = SCHEMA_FIELDS,
+                  header: Optional[Dict] = None) -> List[Dict]:
+        """Endpoints in spec order, with only the ``schemas`` fields resolved.
+
+        ``header`` saves a lookup when the caller holds one with the
+        ``LAYOUT_FIELDS``, or a discovery stored as one document.
+        """
+        if header is None or 'endpoints' not in header and not all(field in header for field in LAYOUT_FIELDS):
+            header = self.header(api_url, LAYOUT_FIELDS)
+        if header.get('storage') != SPLIT:
+            return self._legacy_endpoints(api_url, header)
+        docs = self._endpoint_docs(api_url, header['total_endpoints'] or 0, source=None)
+        return self._resolve(docs, schemas, {api_url: header['schema_ids']})
+
+    def endpoints_at(self, api_url: str, positions: Sequence[int], schemas: Sequence[str] = SCHEMA_FIELDS,
+                     header: Optional[Dict] = None) -> List[Dict]:
+        """The endpoints at ``positions``, in that order, fetched by id; missing ones are left out."""
+        if header is None or 'endpoints' not in header and not all(field in header for field in LAYOUT_FIELDS):
+            header = self.header(api_url, LAYOUT_FIELDS)
+        if header.get('storage') != SPLIT:
+            endpoints = self._legacy_endpoints(api_url, header)
+            return [endpoints[position] for position in positions if position < len(endpoints)]
+        docs = []
+        for start in range(0, len(positions), MGET_BATCH):
+            batch = positions[start:start + MGET_BATCH]
+            docs.extend(doc for doc in self.es.mget(ENDPOINTS_INDEX, [endpoint_doc_id(api_url, p) for p in batch])
+                        if doc is not None and doc['position'] < (header['total_endpoints'] or 0))
+        return self._resolve(docs, schemas, {api_url: header['schema_ids']})
+
+    def fingerprints(self, api_url: str) -> List[Dict]:
+        """``method``, ``path`` and ``fingerprint`` of each stored endpoint: what an endpoint diff needs."""
+        header = self.header(api_url, ['storage', 'total_endpoints'])
+        if header.get('storage') != SPLIT:
+            return self._legacy_endpoints(api_url, header)
+        return self._endpoint_docs(api_url, header.get('total_endpoints') or 0, source=FINGERPRINT_FIELDS)
+
+    def load(self, api_url: str) -> Dict:
+        """The whole discovery, as it was written."""
+        discovery = self.header(api_url)
+        discovery['endpoints'] = self.endpoints(api_url)
+        discovery.pop('storage', None)
+        return discovery
+
+    def discoveries(self, schemas: Sequence[str] = SCHEMA_FIELDS) -> Iterator[Dict]:
+        """``{'api_url', 'endpoints'}`` of every stored discovery, for catalog-wide passes."""
+        split = {}
+        for hit in self.es.scan(DISCOVERIES_INDEX, source=['api_url', 'endpoints'] + LAYOUT_FIELDS):
+            source = hit['_source']
+            if source.get('storage') == SPLIT:
+                split[source['api_url']] = source
+            else:
+                yield {'api_url': source['api_url'], 'endpoints': source.get('endpoints') or []}
+        if not split:
+            return
+
+        # Scrolled in no particular order: grouped by API, then put back in spec order
+        grouped: Dict[str, List] = defaultdict(list)
+        batch: List[Dict] = []
+        for hit in self.es.scan(ENDPOINTS_INDEX, size=MGET_BATCH):
+            doc = hit['_source']
+            header = split.get(doc.get('api_url'))
+            if header is not None and doc['position'] < header['total_endpoints']:
+                batch.append(doc)
+            if len(batch) >= MGET_BATCH:
+                self._group(batch, schemas, grouped, split)
+                batch = []
+        self._group(batch, schemas, grouped, split)
+        for api_url, endpoints in grouped.items():
+            endpoints.sort(key=lambda item: item[0])
+            yield {'api_url': api_url, 'endpoints': [endpoint for _, endpoint in endpoints]}
+
+    def _group(self, docs: List[Dict], schemas: Sequence[str], grouped: Dict[str, List],
+               headers: Dict[str, Dict]) -> None:
+        tables = {doc['api_url']: headers[doc['api_url']]['schema_ids'] for doc in docs}
+        for endpoint, doc in zip(self._resolve(docs, schemas, tables), docs):
+            grouped[doc['api_url']].append((doc['position'], endpoint))
+
+    def migrate(self, discoveries: Optional[Iterable[Dict]] = None) -> int:
+        """Rewrite discoveries stored as one document into the split layout; returns how many."""
+        if discoveries is None:
+            query = {'bool': {'must_not': {'term': {'storage': SPLIT}}}}
+            discoveries = (hit['_source'] for hit in self.es.scan(DISCOVERIES_INDEX, query=query, size=100))
+        migrated = 0
+        owns_bulk = self.es.bulk_writer is None
+        self.es.start_bulk()
+        try:
+            for discovery in discoveries:
+                self.write(discovery, previous_total=0)
+                migrated += 1
+        finally:
+            if owns_bulk:
+                self.es.stop_bulk()
+        return migrated
+
+    def _stored_total(self, api_url: str) -> int:
+        try:
+            header = self.header(api_url, ['storage', 'total_endpoints'])
+        except Exception:
+            return 0
+        return header.get('total_endpoints') or 0 if header.get('storage') == SPLIT else 0
+
+    def _legacy_endpoints(self, api_url: str, header: Dict) -> List[Dict]:
+        if 'endpoints' in header:
+            return header['endpoints'] or []
+        return self.es.get(DISCOVERIES_INDEX, discovery_doc_id(api_url), source=['endpoints']).get('endpoints') or []
+
+    def _endpoint_docs(self, api_url: str, total: int, source: Optional[List[str]]) -> List[Dict]:
+        if not total:
+            return []
+        # Positions past the header's count are leftovers of a rewrite still being deleted
+        query = {'bool': {'filter': [{'term': {'api_url': api_url}}, {'range': {'position': {'lt': total}}}]}}
+        if source is not None:
+            source = source + ['position']
+        if total <= MAX_PAGE:
+            body = {'query': query, 'size': total, 'sort': [{'position': 'asc'}]}
+            if source is not None:
+                body['_source'] = source
+            hits = self.es.search(ENDPOINTS_INDEX, body)['hits']['hits']
+        else:
+            hits = self.es.scan(ENDPOINTS_INDEX, query=query, source=source, size=MAX_PAGE)
+        docs = sorted((hit['_source'] for hit in hits), key=lambda doc: doc['position'])
+        if source is not None:
+            for doc in docs:
+                del doc['position']
+        return docs
+
+    def _endpoint_doc(self, api_url: str, position: int, endpoint: Dict, table: Dict[str, int],
+                      writer: BulkIndexer, written: Dict[str, object]) -> Dict:
+        doc = {key: value for key, value in endpoint.items() if key not in SCHEMA_FIELDS}
+        doc['api_url'] = api_url
+        doc['position'] = position
+        # A field that is present but null (no request body) keeps a null ref
+        doc['schema_refs'] = {field: None if endpoint[field] is None else self._store_fragment(endpoint[field], table, writer, written)
+                              for field in SCHEMA_FIELDS if field in endpoint}
+        return doc
+
+    def _store_fragment(self, fragment, table: Dict[str, int], writer: BulkIndexer,
+                        written: Dict[str, object]) -> int:
+        key = fragment_hash(fragment)
+        if key not in table:
+            table[key] = len(table)
+            with self._lock:
+                known = key in self._fragments
+                if known:
+                    self._fragments.move_to_end(key)
+            if not known:
+                writer.index(SCHEMAS_INDEX, key, {'schema': fragment})
+                written[key] = fragment
+        return table[key]
+
+    def _acknowledge(self, writer: BulkIndexer, written: Dict[str, object]) -> None:
+        # By the ids this call wrote: a shared writer also holds other threads' failures
+        failed = {failure['id'] for failure in writer.failures
+                  if failure['index'] == SCHEMAS_INDEX and failure['id'] in written}
+        with self._lock:
+            for key, fragment in written.items():
+                if key not in failed:
+                    self._remember(key, fragment)
+
+    def _resolve(self, docs: List[Dict], schemas: Sequence[str], tables: Dict[str, List[str]]) -> List[Dict]:
+        # ``tables``: the schema_ids of each API the docs belong to
+        wanted = set()
+        for doc in docs:
+            ids = tables[doc['api_url']]
+            wanted.update(ids[ref] for field, ref in (doc.get('schema_refs') or {}).items()
+                          if ref is not None and field in schemas)
+        fragments = self._fragments_for(wanted)
+
+        endpoints = []
+        for doc in docs:
+            ids = tables[doc['api_url']]
+            refs = doc.get('schema_refs') or {}
+            endpoint = {key: value for key, value in doc.items()
+                        if key not in ('api_url', 'position', 'schema_refs')}
+            for field in schemas:
+                if field in refs:
+                    endpoint[field] = None if refs[field] is None else fragments.get(ids[refs[field]])
+            endpoints.append(endpoint)
+        return endpoints
+
+    def _fragments_for(self, keys) -> Dict:
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._fragments:
+                    self._fragments.move_to_end(key)
+                    found[key] = self._fragments[key]
+                else:
+                    missing.append(key)
+        for start in range(0, len(missing), MGET_BATCH):
+            batch = missing[start:start + MGET_BATCH]
+            for key, doc in zip(batch, self.es.mget(SCHEMAS_INDEX, batch)):
+                if doc is None:
+                    logger.warning(f"Schema fragment {key} is missing from {SCHEMAS_INDEX}")
+                    continue
+                found[key] = doc['schema']
+                with self._lock:
+                    self._remember(key, doc['schema'])
+        return found
+
+    def _remember(self, key: str, fragment) -> None:
+        self._fragments[key] = fragment
+        self._fragments.move_to_end(key)
+        while len(self._fragments) > self.cache_size:
+            self._fragments.popitem(last=False)
@@ -1,29 +1,353 @@
-from elasticsearch import Elasticsearch
-from typing import Dict, Any
+from elasticsearch import Elasticsearch, ApiError, TransportError
+from elasticsearch.helpers import scan
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Any, Iterator, List, Optional
+import atexit
+import json
 import logging
+import random
+import threading
+import time
+
+from src.instrumentation import span, timed
 
 logger = logging.getLogger(__name__)
 
+_bulk_tag: ContextVar[Optional[str]] = ContextVar('bulk_tag', default=None)
+
+
+@contextmanager
+def bulk_tag(tag: str):
+    """Label bulk actions added in this context (thread or task); their failures carry it as ``tag``."""
+    token = _bulk_tag.set(tag)
+    try:
+        yield
+    finally:
+        _bulk_tag.reset(token)
+
+
+class BulkIndexer:
+    """Buffers index/update/delete actions and sends them with the ``_bulk`` API.
+
+    The buffer is flushed when it holds ``max_docs`` actions, when it grows
+    past ``max_bytes``, or when the oldest buffered action is
+    ``flush_interval`` seconds old. Requests or items rejected with 429
+    are retried with jittered exponential backoff. Items that still fail
+    are kept in ``failures`` and passed to ``on_failure``. They are never
+    dropped silently. ``after_flush`` tells a caller when the actions it
+    added have been sent, so it can check ``failures`` for them.
+    """
+
+    RETRY_STATUSES = (429, 502, 503, 504)
+
+    def __init__(self, client: Elasticsearch, max_docs: int = 500, max_bytes: int = 5 * 1024 * 1024,
+                 flush_interval: float = 1.0, max_retries: int = 5, backoff: float = 0.2,
+                 on_failure: Optional[Callable[[Dict], None]] = None):
+        self.client = client
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_failure = on_failure
+
+        self.failures: List[Dict] = []
+        self.docs_sent = 0
+        self.requests_sent = 0
+
+        self._buffer: List[tuple] = []
+        self._callbacks: List[Callable[[], None]] = []
+        self._buffer_bytes = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, name='bulk-flush', daemon=True)
+        self._timer.start()
+        atexit.register(self.close)
+
+    def index(self, index: str, id: str, document: Dict[str, Any]) -> None:
+        self._add({'index': {'_index': index, '_id': id}}, document)
+
+    def update(self, index: str, id: str, doc: Dict[str, Any], upsert: bool = False) -> None:
+        body = {'doc': doc, 'doc_as_upsert': True} if upsert else {'doc': doc}
+        self._add({'update': {'_index': index, '_id': id}}, body)
+
+    def delete(self, index: str, id: str) -> None:
+        self._add({'delete': {'_index': index, '_id': id}}, None)
+
+    def _add(self, action: Dict, source: Optional[Dict]) -> None:
+        if self._closed.is_set():
+            raise RuntimeError("BulkIndexer is closed")
+        size = len(json.dumps(source, default=str)) + 64 if source is not None else 64
+        with self._lock:
+            self._buffer.append((action, source, _bulk_tag.get()))
+            self._buffer_bytes += size
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._buffer) >= self.max_docs or self._buffer_bytes >= self.max_bytes
+        if full:
+            self.flush()
+
+    def after_flush(self, callback: Callable[[], None]) -> None:
+        """Call ``callback()`` once every action added so far has been sent or has failed for good.
+
+        It runs in whichever thread flushes, within ``flush_interval`` at the latest.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+        if self._closed.is_set():
+            self.flush()
+
+    def flush(self) -> None:
+        callbacks = []
+        try:
+            with self._flush_lock:
+                with self._lock:
+                    batch, self._buffer = self._buffer, []
+                    # Earlier actions are in this batch or in one a previous flush already sent
+                    callbacks, self._callbacks = self._callbacks, []
+                    self._buffer_bytes = 0
+                    self._oldest = None
+                if batch:
+                    self._send(batch)
+        finally:
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Bulk flush callback failed: {e}")
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._timer.join(timeout=self.flush_interval + 1)
+        self.flush()
+        atexit.unregister(self.close)
+        if self.failures:
+            logger.warning(f"Bulk indexing finished with {len(self.failures)} failed items")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Background bulk flush failed: {e}")
+
+    def _send(self, batch: List[tuple]) -> None:
+        attempt = 0
+        while batch:
+            operations = []
+            for action, source, _ in batch:
+                operations.append(action)
+                if source is not None:
+                    operations.append(source)
+
+            try:
+                self.requests_sent += 1
+                with span('es.bulk'):
+                    response = self.client.bulk(operations=operations)
+            except (ApiError, TransportError) as e:
+                status = getattr(e, 'status_code', None) or getattr(getattr(e, 'meta', None), 'status', None)
+                retryable = status in self.RETRY_STATUSES or not isinstance(e, ApiError)
+                if retryable and attempt < self.max_retries:
+                    attempt += 1
+                    self._sleep(attempt)
+                    continue
+                for action, _, tag in batch:
+                    self._record_failure(action, status, str(e), tag)
+                return
+            except Exception as e:
+                for action, _, tag in batch:
+                    self._record_failure(action, None, str(e), tag)
+                raise
+
+            retry = []
+            for (action, source, tag), item in zip(batch, response['items']):
+                result = next(iter(item.values()))
+                status = result.get('status', 500)
+                # Deleting a document that is already gone leaves the index as intended
+                if status < 300 or (status == 404 and 'delete' in action):
+                    self.docs_sent += 1
+                elif status in self.RETRY_STATUSES and attempt < self.max_retries:
+                    retry.append((action, source, tag))
+                else:
+                    self._record_failure(action, status, result.get('error'), tag)
+
+            batch = retry
+            if batch:
+                attempt += 1
+                self._sleep(attempt)
+
+    def _sleep(self, attempt: int) -> None:
+        delay = self.backoff * (2 ** (attempt - 1))
+        time.sleep(delay / 2 + random.uniform(0, delay / 2))
+
+    def _record_failure(self, action: Dict, status: Optional[int], error: Any, tag: Optional[str] = None) -> None:
+        op, meta = next(iter(action.items()))
+        failure = {'op': op, 'index': meta['_index'], 'id': meta['_id'], 'status': status, 'error': error,
+                   'tag': tag}
+        self.failures.append(failure)
+        logger.warning(f"Bulk {op} failed for {meta['_index']}/{meta['_id']}: {status} {error}")
+        if self.on_failure:
+            self.on_failure(failure)
+
 
 class ESClient:
-    def __init__(self, url: str, api_key: str = None):
+    def __init__(self, url: str, api_key: str = None, **client_options):
         self.url = url
         if api_key:
-            self.client = Elasticsearch(url, api_key=api_key)
+            self.client = Elasticsearch(url, api_key=api_key, **client_options)
         else:
-            self.client = Elasticsearch(url)
+            self.client = Elasticsearch(url, **client_options)
+        self.bulk_writer = None
     
+    @timed('es.index')
     def index(self, index: str, id: str, document: Dict[str, Any], timeout: str = '10s'):
         return self.client.index(index=index, id=id, document=document, timeout=timeout)
     
+    @timed('es.search')
     def search(self, index: str, body: Dict[str, Any]):
         return self.client.search(index=index, body=body)
     
+    @timed('es.get')
+    def get(self, index: str, id: str, source: Optional[List[str]] = None,
+            exclude: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self.client.get(index=index, id=id, source_includes=source, source_excludes=exclude)['_source']
+    
+    @timed('es.mget')
+    def mget(self, index: str, ids: List[str], source: Optional[List[str]] = None) -> List[Optional[Dict[str, Any]]]:
+        """Sources of ``ids`` in order, ``None`` for each document that does not exist."""
+        docs = self.client.mget(index=index, ids=ids, source_includes=source)['docs']
+        return [doc['_source'] if doc.get('found') else None for doc in docs]
+    
+    @timed('es.update')
     def update(self, index: str, id: str, body: Dict[str, Any]):
         return self.client.update(index=index, id=id, body=body)
     
+    @timed('es.msearch')
+    def msearch(self, index: str, searches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        operations = []
+        for body in searches:
+            operations.append({"index": index})
+            operations.append(body)
+        return self.client.msearch(searches=operations)['responses']
+    
+    @timed('es.bulk')
+    def bulk(self, operations: List[Dict[str, Any]]):
+        return self.client.bulk(operations=operations)
+    
+    def scan(self, index: str, query: Optional[Dict[str, Any]] = None, source=None,
+             size: int = 500) -> Iterator[Dict[str, Any]]:
+        body = {"query": query or {"match_all": {}}}
+        if source is not None:
+            body["_source"] = source
+        return scan(self.client, index=index, query=body, size=size)
+    
     def indices_exists(self, index: str) -> bool:
         return self.client.indices.exists(index=index)
     
     def indices_create(self, index: str, body: Dict[str, Any]):
         return self.client.indices.create(index=index, body=body)
+
+    def indices_delete(self, index: str):
+        return self.client.indices.delete(index=index)
+
+    def clone(self, index: str, target: str):
+        """Copy ``index`` by hard-linking its segments; it has to be write-blocked."""
+        return self.client.indices.clone(index=index, target=target, wait_for_active_shards=1)
+
+    def alias_exists(self, name: str) -> bool:
+        return bool(self.client.indices.exists_alias(name=name))
+
+    def alias_indices(self, name: str) -> List[str]:
+        """Indices behind alias ``name``; empty if there is no such alias."""
+        if not self.alias_exists(name):
+            return []
+        return sorted(self.client.indices.get_alias(name=name))
+
+    def update_aliases(self, actions: List[Dict[str, Any]]):
+        """Apply alias ``actions`` atomically: readers see all of them or none."""
+        return self.client.indices.update_aliases(actions=actions)
+
+    def get_mapping_meta(self, index: str) -> Dict[str, Any]:
+        mappings = self.client.indices.get_mapping(index=index)[index]['mappings']
+        return mappings.get('_meta') or {}
+
+    def get_settings(self, index: str) -> Dict[str, Any]:
+        """Index-level settings of ``index``, as ``{'number_of_replicas': '1', ...}``."""
+        return self.client.indices.get_settings(index=index)[index]['settings']['index']
+
+    def put_settings(self, index: str, settings: Dict[str, Any]):
+        return self.client.indices.put_settings(index=index, settings={'index': settings})
+
+    @timed('es.refresh')
+    def refresh(self, index: str):
+        return self.client.indices.refresh(index=index)
+
+    @timed('es.forcemerge')
+    def forcemerge(self, index: str, max_num_segments: int = 1):
+        # Merging a large index takes minutes; the call waits for it
+        return self.client.options(request_timeout=3600).indices.forcemerge(
+            index=index, max_num_segments=max_num_segments
+        )
+
+    @timed('es.reindex')
+    def reindex(self, source: str, dest: str, exclude: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Copy every document of ``source`` into ``dest``, sliced across shards.
+
+        ``exclude`` drops source fields on the way. Documents already in
+        ``dest`` are overwritten.
+        """
+        source_spec: Dict[str, Any] = {'index': source}
+        if exclude:
+            source_spec['_source'] = {'excludes': exclude}
+        return self.client.options(request_timeout=3600).reindex(
+            source=source_spec, dest={'index': dest}, slices='auto', wait_for_completion=True, refresh=True
+        )
+
+    def count(self, index: str) -> int:
+        return self.client.count(index=index)['count']
+
+    def start_bulk(self, **kwargs) -> BulkIndexer:
+        """Route ``write``/``write_update`` through a buffered bulk writer until ``stop_bulk``."""
+        if self.bulk_writer is None:
+            self.bulk_writer = BulkIndexer(self.client, **kwargs)
+        return self.bulk_writer
+    
+    def stop_bulk(self) -> Optional[BulkIndexer]:
+        writer, self.bulk_writer = self.bulk_writer, None
+        if writer is not None:
+            writer.close()
+        return writer
+    
+    def write(self, index: str, id: str, document: Dict[str, Any]) -> None:
+        if self.bulk_writer is not None:
+            self.bulk_writer.index(index, id, document)
+        else:
+            self.index(index=index, id=id, document=document)
+    
+    def write_update(self, index: str, id: str, doc: Dict[str, Any]) -> None:
+        if self.bulk_writer is not None:
+            self.bulk_writer.update(index, id, doc)
+        else:
+            self.update(index=index, id=id, body={'doc': doc})
+    
+    def write_delete(self, index: str, id: str) -> None:
+        if self.bulk_writer is not None:
+            self.bulk_writer.delete(index, id)
+        else:
+            self.client.delete(index=index, id=id)
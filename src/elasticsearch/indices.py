@@ -0,0 +1,222 @@
+"""Versioned indices behind aliases, and bulk-load mode for mass ingestion.
+
+Everything reads and writes through aliases named like the indices
+(``agent-tools``, ...). ``setup`` puts a concrete index behind each
+alias, named ``<alias>-<version>``, where the version is a hash of the
+index body: its mappings and static settings, plus the embedding model
+for indices that hold vectors. When one of them changes, the next
+``setup`` builds the new version next to the old one. It copies the
+documents over while the old one still takes writes, and re-embeds them
+if the model changed. Then it blocks writes to the old version, copies
+again so nothing written meanwhile is lost, and moves the alias in a
+single atomic request. Readers never see a missing or half-filled
+index. Writers fail only during that final pass.
+
+Bulk-load mode turns off refresh and replicas while a large batch is
+written. Afterwards it refreshes, force-merges and restores both settings.
+"""
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import copy
+import hashlib
+import json
+import logging
+
+from src.config import Config
+from src.elasticsearch.schemas import (
+    API_DISCOVERIES_MAPPING,
+    API_ENDPOINTS_MAPPING,
+    API_SCHEMAS_MAPPING,
+    AGENT_TOOLS_MAPPING,
+    TOOL_ENDPOINTS_MAPPING,
+    TOOL_USAGE_LOGS_MAPPING
+)
+
+logger = logging.getLogger(__name__)
+
+# In setup order: re-embedding tool-endpoints reads agent-tools
+INDICES: List[Tuple[str, Dict]] = [
+    ('api-discoveries', API_DISCOVERIES_MAPPING),
+    ('api-endpoints', API_ENDPOINTS_MAPPING),
+    ('api-schemas', API_SCHEMAS_MAPPING),
+    ('agent-tools', AGENT_TOOLS_MAPPING),
+    ('tool-endpoints', TOOL_ENDPOINTS_MAPPING),
+    ('tool-usage-logs', TOOL_USAGE_LOGS_MAPPING)
+]
+# Settings that can change on a live index, so they never call for a new version
+DYNAMIC_SETTINGS = ('number_of_replicas', 'refresh_interval')
+
+
+def index_body(mapping: Dict) -> Dict:
+    """``mapping`` with the configured shard, replica, refresh and vector settings."""
+    body = copy.deepcopy(mapping)
+    settings = body.setdefault('settings', {}).setdefault('index', {})
+    settings.setdefault('number_of_shards', Config.es_shards)
+    settings.setdefault('number_of_replicas', Config.es_replicas)
+    settings.setdefault('refresh_interval', Config.es_refresh_interval)
+    for field in vector_fields(body):
+        field['index_options'] = {
+            'type': Config.es_vector_index_type,
+            'm': Config.es_hnsw_m,
+            'ef_construction': Config.es_hnsw_ef_construction
+        }
+    meta = body['mappings'].setdefault('_meta', {})
+    if vector_fields(body):
+        meta['embedding_model'] = Config.embedding_model_name
+    meta['version'] = index_version(body)
+    return body
+
+
+def vector_fields(body: Dict) -> List[Dict]:
+    properties = body.get('mappings', {}).get('properties') or {}
+    return [field for field in properties.values() if field.get('type') == 'dense_vector' and field.get('index')]
+
+
+def index_version(body: Dict) -> str:
+    """Hash of what only a new index can change: mappings and static settings."""
+    static = {key: value for key, value in body.get('settings', {}).get('index', {}).items()
+              if key not in DYNAMIC_SETTINGS}
+    mappings = dict(body['mappings'])
+    mappings['_meta'] = {key: value for key, value in (mappings.get('_meta') or {}).items() if key != 'version'}
+    payload = json.dumps({'settings': static, 'mappings': mappings}, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=4).hexdigest()
+
+
+class IndexManager:
+    """Creates, migrates and bulk-loads the versioned indices of ``INDICES``."""
+
+    def __init__(self, es_client, indices: Sequence[Tuple[str, Dict]] = INDICES):
+        self.es = es_client
+        self.indices = list(indices)
+
+    def setup(self, reembed: Optional[Dict[str, Callable[[str], int]]] = None,
+              delete_old: bool = False) -> Iterator[Tuple[str, str, str]]:
+        """Bring every alias to the current version; yields ``(alias, index, outcome)``.
+
+        ``reembed`` maps an alias to a function that fills the vectors of
+        the new index it is given, called when the embedding model changed.
+        Old versions are kept for rollback unless ``delete_old``. An index
+        created before aliases is kept as ``<alias>-pre-alias``.
+        """
+        for alias, mapping in self.indices:
+            body = index_body(mapping)
+            target = f"{alias}-{body['mappings']['_meta']['version']}"
+            current = self.es.alias_indices(alias)
+            if current == [target]:
+                self.es.put_settings(target, {key: body['settings']['index'][key] for key in DYNAMIC_SETTINGS})
+                yield alias, target, 'current'
+            elif not current and not self.es.indices_exists(alias):
+                self.es.indices_create(target, body)
+                self.es.update_aliases([{'add': {'index': target, 'alias': alias}}])
+                yield alias, target, 'created'
+            else:
+                # An older version, or an index created before aliases
+                source = current[0] if current else alias
+                self._migrate(alias, source, target, body, (reembed or {}).get(alias), delete_old)
+                yield alias, target, f"migrated from {source}"
+
+    def _migrate(self, alias: str, source: str, target: str, body: Dict,
+                 reembed: Optional[Callable[[str], int]], delete_old: bool) -> None:
+        model = body['mappings']['_meta'].get('embedding_model')
+        old_model = self.es.get_mapping_meta(source).get('embedding_model') if model else None
+        # Vectors from another model are useless in the new index; they are rebuilt below.
+        # Indices from before versioning do not say, and keep theirs.
+        exclude = None
+        if old_model is not None and old_model != model and reembed is not None:
+            exclude = [name for name, field in body['mappings']['properties'].items() if field in vector_fields(body)]
+            if alias == 'tool-endpoints':
+                # The hashes would mark every endpoint unchanged and skip re-embedding it
+                exclude.append('content_hash')
+
+        if not self.es.indices_exists(target):
+            self.es.indices_create(target, body)
+        with self.bulk_load([target]):
+            # First pass while the source still takes writes
+            self.es.reindex(source, target, exclude=exclude)
+            if exclude:
+                logger.info(f"Re-embedding {target} for {model}")
+                reembed(target)
+            # Final pass with writes blocked, so creates, updates and deletes made during
+            # the first one all reach the new version; writers fail until the alias moves
+            self.es.put_settings(source, {'blocks.write': True})
+            try:
+                self.es.reindex(source, target, exclude=exclude)
+                self._drop_deleted(source, target)
+                if exclude:
+                    # Rewritten documents lost their vectors again; the embedding cache makes this pass cheap
+                    reembed(target)
+                copied, expected = self.es.count(target), self.es.count(source)
+                if copied != expected:
+                    raise RuntimeError(f"{target} holds {copied} documents, {source} {expected}; alias left on {source}")
+                self._swap(alias, source, target, delete_old)
+            except BaseException:
+                if self.es.indices_exists(source):
+                    self.es.put_settings(source, {'blocks.write': False})
+                raise
+
+    def _drop_deleted(self, source: str, target: str) -> None:
+        """Delete documents from ``target`` that are gone from ``source``."""
+        if self.es.count(target) <= self.es.count(source):
+            return
+        kept = {hit['_id'] for hit in self.es.scan(source, source=False)}
+        gone = [hit['_id'] for hit in self.es.scan(target, source=False) if hit['_id'] not in kept]
+        owns_bulk = self.es.bulk_writer is None
+        self.es.start_bulk()
+        try:
+            for doc_id in gone:
+                self.es.write_delete(target, doc_id)
+        finally:
+            if owns_bulk:
+                self.es.stop_bulk()
+        self.es.refresh(target)
+
+    def _swap(self, alias: str, source: str, target: str, delete_old: bool) -> None:
+        if not self.es.alias_exists(alias):
+            # The alias takes the name of the pre-alias index, which has to go in the same
+            # request. Unless told otherwise, a clone keeps its data (cheap: it hard-links
+            # segments, and needs the write block already in place).
+            if not delete_old:
+                self.es.clone(source, f"{alias}-pre-alias")
+                self.es.put_settings(f"{alias}-pre-alias", {'blocks.write': False})
+            self.es.update_aliases([{'remove_index': {'index': source}}, {'add': {'index': target, 'alias': alias}}])
+            return
+        self.es.update_aliases([{'remove': {'index': source, 'alias': alias}}, {'add': {'index': target, 'alias': alias}}])
+        if delete_old:
+            self.es.indices_delete(source)
+        else:
+            # Kept for rollback, writable again once the alias no longer points at it
+            self.es.put_settings(source, {'blocks.write': False})
+
+    def aliases(self) -> List[str]:
+        return [alias for alias, _ in self.indices]
+
+    @contextmanager
+    def bulk_load(self, names: Optional[Sequence[str]] = None):
+        """Refresh and replicas off for ``names`` (aliases or indices; all by default) while the block runs.
+
+        Afterwards each index is refreshed and force-merged, and then its
+        replicas and refresh interval are restored. Merging first means new
+        replicas copy a few merged segments instead of re-merging them. Two
+        overlapping bulk loads of one index restore whichever settings the
+        first one found.
+        """
+        indices = []
+        for name in names or self.aliases():
+            indices.extend(self.es.alias_indices(name) or ([name] if self.es.indices_exists(name) else []))
+        saved = {}
+        for index in indices:
+            settings = self.es.get_settings(index)
+            saved[index] = {
+                'number_of_replicas': settings.get('number_of_replicas', Config.es_replicas),
+                'refresh_interval': settings.get('refresh_interval', Config.es_refresh_interval)
+            }
+            self.es.put_settings(index, {'number_of_replicas': 0, 'refresh_interval': '-1'})
+        try:
+            yield indices
+        finally:
+            for index in indices:
+                try:
+                    self.es.refresh(index)
+                    self.es.forcemerge(index, Config.es_merge_segments)
+                finally:
+                    self.es.put_settings(index, saved[index])
@@ -1,4 +1,10 @@
+# Shard, replica and vector index settings are added by src/elasticsearch/indices.py.
+# The large text blobs (tool_code, legacy endpoints) stay in _source: these indices take
+# partial updates, which rebuild a document from its _source and would drop excluded fields.
+# best_compression shrinks them on disk instead.
+
 API_DISCOVERIES_MAPPING = {
+    "settings": {"index": {"codec": "best_compression"}},
     "mappings": {
         "properties": {
             "api_url": {"type": "keyword"},
@@ -9,26 +15,65 @@ API_DISCOVERIES_MAPPING = {
             "openapi_spec_url": {"type": "keyword"},
             "has_openapi_spec": {"type": "boolean"},
             "auth_type": {"type": "keyword"},
-            "endpoints": {
-                "type": "nested",
-                "properties": {
-                    "path": {"type": "keyword"},
-                    "method": {"type": "keyword"},
-                    "summary": {"type": "text"},
-                    "description": {"type": "text"},
-                    "parameters": {"type": "object", "enabled": False},
-                    "request_body": {"type": "object", "enabled": False},
-                    "responses": {"type": "object", "enabled": False}
-                }
-            },
             "total_endpoints": {"type": "integer"},
             "discovery_status": {"type": "keyword"},
-            "error_message": {"type": "text"}
+            "error_message": {"type": "text"},
+            "storage": {"type": "keyword"},
+            # Discoveries written before endpoints moved to api-endpoints
+            "endpoints": {"type": "object", "enabled": False}
+        }
+    }
+}
+
+API_ENDPOINTS_MAPPING = {
+    "mappings": {
+        "properties": {
+            "api_url": {"type": "keyword"},
+            "position": {"type": "integer"},
+            "path": {"type": "keyword"},
+            "method": {"type": "keyword"},
+            "summary": {"type": "text"},
+            "description": {"type": "text"},
+            "operation_id": {"type": "keyword"},
+            "fingerprint": {"type": "keyword", "index": False},
+            "schema_refs": {"type": "object", "enabled": False}
+        }
+    }
+}
+
+# Schema fragments are only fetched by id, so nothing in them is indexed
+API_SCHEMAS_MAPPING = {
+    "settings": {"index": {"codec": "best_compression"}},
+    "mappings": {"enabled": False}
+}
+
+# One vector per endpoint for endpoint-level search (src/agents/endpoint_search.py)
+TOOL_ENDPOINTS_MAPPING = {
+    "mappings": {
+        "properties": {
+            "tool_id": {"type": "keyword"},
+            "tool_name": {"type": "keyword"},
+            "api_url": {"type": "keyword"},
+            "position": {"type": "integer"},
+            "method": {"type": "keyword"},
+            "path": {"type": "keyword"},
+            "summary": {"type": "text"},
+            "operation_id": {"type": "keyword"},
+            "auth_type": {"type": "keyword"},
+            "categories": {"type": "keyword"},
+            "content_hash": {"type": "keyword", "index": False},
+            "embedding": {
+                "type": "dense_vector",
+                "dims": 384,
+                "index": True,
+                "similarity": "cosine"
+            }
         }
     }
 }
 
 AGENT_TOOLS_MAPPING = {
+    "settings": {"index": {"codec": "best_compression"}},
     "mappings": {
         "properties": {
             "tool_id": {"type": "keyword"},
@@ -56,6 +101,10 @@ AGENT_TOOLS_MAPPING = {
             "last_used": {"type": "date"},
             "success_rate": {"type": "float"},
             "avg_execution_time_ms": {"type": "float"},
+            "recent_usage_count": {"type": "integer"},
+            "recent_success_rate": {"type": "float"},
+            "recent_avg_execution_time_ms": {"type": "float"},
+            "recent_since": {"type": "keyword"},
             "rating": {"type": "float"},
             "review_count": {"type": "integer"},
             "is_verified": {"type": "boolean"},
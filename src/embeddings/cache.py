@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+import hashlib
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from src.files import file_lock
+from src.instrumentation import count
+
+logger = logging.getLogger(__name__)
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class DiskVectorStore:
+    """Append-only float32 vector file plus a key file, one row per key.
+
+    ``vectors.f32`` is memory-mapped for reads. Rows are written before
+    their key, so a crash mid-append leaves at most an orphan or torn row,
+    or a torn last key. Loading cuts both files back to their last complete
+    row. Several processes may share the directory: appends hold a file
+    lock and first pick up the rows other processes appended.
+    """
+
+    def __init__(self, path: str, dims: int):
+        self.path = path
+        self.dims = dims
+        self.vectors_path = os.path.join(path, 'vectors.f32')
+        self.keys_path = os.path.join(path, 'keys.txt')
+        self.lock_path = os.path.join(path, 'lock')
+        self._rows: Dict[str, int] = {}
+        # Rows in the files (a key appended twice by racing processes counts twice),
+        # and how far into keys.txt they were read
+        self._count = 0
+        self._keys_offset = 0
+        self._mmap = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load(self) -> None:
+        with self._lock, file_lock(self.lock_path):
+            self._sync()
+
+    def _sync(self) -> None:
+        """Read rows appended since the last sync and cut off anything incomplete; needs both locks."""
+        row_bytes = self.dims * 4
+        available = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, 'rb') as f:
+                f.seek(self._keys_offset)
+                for line in f:
+                    key = line.rstrip(b'\n').decode('ascii', 'replace')
+                    if self._count >= available or not line.endswith(b'\n') or len(key) != 64:
+                        break
+                    self._rows.setdefault(key, self._count)
+                    self._count += 1
+                    self._keys_offset += len(line)
+            if os.path.getsize(self.keys_path) > self._keys_offset:
+                os.truncate(self.keys_path, self._keys_offset)
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > self._count * row_bytes:
+            os.truncate(self.vectors_path, self._count * row_bytes)
+
+    def _vectors(self) -> np.ndarray:
+        if self._mmap is None or len(self._mmap) < self._count:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                   shape=(self._count, self.dims))
+        return self._mmap
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            if all(row is None for row in rows):
+                return [None] * len(keys)
+            vectors = self._vectors()
+            return [None if row is None else np.array(vectors[row]) for row in rows]
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        with self._lock, file_lock(self.lock_path):
+            # Another process may have appended since; rows are numbered after its rows
+            self._sync()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows:
+                    new.setdefault(key, vector)
+            if not new:
+                return
+            block = np.asarray(list(new.values()), dtype=np.float32)
+            with open(self.vectors_path, 'ab') as f:
+                f.write(block.tobytes())
+            data = ''.join(f"{key}\n" for key in new).encode('ascii')
+            with open(self.keys_path, 'ab') as f:
+                f.write(data)
+            for key in new:
+                self._rows[key] = self._count
+                self._count += 1
+            self._keys_offset += len(data)
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache for one model.
+
+    Lookups hit an in-memory LRU first, then the on-disk store under
+    ``cache_dir/<model>``. Pass ``cache_dir=None`` for a memory-only cache.
+    """
+
+    def __init__(self, model_name: str, dims: int, cache_dir: Optional[str] = None,
+                 memory_size: int = 10000):
+        self.model_name = model_name
+        self.dims = dims
+        self.memory_size = memory_size
+        self._memory: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.disk = None
+        if cache_dir:
+            slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+            try:
+                self.disk = DiskVectorStore(os.path.join(cache_dir, slug), dims)
+            except OSError as e:
+                logger.warning(f"Embedding disk cache disabled ({cache_dir}): {e}")
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        keys = [text_key(text) for text in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(i)
+                else:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+
+        if missing and self.disk is not None:
+            from_disk = self.disk.get_many([keys[i] for i in missing])
+            with self._lock:
+                for i, vector in zip(missing, from_disk):
+                    if vector is not None:
+                        found[i] = vector
+                        self._remember(keys[i], vector)
+        return found
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, np.asarray(vector, dtype=np.float32))
+        if self.disk is not None:
+            self.disk.put_many(keys, vectors)
+
+    def encode(self, texts: Sequence[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Vectors for ``texts``, calling ``encode_fn`` once on the distinct cache misses only."""
+        cached = self.get_many(texts)
+        pending = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        hits = len(texts) - sum(vector is None for vector in cached)
+        self.hits += hits
+        self.misses += len(pending)
+        count('embed.cache_hits', hits)
+        count('embed.cache_misses', len(pending))
+
+        if pending:
+            encoded = np.asarray(encode_fn(pending), dtype=np.float32)
+            self.put_many(pending, encoded)
+            by_text = dict(zip(pending, encoded))
+            cached = [by_text[text] if vector is None else vector for text, vector in zip(texts, cached)]
+
+        if not cached:
+            return np.empty((0, self.dims), dtype=np.float32)
+        return np.vstack(cached)
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
@@ -0,0 +1,211 @@
+"""Embedding encoders behind one interface, loaded once per process.
+
+An encoder is anything with ``encode(texts, batch_size=..., convert_to_numpy=True)``
+that returns one row per text, as ``SentenceTransformer`` does. Backends:
+
+- ``torch``: ``SentenceTransformer`` in full precision (the default).
+- ``onnx``: the model's ONNX export on ONNX Runtime, optionally with int8
+  weights quantized on first use. Needs ``pip install agentnexus-tools[onnx]``.
+
+More backends can be added with ``register_backend``.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ('none', 'int8')
+
+_models: Dict[Tuple, object] = {}
+_lock = threading.Lock()
+_backends: Dict[str, Callable] = {}
+
+
+def register_backend(name: str, loader: Callable) -> None:
+    """``loader(model_name, quantize, threads)`` returns an encoder."""
+    _backends[name] = loader
+
+
+def encoder_id(model_name: str, backend: Optional[str] = None, quantize: Optional[str] = None) -> str:
+    """Name for what an encoder produces, e.g. for keying cached vectors.
+
+    Quantized weights give slightly different vectors, so they get a name
+    of their own.
+    """
+    backend = backend or Config.embedding_backend
+    quantize = quantize or Config.embedding_quantize
+    return model_name if quantize == 'none' else f"{model_name}@{backend}-{quantize}"
+
+
+def get_model(model_name: str, backend: Optional[str] = None, quantize: Optional[str] = None,
+              threads: Optional[int] = None):
+    """Process-wide encoder, imported and loaded on first use.
+
+    Defaults come from ``EMBEDDING_BACKEND``, ``EMBEDDING_QUANTIZE`` and
+    ``EMBEDDING_THREADS`` (0 leaves the runtime's own thread count).
+    """
+    backend = backend or Config.embedding_backend
+    quantize = quantize or Config.embedding_quantize
+    threads = Config.embedding_threads if threads is None else threads
+    if backend not in _backends:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {sorted(_backends)}")
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantize!r}; expected one of {QUANTIZATIONS}")
+    key = (model_name, backend, quantize, threads)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                logger.info(f"Loading embedding model: {model_name} ({backend}, {quantize})")
+                model = _backends[backend](model_name, quantize, threads)
+                _models[key] = model
+    return model
+
+
+def is_loaded(model_name: str) -> bool:
+    return any(key[0] == model_name for key in _models)
+
+
+def _load_torch(model_name: str, quantize: str, threads: int):
+    if quantize != 'none':
+        raise ValueError("The torch backend runs in full precision; use EMBEDDING_BACKEND=onnx for int8")
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model_name)
+
+
+class OnnxEncoder:
+    """A sentence-transformers model run on ONNX Runtime.
+
+    Reads ``onnx/model.onnx`` and ``tokenizer.json`` from a local model
+    directory or the Hugging Face Hub, plus the pooling, normalization and
+    sequence-length settings sentence-transformers saves beside them. With
+    ``quantize='int8'`` the weights are quantized once with dynamic int8
+    quantization, and the result is kept under ``EMBEDDING_ONNX_DIR``.
+    Texts are batched by length so that little padding is computed.
+    """
+
+    def __init__(self, model_name: str, quantize: str = 'none', threads: int = 0,
+                 cache_dir: Optional[str] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self._files = _ModelFiles(model_name)
+        path = self._files.get('onnx/model.onnx')
+        if quantize == 'int8':
+            path = _quantized(path, model_name, cache_dir or Config.embedding_onnx_dir)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.inputs = {item.name for item in self.session.get_inputs()}
+
+        settings = self._files.json('sentence_bert_config.json') or {}
+        pooling = self._files.json('1_Pooling/config.json') or {}
+        modules = self._files.json('modules.json') or []
+        self.pooling = 'cls' if pooling.get('pooling_mode_cls_token') else 'mean'
+        self.normalize = any(module.get('type', '').endswith('Normalize') for module in modules)
+
+        self.tokenizer = Tokenizer.from_file(self._files.get('tokenizer.json'))
+        self.tokenizer.enable_truncation(settings.get('max_seq_length', 256))
+        self.tokenizer.no_padding()
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        encodings = self.tokenizer.encode_batch(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for i, vector in zip(batch, self._run([encodings[i] for i in batch])):
+                vectors[i] = vector
+        result = np.vstack(vectors) if texts else np.empty((0, self.dims), dtype=np.float32)
+        return result[0] if single else result
+
+    @property
+    def dims(self) -> int:
+        return self.session.get_outputs()[0].shape[-1]
+
+    def _run(self, encodings) -> np.ndarray:
+        width = max(len(encoding.ids) for encoding in encodings)
+        ids = np.zeros((len(encodings), width), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        for row, encoding in enumerate(encodings):
+            ids[row, :len(encoding.ids)] = encoding.ids
+            mask[row, :len(encoding.ids)] = 1
+        feed = {'input_ids': ids, 'attention_mask': mask}
+        if 'token_type_ids' in self.inputs:
+            feed['token_type_ids'] = np.zeros_like(ids)
+        tokens = self.session.run(None, feed)[0]
+
+        if tokens.ndim == 2:
+            # Exports that already include the pooling step
+            pooled = tokens
+        elif self.pooling == 'cls':
+            pooled = tokens[:, 0]
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (tokens * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+
+class _ModelFiles:
+    """Files of a model from a local directory, or else the Hugging Face Hub."""
+
+    def __init__(self, model_name: str):
+        self.local = model_name if os.path.isdir(model_name) else None
+        # Bare names are sentence-transformers models, as SentenceTransformer resolves them
+        self.repo = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+
+    def get(self, filename: str) -> str:
+        if self.local:
+            path = os.path.join(self.local, filename)
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            return path
+        from huggingface_hub import hf_hub_download
+        return hf_hub_download(self.repo, filename)
+
+    def json(self, filename: str) -> Optional[Dict]:
+        try:
+            with open(self.get(filename)) as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+
+def _quantized(path: str, model_name: str, cache_dir: str) -> str:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    slug = ''.join(c if c.isalnum() or c in '._-' else '_' for c in model_name)
+    target = os.path.join(cache_dir, slug, 'model_int8.onnx')
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        logger.info(f"Quantizing {model_name} to int8 -> {target}")
+        tmp = f"{target}.tmp{os.getpid()}"
+        quantize_dynamic(path, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, target)
+    return target
+
+
+register_backend('torch', _load_torch)
+register_backend('onnx', lambda model_name, quantize, threads: OnnxEncoder(model_name, quantize, threads))
@@ -0,0 +1,76 @@
+"""Atomic, change-aware writes for generated files, and locks for files several processes append to."""
+from contextlib import contextmanager
+from typing import Callable, IO
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+
+class HashingWriter:
+    """Text sink that encodes to UTF-8, writes to a binary file and hashes what it wrote."""
+
+    def __init__(self, fp: IO[bytes]):
+        self._fp = fp
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        data = text.encode('utf-8')
+        self._fp.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        return len(text)
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_if_changed(path: str, write: Callable[[HashingWriter], None]) -> bool:
+    """Produce ``path`` through ``write`` without ever exposing a partial file.
+
+    Content goes to a temp file in the same directory, which then replaces
+    ``path`` in one rename. If the content is identical to the existing
+    file, the temp file is discarded and ``path`` is not touched, so its
+    mtime is preserved. Returns whether ``path`` was (re)written.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    # os.open applies the umask like a plain open() would; mkstemp would force 0600
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer = HashingWriter(f)
+            write(writer)
+        if (os.path.exists(path) and os.path.getsize(path) == writer.size
+                and file_digest(path) == writer.digest.hexdigest()):
+            os.remove(tmp)
+            return False
+        os.replace(tmp, path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive advisory lock on ``path`` (created if missing), across processes."""
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,232 @@
+"""Read-through cache for catalog lookups, plus backoff for dead hosts.
+
+Entries are keyed by namespace (``discovery``, ``endpoints``, ``tool``) and
+normalized API URL. Each entry lives in an in-process LRU with a TTL. When a
+path is given, entries are also kept in a local SQLite file, so a later run
+skips the same Elasticsearch round-trips. A lookup that found nothing is
+cached as well, under a shorter TTL.
+
+Hosts that could not be reached are remembered separately. Each further
+failure doubles the wait before the host is probed again.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from src.config import Config
+from src.instrumentation import count
+from src.urls import host_key, normalize_url
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class SqliteStore:
+    """Durable side of ``LookupCache``: JSON values with an expiry time, and host backoff state."""
+
+    def __init__(self, path: str):
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, expires REAL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS hosts (host TEXT PRIMARY KEY, failures INTEGER, retry_at REAL)')
+        self._db.execute('DELETE FROM entries WHERE expires < ?', (time.time(),))
+
+    def get(self, key: str) -> Tuple[object, float]:
+        with self._lock:
+            row = self._db.execute('SELECT value, expires FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return MISSING, 0.0
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, value, expires: float) -> None:
+        data = json.dumps(value, default=str)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, data, expires))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def get_host(self, host: str) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            return self._db.execute('SELECT failures, retry_at FROM hosts WHERE host = ?', (host,)).fetchone()
+
+    def put_host(self, host: str, failures: int, retry_at: float) -> None:
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO hosts VALUES (?, ?, ?)', (host, failures, retry_at))
+
+    def delete_host(self, host: str) -> None:
+        with self._lock:
+            self._db.execute('DELETE FROM hosts WHERE host = ?', (host,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute('DELETE FROM entries')
+            self._db.execute('DELETE FROM hosts')
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class LookupCache:
+    """TTL'd LRU of catalog documents and dead-host backoff, optionally persisted to SQLite.
+
+    Values are returned as stored rather than copied, so callers must not
+    mutate them. ``ttl=0`` turns value caching off but keeps host backoff.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, negative_ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, path: Optional[str] = None,
+                 backoff: Optional[float] = None, max_backoff: Optional[float] = None):
+        self.ttl = Config.lookup_cache_ttl if ttl is None else ttl
+        self.negative_ttl = Config.lookup_cache_negative_ttl if negative_ttl is None else negative_ttl
+        self.max_entries = max_entries or Config.lookup_cache_size
+        self.backoff = backoff or Config.host_backoff
+        self.max_backoff = max_backoff or Config.host_backoff_max
+        self._memory: 'OrderedDict[str, Tuple[float, object]]' = OrderedDict()
+        self._hosts: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.disk = None
+        if path:
+            try:
+                self.disk = SqliteStore(path)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Lookup disk cache disabled ({path}): {e}")
+
+    @staticmethod
+    def key(namespace: str, api_url: str) -> str:
+        return f"{namespace}:{normalize_url(api_url)}"
+
+    def get(self, namespace: str, api_url: str):
+        """The cached value (None for a cached miss), or ``MISSING`` if nothing is cached."""
+        if not self.ttl:
+            return MISSING
+        key = self.key(namespace, api_url)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    count('lookup_cache.hits')
+                    return entry[1]
+                del self._memory[key]
+
+        if self.disk is not None:
+            value, expires = self.disk.get(key)
+            if value is not MISSING:
+                with self._lock:
+                    self._remember(key, value, expires)
+                    self.hits += 1
+                count('lookup_cache.hits')
+                return value
+        with self._lock:
+            self.misses += 1
+        count('lookup_cache.misses')
+        return MISSING
+
+    def put(self, namespace: str, api_url: str, value) -> None:
+        if not self.ttl:
+            return
+        key = self.key(namespace, api_url)
+        expires = time.time() + (self.ttl if value is not None else self.negative_ttl)
+        with self._lock:
+            self._remember(key, value, expires)
+        if self.disk is not None:
+            self.disk.put(key, value, expires)
+
+    def invalidate(self, namespace: str, api_url: str) -> None:
+        key = self.key(namespace, api_url)
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def read_through(self, namespace: str, api_url: str, load: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        """Cached value for ``api_url``, else ``load()``'s result, which is cached even if None.
+
+        Exceptions from ``load`` propagate and nothing is cached.
+        """
+        value = self.get(namespace, api_url)
+        if value is MISSING:
+            value = load()
+            self.put(namespace, api_url, value)
+        return value
+
+    def host_retry_after(self, api_url: str) -> float:
+        """Seconds until the host of ``api_url`` may be probed again; 0 if it is not backed off."""
+        host = host_key(api_url)
+        with self._lock:
+            state = self._hosts.get(host)
+        if state is None and self.disk is not None:
+            state = self.disk.get_host(host)
+            if state is not None:
+                with self._lock:
+                    self._hosts[host] = state
+        if state is None:
+            return 0.0
+        return max(0.0, state[1] - time.time())
+
+    def host_failed(self, api_url: str) -> float:
+        """Back the host off for longer than last time; returns the new wait in seconds."""
+        host = host_key(api_url)
+        self.host_retry_after(api_url)
+        with self._lock:
+            failures = self._hosts.get(host, (0, 0.0))[0] + 1
+            wait = min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+            state = self._hosts[host] = (failures, time.time() + wait)
+        if self.disk is not None:
+            self.disk.put_host(host, *state)
+        return wait
+
+    def host_ok(self, api_url: str) -> None:
+        host = host_key(api_url)
+        with self._lock:
+            known = self._hosts.pop(host, None) is not None
+        if self.disk is not None and (known or self.disk.get_host(host) is not None):
+            self.disk.delete_host(host)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._hosts.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def _remember(self, key: str, value, expires: float) -> None:
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+_cache: Optional[LookupCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_lookup_cache() -> LookupCache:
+    """Process-wide cache shared by the introspector, generator and search backend."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LookupCache(path=Config.lookup_cache_path or None)
+    return _cache
+
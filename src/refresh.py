@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+import logging
+import threading
+import time
+
+from src.agents.introspector import APIIntrospector
+from src.agents.generator import ToolGenerator
+from src.agents.relationships import GraphUpdater
+from src.instrumentation import trace
+
+logger = logging.getLogger(__name__)
+
+REFRESH_STATUSES = ('not_modified', 'unchanged', 'no_spec', 'changed', 'failed')
+
+
+class RefreshStats:
+    def __init__(self):
+        self.counts = {status: 0 for status in REFRESH_STATUSES}
+        self.endpoints = {'added': 0, 'removed': 0, 'changed': 0}
+        self.regenerated = 0
+        self.reembedded = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def to_dict(self) -> Dict:
+        return {
+            **self.counts,
+            'endpoints': dict(self.endpoints),
+            'regenerated': self.regenerated,
+            'reembedded': self.reembedded,
+            'elapsed_seconds': round(self.elapsed_seconds, 3)
+        }
+
+
+class RefreshPipeline:
+    """Sweeps stored discoveries and re-processes only the APIs whose spec changed.
+
+    Each discovery is re-checked with a conditional request against its
+    stored spec URL. A 304 or an identical content hash only stamps
+    ``refreshed_at``. A changed spec is re-parsed and its tool regenerated.
+    The tool is re-embedded only if its description changed. At most
+    ``workers`` APIs are in flight at once.
+    """
+
+    SCAN_FIELDS = ['api_url', 'has_openapi_spec', 'openapi_spec_url',
+                   'spec_etag', 'spec_last_modified', 'spec_hash']
+
+    def __init__(self, es_client, output_dir: Optional[str] = None, search_agent=None, workers: int = 8):
+        self.es = es_client
+        self.output_dir = output_dir
+        self.search_agent = search_agent
+        self.introspector = APIIntrospector(es_client)
+        self.generator = ToolGenerator(es_client)
+        self.graph = GraphUpdater()
+
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='refresh')
+        self._inflight = threading.BoundedSemaphore(workers * 4)
+        self._pending = 0
+        self._done = threading.Condition()
+        self.stats = RefreshStats()
+
+    def run(self, discoveries: Optional[Iterable[Dict]] = None) -> RefreshStats:
+        if discoveries is None:
+            discoveries = (hit['_source'] for hit in self.es.scan('api-discoveries', source=self.SCAN_FIELDS))
+        self.es.start_bulk()
+
+        try:
+            for existing in discoveries:
+                self._inflight.acquire()
+                with self._done:
+                    self._pending += 1
+                self._pool.submit(self._refresh, existing)
+
+            with self._done:
+                self._done.wait_for(lambda: self._pending == 0)
+        finally:
+            self._pool.shutdown(wait=True)
+            self.es.stop_bulk()
+            self.stats.finished_at = time.monotonic()
+
+        return self.stats
+
+    def _refresh(self, existing: Dict) -> None:
+        status = 'failed'
+        diff = None
+        try:
+            with trace(existing['api_url']):
+                result = self.introspector.refresh(existing)
+                status, diff = result['status'], result['diff']
+                if status == 'changed':
+                    self._regenerate(existing['api_url'], result['discovery'])
+        except Exception as e:
+            status = 'failed'
+            logger.warning(f"Refresh of {existing.get('api_url')} failed: {e}")
+        finally:
+            with self._done:
+                self.stats.counts[status] += 1
+                for kind, keys in (diff or {}).items():
+                    self.stats.endpoints[kind] += len(keys)
+                self._pending -= 1
+                self._done.notify_all()
+            self._inflight.release()
+
+    def _regenerate(self, api_url: str, discovery: Dict) -> None:
+        tool_data = self.generator.generate(api_url, discovery_data=discovery, force=True)
+        if self.output_dir:
+            self.generator.write_files(tool_data, self.output_dir, discovery_data=discovery)
+        try:
+            self.graph.add(api_url, discovery['endpoints'])
+        except Exception as e:
+            logger.warning(f"Relationship graph not updated for {api_url}: {e}")
+        reembed = self.search_agent is not None and 'description_embedding' not in tool_data
+        if reembed:
+            self.search_agent.index_tool(tool_data)
+        with self._done:
+            self.stats.regenerated += 1
+            self.stats.reembedded += reembed
@@ -0,0 +1,282 @@
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+import json
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+from src import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesces concurrent encode requests into one model call.
+
+    A worker thread blocks for the first request, then keeps collecting
+    for up to ``max_wait_ms`` or until ``max_batch`` texts are queued.
+    Every collected text goes to ``encode_fn`` in a single call.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch: int = 64,
+                 max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.texts = 0
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._encode(pending)
+
+    def _encode(self, pending: List[tuple]) -> None:
+        texts = [text for texts, _ in pending for text in texts]
+        try:
+            vectors = np.asarray(self.encode_fn(texts))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.texts += len(texts)
+        offset = 0
+        for batch_texts, future in pending:
+            future.set_result(vectors[offset:offset + len(batch_texts)])
+            offset += len(batch_texts)
+
+
+class LatencyMetrics:
+    """Per-route request latencies over a sliding window."""
+
+    def __init__(self, window_seconds: float = 60.0, max_samples: int = 10000):
+        self.window_seconds = window_seconds
+        self.started_at = time.time()
+        self._samples: Dict[str, deque] = {}
+        self._totals: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, seconds: float, error: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            samples = self._samples.setdefault(route, deque(maxlen=self._max_samples))
+            samples.append((now, seconds))
+            self._totals[route] = self._totals.get(route, 0) + 1
+            if error:
+                self._errors[route] = self._errors.get(route, 0) + 1
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        routes = {}
+        with self._lock:
+            for route, samples in self._samples.items():
+                recent = [seconds for at, seconds in samples if now - at <= self.window_seconds]
+                window = min(self.window_seconds, now - self.started_at) or 1e-9
+                routes[route] = {
+                    'requests': self._totals[route],
+                    'errors': self._errors.get(route, 0),
+                    'qps': round(len(recent) / window, 2),
+                    'p50_ms': _percentile_ms(recent, 50),
+                    'p99_ms': _percentile_ms(recent, 99)
+                }
+        return {'uptime_seconds': round(now - self.started_at, 1), 'routes': routes}
+
+
+def _percentile_ms(samples: List[float], percentile: float) -> Optional[float]:
+    if not samples:
+        return None
+    return round(float(np.percentile(samples, percentile)) * 1000, 3)
+
+
+class SearchService:
+    """Long-lived CatalogSearch/ToolOrchestrator pair shared by all request threads."""
+
+    def __init__(self, catalog, orchestrator=None, max_batch: int = 64, max_wait_ms: float = 5.0,
+                 usage_logger=None, endpoint_search=None):
+        self.catalog = catalog
+        self.orchestrator = orchestrator
+        self.endpoint_search = endpoint_search
+        self.usage_logger = usage_logger
+        self.batcher = MicroBatcher(catalog.run_model, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        catalog.batcher = self.batcher
+        self.metrics = LatencyMetrics()
+
+    def warm_up(self) -> None:
+        # Loads the model and runs one encode so the first request pays nothing
+        self.catalog.run_model(['warm up'])
+
+    def search(self, query: str, top_k: int, filters: Optional[Dict] = None,
+               retrieval: Optional[str] = None) -> List[Dict]:
+        return self.catalog.search(query, top_k, filters=filters, retrieval=retrieval)
+
+    def search_endpoints(self, query: str, top_k: int, filters: Optional[Dict] = None) -> List[Dict]:
+        if self.endpoint_search is None:
+            raise ValueError("Endpoint search is not enabled on this server")
+        return self.endpoint_search.search(query, top_k, filters=filters)
+
+    def orchestrate(self, payload: Dict) -> Dict:
+        """Plan ``{"request": ...}`` (run it too with ``"execute": true``), or run ``{"steps": [...]}``.
+
+        Explicit steps may only call the APIs of catalog tools. Planned steps
+        that are not read-only run only with ``"allow_mutations": true``.
+        """
+        if self.orchestrator is None:
+            raise ValueError("Orchestration is not enabled on this server")
+        if 'steps' in payload:
+            return self.orchestrator.execute(payload['steps'], deadline=payload.get('deadline'))
+        return self.orchestrator.orchestrate(payload['request'], execute=bool(payload.get('execute')),
+                                             args=payload.get('args'), deadline=payload.get('deadline'),
+                                             allow_mutations=payload.get('allow_mutations') is True)
+
+    def log_usage(self, payload: Dict) -> Dict:
+        """Queue one usage event, or ``{"events": [...]}``, for bulk ingestion."""
+        if self.usage_logger is None:
+            raise ValueError("Usage logging is not enabled on this server")
+        events = payload['events'] if 'events' in payload else [payload]
+        return {'accepted': self.usage_logger.log_many(events)}
+
+    def metrics_snapshot(self) -> Dict:
+        snapshot = self.metrics.snapshot()
+        snapshot['encoder'] = {
+            'batches': self.batcher.batches,
+            'texts': self.batcher.texts,
+            'avg_batch_size': round(self.batcher.texts / self.batcher.batches, 2) if self.batcher.batches else None,
+            'cache_hits': self.catalog.cache.hits,
+            'cache_misses': self.catalog.cache.misses
+        }
+        if instrumentation.enabled():
+            snapshot['spans'] = instrumentation.recorder.snapshot()['spans']
+        return snapshot
+
+    def close(self) -> None:
+        self.catalog.batcher = None
+        self.batcher.close()
+        if self.usage_logger is not None:
+            self.usage_logger.close()
+
+
+def make_handler(service: SearchService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if url.path == '/healthz':
+                return self._send(200, {'status': 'ok'})
+            if url.path == '/metrics':
+                if params.get('format') == 'prometheus':
+                    return self._send_text(200, instrumentation.recorder.to_prometheus())
+                return self._send(200, service.metrics_snapshot())
+            if url.path == '/search':
+                return self._timed('search', lambda: self._search(params))
+            self._send(404, {'error': f"Unknown path: {url.path}"})
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self._send(400, {'error': 'Body must be JSON'})
+            if path == '/search':
+                return self._timed('search', lambda: self._search(payload))
+            if path == '/orchestrate':
+                return self._timed('orchestrate', lambda: service.orchestrate(payload))
+            if path == '/usage':
+                return self._timed('usage', lambda: service.log_usage(payload))
+            self._send(404, {'error': f"Unknown path: {path}"})
+
+        def _search(self, params: Dict) -> Dict:
+            query = params.get('q') or params.get('query')
+            if not query:
+                raise ValueError("Missing query")
+            top_k = int(params.get('top_k') or params.get('k') or 5)
+            filters = {field: params[field] for field in ('auth_type', 'categories') if params.get(field)}
+            if params.get('endpoints') not in (None, '', '0', 'false', False):
+                results = service.search_endpoints(query, top_k, filters=filters or None)
+                return {'query': query, 'results': results}
+            results = service.search(query, top_k, filters=filters or None, retrieval=params.get('retrieval'))
+            return {'query': query, 'results': results}
+
+        def _timed(self, route: str, handler: Callable[[], Dict]) -> None:
+            start = time.perf_counter()
+            error = False
+            try:
+                self._send(200, handler())
+            except (ValueError, KeyError) as e:
+                error = True
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                error = True
+                logger.exception(f"{route} failed")
+                self._send(500, {'error': str(e)})
+            finally:
+                service.metrics.observe(route, time.perf_counter() - start, error=error)
+
+        def _send(self, status: int, body: Dict) -> None:
+            self._send_bytes(status, json.dumps(body, default=str).encode(), 'application/json')
+
+        def _send_text(self, status: int, text: str) -> None:
+            self._send_bytes(status, text.encode(), 'text/plain; version=0.0.4')
+
+        def _send_bytes(self, status: int, data: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+class _SearchHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connection bursts from agent fleets into SYN retries
+    request_queue_size = 256
+
+
+def make_server(service: SearchService, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    return _SearchHTTPServer((host, port), make_handler(service))
@@ -0,0 +1,132 @@
+"""Jinja templates for generated artifacts and the shared environment that renders them."""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, IO, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import threading
+import unicodedata
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, StrictUndefined
+
+from src.config import Config
+from src.files import write_if_changed
+from src.instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_NAMES = ('tool.py.j2', 'mcp_server.py.j2', 'readme.md.j2')
+
+_environments: Dict[str, Environment] = {}
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_environment(templates_dir: Optional[str] = None) -> Environment:
+    """Process-wide environment per template directory.
+
+    Templates are compiled once, on first use, and the compiled bytecode
+    is cached on disk so later processes skip parsing as well.
+    """
+    templates_dir = templates_dir or TEMPLATES_DIR
+    env = _environments.get(templates_dir)
+    if env is None:
+        with _lock:
+            env = _environments.get(templates_dir)
+            if env is None:
+                env = _build_environment(templates_dir)
+                _environments[templates_dir] = env
+    return env
+
+
+def _build_environment(templates_dir: str) -> Environment:
+    bytecode_cache = None
+    try:
+        os.makedirs(Config.template_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(Config.template_cache_dir)
+    except OSError as e:
+        logger.warning(f"Template bytecode cache disabled: {e}")
+
+    env = Environment(
+        loader=FileSystemLoader(templates_dir),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+        keep_trailing_newline=True,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        undefined=StrictUndefined
+    )
+    env.filters['pyrepr'] = repr
+    env.filters['docstring'] = _docstring
+    for name in TEMPLATE_NAMES:
+        if os.path.exists(os.path.join(templates_dir, name)):
+            env.get_template(name)
+    return env
+
+
+def render(name: str, context: Dict, templates_dir: Optional[str] = None) -> str:
+    return get_environment(templates_dir).get_template(name).render(context)
+
+
+def render_to(name: str, context: Dict, fp: IO[str], templates_dir: Optional[str] = None) -> None:
+    """Write the rendered template to ``fp`` chunk by chunk, never as one string."""
+    stream = get_environment(templates_dir).get_template(name).stream(context)
+    stream.enable_buffering(256)
+    stream.dump(fp)
+
+
+def write_template(name: str, context: Dict, path: str, templates_dir: Optional[str] = None) -> bool:
+    """Stream ``name`` into ``path`` atomically; False if the content was unchanged."""
+    return write_if_changed(path, lambda fp: render_to(name, context, fp, templates_dir))
+
+
+@timed('template.render')
+def render_all(templates: Dict[str, str], context: Dict, templates_dir: Optional[str] = None,
+               parallel: bool = False) -> Dict[str, str]:
+    """Render each ``{key: template}`` with one context, concurrently on the render pool if ``parallel``."""
+    if not parallel:
+        return {key: render(name, context, templates_dir) for key, name in templates.items()}
+    pool = render_pool()
+    futures = {key: pool.submit(render, name, context, templates_dir) for key, name in templates.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+
+@timed('template.write')
+def write_all(files: Dict[str, Tuple[str, str]], context: Dict, templates_dir: Optional[str] = None,
+              parallel: bool = False) -> Dict[str, bool]:
+    """Write each ``{key: (template, path)}``; values tell whether the file was rewritten."""
+    if not parallel:
+        return {key: write_template(name, context, path, templates_dir) for key, (name, path) in files.items()}
+    pool = render_pool()
+    futures = {key: pool.submit(write_template, name, context, path, templates_dir)
+               for key, (name, path) in files.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+
+def render_pool() -> ProcessPoolExecutor:
+    """Worker processes shared by all generators, for rendering big tools outside the GIL."""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                # spawn: forking a process full of pipeline threads and locks is not safe
+                _pool = ProcessPoolExecutor(
+                    max_workers=Config.render_workers or os.cpu_count(),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def _docstring(text: str) -> str:
+    """First line of ``text``, safe inside a triple-quoted docstring or a ``#`` comment.
+
+    Specs are remote input: a quote or line break left in would let them
+    close the docstring or comment and inject code into the generated module.
+    """
+    text = str(text or '').strip()
+    line = text.splitlines()[0] if text else ''
+    # Control characters either end the line for the tokenizer or make the module unparsable
+    line = ''.join(ch for ch in line if unicodedata.category(ch) != 'Cc')
+    line = line.replace('\\', '\\\\').replace('"', '\\"')
+    return line
@@ -0,0 +1,239 @@
+"""Shared HTTP transport for probing APIs and for generated tools.
+
+Each host gets its own keep-alive connection pool, a concurrency limit and
+an optional rate limit. Idempotent requests are retried on connection
+errors and on 429/5xx answers with jittered exponential backoff, and
+``Retry-After`` is honoured up to ``HTTP_RETRY_AFTER_MAX`` seconds.
+
+``get_transport()`` returns the process-wide instance. ``get_probe_transport()``
+returns one that never retries, for discovery: a probe that fails moves
+on to the next candidate instead of waiting. ``AsyncTransport`` offers
+the same behaviour on httpx for asyncio callers.
+"""
+from typing import Dict, Optional
+import asyncio
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config import Config
+from src.instrumentation import span
+from src.urls import host_key
+
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` requests per second with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """Take a token; returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.delay()
+        if wait:
+            time.sleep(wait)
+
+
+class _Host:
+    def __init__(self, session: requests.Session, limit: threading.BoundedSemaphore,
+                 limiter: Optional[RateLimiter]):
+        self.session = session
+        self.limit = limit
+        self.limiter = limiter
+
+
+class Transport:
+    """Thread-safe HTTP client with per-host pools, retries, and concurrency/rate limits.
+
+    ``request`` takes the same arguments as ``requests.Session.request``.
+    The per-host slot is held until the response headers arrive. A
+    ``stream=True`` body is read after the slot has been released.
+    """
+
+    def __init__(self, max_per_host: Optional[int] = None, retries: Optional[int] = None,
+                 backoff: Optional[float] = None, rate_per_host: Optional[float] = None,
+                 timeout: Optional[float] = None):
+        self.max_per_host = max_per_host or Config.http_max_per_host
+        self.retries = Config.http_retries if retries is None else retries
+        self.backoff = Config.http_backoff if backoff is None else backoff
+        self.rate_per_host = Config.http_rate_per_host if rate_per_host is None else rate_per_host
+        self.timeout = timeout or Config.request_timeout
+        self._hosts: Dict[str, _Host] = {}
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        host = self._host(url)
+        kwargs.setdefault('timeout', self.timeout)
+        if host.limiter is not None:
+            host.limiter.acquire()
+        with host.limit, span('http.request'):
+            return host.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            hosts, self._hosts = self._hosts, {}
+        for host in hosts.values():
+            host.session.close()
+
+    def _host(self, url: str) -> _Host:
+        key = host_key(url)
+        host = self._hosts.get(key)
+        if host is None:
+            with self._lock:
+                host = self._hosts.get(key)
+                if host is None:
+                    host = self._hosts[key] = _Host(
+                        self._session(),
+                        threading.BoundedSemaphore(self.max_per_host),
+                        RateLimiter(self.rate_per_host) if self.rate_per_host else None
+                    )
+        return host
+
+    def _session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_per_host,
+                              max_retries=_retry(self.retries, self.backoff))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+class _CappedRetry(Retry):
+    """``Retry`` that sleeps at most ``HTTP_RETRY_AFTER_MAX`` seconds on a ``Retry-After`` answer."""
+
+    def sleep_for_retry(self, response=None) -> bool:
+        retry_after = self.get_retry_after(response) if response is not None else None
+        if retry_after:
+            time.sleep(min(retry_after, Config.http_retry_after_max))
+            return True
+        return False
+
+
+def _retry(retries: int, backoff: float) -> Retry:
+    options = dict(total=retries, connect=retries, read=retries, status=retries,
+                   allowed_methods=IDEMPOTENT_METHODS, status_forcelist=RETRY_STATUSES,
+                   backoff_factor=backoff, raise_on_status=False, respect_retry_after_header=True)
+    try:
+        return _CappedRetry(backoff_jitter=backoff, **options)
+    except TypeError:
+        # urllib3 < 2 has no jitter option
+        return _CappedRetry(**options)
+
+
+_transport: Optional[Transport] = None
+_probe_transport: Optional[Transport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """Process-wide transport, so every caller shares the same keep-alive pools."""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
+
+
+def get_probe_transport() -> Transport:
+    """Process-wide transport without retries, for spec probes and link crawling."""
+    global _probe_transport
+    if _probe_transport is None:
+        with _transport_lock:
+            if _probe_transport is None:
+                _probe_transport = Transport(retries=0)
+    return _probe_transport
+
+
+class AsyncTransport:
+    """asyncio counterpart of ``Transport`` on an ``httpx.AsyncClient``.
+
+    httpx is optional. It is imported when the first instance is created.
+    """
+
+    def __init__(self, max_per_host: Optional[int] = None, retries: Optional[int] = None,
+                 backoff: Optional[float] = None, rate_per_host: Optional[float] = None,
+                 timeout: Optional[float] = None):
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError("AsyncTransport needs httpx: pip install httpx") from e
+
+        self.max_per_host = max_per_host or Config.http_max_per_host
+        self.retries = Config.http_retries if retries is None else retries
+        self.backoff = Config.http_backoff if backoff is None else backoff
+        self.rate_per_host = Config.http_rate_per_host if rate_per_host is None else rate_per_host
+        self.client = httpx.AsyncClient(
+            timeout=timeout or Config.request_timeout,
+            limits=httpx.Limits(max_keepalive_connections=self.max_per_host * 4),
+            # Connect failures are retried by httpx itself; status retries are ours
+            transport=httpx.AsyncHTTPTransport(retries=self.retries)
+        )
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    async def request(self, method: str, url: str, **kwargs):
+        key = host_key(url)
+        limit = self._limits.setdefault(key, asyncio.Semaphore(self.max_per_host))
+        limiter = self._limiters.setdefault(key, RateLimiter(self.rate_per_host)) if self.rate_per_host else None
+        attempt = 0
+        while True:
+            if limiter is not None:
+                wait = limiter.delay()
+                if wait:
+                    await asyncio.sleep(wait)
+            async with limit:
+                with span('http.request'):
+                    response = await self.client.request(method, url, **kwargs)
+            retryable = method.upper() in IDEMPOTENT_METHODS and response.status_code in RETRY_STATUSES
+            if not retryable or attempt >= self.retries:
+                return response
+            attempt += 1
+            await asyncio.sleep(_retry_delay(response.headers.get('retry-after'), self.backoff, attempt))
+
+    async def get(self, url: str, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+def _retry_delay(retry_after: Optional[str], backoff: float, attempt: int) -> float:
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), Config.http_retry_after_max)
+    delay = backoff * (2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
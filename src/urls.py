@@ -0,0 +1,29 @@
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(api_url: str) -> str:
+    """Canonical form of an API URL: lowercase scheme/host, no default port or trailing slash."""
+    api_url = api_url.strip()
+    if '://' not in api_url:
+        api_url = f"https://{api_url}"
+    parts = urlsplit(api_url)
+    scheme = parts.scheme.lower()
+    netloc = host_key(api_url)
+    return urlunsplit((scheme, netloc, parts.path.rstrip('/'), parts.query, '')).rstrip('/')
+
+
+def host_key(api_url: str) -> str:
+    """``host[:port]`` of a URL, with the scheme's default port dropped."""
+    if '://' not in api_url:
+        api_url = f"https://{api_url.strip()}"
+    parts = urlsplit(api_url)
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        return f"{host}:{parts.port}"
+    return host
+
+
+def discovery_doc_id(api_url: str) -> str:
+    return api_url.replace('/', '_').replace(':', '_').replace('.', '_')
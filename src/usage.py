@@ -0,0 +1,254 @@
+"""Usage-log ingestion and the rollup that turns logs into ranking signals.
+
+Agents report each tool execution through ``UsageLogger``, which batches
+events into ``tool-usage-logs`` with bulk writes. ``UsageRollup`` then
+aggregates the logs per tool in Elasticsearch, using a paginated
+composite aggregation. It writes ``usage_count``, ``success_rate``,
+``avg_execution_time_ms`` and ``last_used`` back to ``agent-tools`` as
+partial bulk updates. The same rows refresh a ``PopularityTable``, which
+the ranker reads in place of per-hit ``_source`` fields. A rollup limited
+to recent events writes ``recent_*`` fields instead and leaves the
+all-time figures, and the table, as they are.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+import logging
+import threading
+import time
+import uuid
+
+from src.agents.ranking import PopularityTable
+from src.elasticsearch.client import BulkIndexer
+from src.instrumentation import count, timed
+
+logger = logging.getLogger(__name__)
+
+USAGE_INDEX = 'tool-usage-logs'
+TOOLS_INDEX = 'agent-tools'
+# Written by a ``since``-limited rollup in place of the all-time fields
+WINDOW_FIELDS = ('usage_count', 'success_rate', 'avg_execution_time_ms')
+EVENT_FIELDS = ('tool_id', 'timestamp', 'user_query', 'execution_success', 'execution_time_ms',
+                'error_message', 'agent_id')
+
+
+def usage_event(tool_id: str, execution_success: bool, execution_time_ms: Optional[float] = None,
+                user_query: Optional[str] = None, error_message: Optional[str] = None,
+                agent_id: Optional[str] = None, timestamp: Optional[str] = None) -> Dict:
+    """A ``tool-usage-logs`` document; ``timestamp`` defaults to now (UTC)."""
+    if not tool_id:
+        raise ValueError("tool_id is required")
+    if not isinstance(execution_success, bool):
+        raise ValueError("execution_success must be true or false")
+    event = {
+        'log_id': uuid.uuid4().hex,
+        'tool_id': tool_id,
+        'timestamp': timestamp or datetime.utcnow().isoformat(),
+        'execution_success': execution_success
+    }
+    optional = {'execution_time_ms': execution_time_ms, 'user_query': user_query,
+                'error_message': error_message, 'agent_id': agent_id}
+    event.update({field: value for field, value in optional.items() if value is not None})
+    return event
+
+
+class UsageLogger:
+    """Buffers usage events and ships them to ``tool-usage-logs`` in bulk requests.
+
+    Events are flushed every ``max_docs`` events or ``flush_interval``
+    seconds, whichever comes first. Call ``close`` (or use it as a context
+    manager) so the last partial batch is sent.
+    """
+
+    def __init__(self, es_client, index: str = USAGE_INDEX, max_docs: int = 1000,
+                 flush_interval: float = 2.0):
+        self.index = index
+        self.writer = BulkIndexer(es_client.client, max_docs=max_docs, flush_interval=flush_interval)
+
+    def log(self, tool_id: str, execution_success: bool, **fields) -> str:
+        """Queue one event; returns its ``log_id``."""
+        event = usage_event(tool_id, execution_success, **fields)
+        self.writer.index(self.index, event['log_id'], event)
+        count('usage.events')
+        return event['log_id']
+
+    def log_many(self, events: Iterable[Dict]) -> int:
+        """Queue events given as dicts of ``usage_event`` arguments; returns how many.
+
+        Every event is validated before any is queued, so a bad one rejects the whole batch.
+        """
+        documents = []
+        for event in events:
+            try:
+                documents.append(usage_event(**{field: event[field] for field in EVENT_FIELDS if field in event}))
+            except TypeError as e:
+                raise ValueError(f"Invalid usage event: {e}") from e
+        for document in documents:
+            self.writer.index(self.index, document['log_id'], document)
+        count('usage.events', len(documents))
+        return len(documents)
+
+    def flush(self) -> None:
+        self.writer.flush()
+
+    def close(self) -> None:
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class UsageRollup:
+    """Aggregates usage logs per tool and writes the results onto the tool documents.
+
+    Every run recomputes the totals from the logs, so running it again, or
+    after a crash, is safe. ``since`` limits the rollup to recent events,
+    e.g. ``now-30d``. Their counts go to ``recent_usage_count``,
+    ``recent_success_rate`` and ``recent_avg_execution_time_ms``, with the
+    window in ``recent_since``. ``last_used`` is the latest event either way.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, es_client, usage_index: str = USAGE_INDEX, tools_index: str = TOOLS_INDEX,
+                 table: Optional[PopularityTable] = None):
+        self.es = es_client
+        self.usage_index = usage_index
+        self.tools_index = tools_index
+        self.table = table if table is not None else PopularityTable()
+
+    @timed('usage.rollup')
+    def run(self, since: Optional[str] = None) -> Dict:
+        started = time.monotonic()
+        rows = list(self.aggregate(since))
+        ratings = self._ratings() if since is None else {}
+
+        owns_bulk = self.es.bulk_writer is None
+        self.es.start_bulk()
+        try:
+            for row in rows:
+                self.es.write_update(self.tools_index, row['tool_id'], _tool_fields(row, since))
+        finally:
+            writer = self.es.stop_bulk() if owns_bulk else None
+
+        if since is None:
+            table_rows = {tool_id: {'tool_id': tool_id, 'rating': rating} for tool_id, rating in ratings.items()}
+            for row in rows:
+                table_rows[row['tool_id']] = {**row, 'rating': ratings.get(row['tool_id'])}
+            self.table.replace(table_rows.values())
+        return {
+            'tools': len(rows),
+            'events': sum(row['usage_count'] for row in rows),
+            'failed_updates': len(writer.failures) if writer is not None else 0,
+            'elapsed_seconds': round(time.monotonic() - started, 3)
+        }
+
+    def aggregate(self, since: Optional[str] = None) -> Iterator[Dict]:
+        """One row of aggregates per tool id, paging through the composite aggregation."""
+        after = None
+        while True:
+            composite = {'size': self.PAGE_SIZE, 'sources': [{'tool_id': {'terms': {'field': 'tool_id'}}}]}
+            if after is not None:
+                composite['after'] = after
+            body = {
+                'size': 0,
+                'aggs': {
+                    'tools': {
+                        'composite': composite,
+                        'aggs': {
+                            'succeeded': {'filter': {'term': {'execution_success': True}}},
+                            'avg_execution_time_ms': {'avg': {'field': 'execution_time_ms'}},
+                            'last_used': {'max': {'field': 'timestamp'}}
+                        }
+                    }
+                }
+            }
+            if since:
+                body['query'] = {'range': {'timestamp': {'gte': since}}}
+
+            result = self.es.search(index=self.usage_index, body=body)['aggregations']['tools']
+            for bucket in result['buckets']:
+                yield _row(bucket)
+            after = result.get('after_key')
+            if not result['buckets'] or after is None:
+                return
+
+    def _ratings(self) -> Dict[str, float]:
+        # Ratings are not derived from logs but still belong in the popularity table
+        hits = self.es.scan(self.tools_index, query={'exists': {'field': 'rating'}}, source=['tool_id', 'rating'])
+        return {hit['_source']['tool_id']: hit['_source']['rating'] for hit in hits if 'tool_id' in hit['_source']}
+
+
+def load_popularity(es_client, tools_index: str = TOOLS_INDEX,
+                    table: Optional[PopularityTable] = None) -> PopularityTable:
+    """Fill a ``PopularityTable`` from the aggregates already stored on tool documents."""
+    table = table if table is not None else PopularityTable()
+    hits = es_client.scan(tools_index, source=['tool_id'] + list(PopularityTable.COLUMNS))
+    table.replace(hit['_source'] for hit in hits if 'tool_id' in hit['_source'])
+    return table
+
+
+class PopularityRefresher:
+    """Background thread that reloads a ``PopularityTable`` every ``interval`` seconds.
+
+    With ``rollup=True`` each reload runs the rollup first, so one
+    long-running process both aggregates the logs and serves the results.
+    """
+
+    def __init__(self, es_client, table: PopularityTable, interval: float, rollup: bool = False):
+        self.es = es_client
+        self.table = table
+        self.interval = interval
+        self.rollup = UsageRollup(es_client, table=table) if rollup else None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='popularity-refresh', daemon=True)
+
+    def start(self) -> 'PopularityRefresher':
+        self.refresh()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def refresh(self) -> None:
+        try:
+            if self.rollup is not None:
+                self.rollup.run()
+            else:
+                load_popularity(self.es, table=self.table)
+        except Exception as e:
+            logger.warning(f"Popularity refresh failed, keeping the previous table: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+
+def _tool_fields(row: Dict, since: Optional[str]) -> Dict:
+    """The partial update of one tool document for ``row``."""
+    fields = {field: value for field, value in row.items() if field != 'tool_id'}
+    if since is None:
+        return fields
+    # Window counts must not replace the all-time ones the ranker reads
+    for field in WINDOW_FIELDS:
+        fields[f'recent_{field}'] = fields.pop(field)
+    fields['recent_since'] = since
+    return fields
+
+
+def _row(bucket: Dict) -> Dict:
+    total = bucket['doc_count']
+    row = {
+        'tool_id': bucket['key']['tool_id'],
+        'usage_count': total,
+        'success_rate': round(bucket['succeeded']['doc_count'] / total, 4) if total else 0.0,
+        'avg_execution_time_ms': bucket['avg_execution_time_ms']['value']
+    }
+    last_used = bucket['last_used'].get('value_as_string') or bucket['last_used'].get('value')
+    if last_used is not None:
+        row['last_used'] = last_used
+    return row